@@ -1,17 +1,27 @@
 # backend/app/api/routes_faces.py
-import os
-import shutil
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from typing import List
 
 from app.dependencies import get_face_engine
 from app.services.face_service import FaceEngine
-from app.core.config import settings
+from app.services.image_loader import decode_image
 
 router = APIRouter()
 
+def _decode_uploads(uploads):
+    """Decodes uploaded bytes straight from memory; None for unreadable files."""
+    images = []
+    for filename, data in uploads:
+        try:
+            images.append(decode_image(data, path=filename).bgr)
+        except Exception:
+            images.append(None)
+    return images
+
 @router.post("/register")
 async def register_face(
+    background_tasks: BackgroundTasks,
     name: str = Form(...), # User types "Rahul"
     files: List[UploadFile] = File(...), # User uploads 1 or 5 photos
     face_engine: FaceEngine = Depends(get_face_engine)
@@ -19,37 +29,31 @@ async def register_face(
     """
     Upload photos to register/improve a person's recognition.
     You can upload multiple photos of 'Rahul' to improve accuracy.
+    All photos are processed together: one DB write and one gallery update.
     """
+    # Nothing touches the disk: each request works on its own bytes
+    uploads = [(file.filename, await file.read()) for file in files]
+
+    images = await run_in_threadpool(_decode_uploads, uploads)
+    outcomes = await run_in_threadpool(face_engine.register_faces_batch, name, images)
+
     results = []
-    
-    # Create a temp folder for processing
-    temp_dir = os.path.join(settings.DATA_DIR, "temp_reg")
-    os.makedirs(temp_dir, exist_ok=True)
+    for (filename, _), (ok, error) in zip(uploads, outcomes):
+        if ok:
+            results.append(f"✅ {filename}: Registered successfully")
+        else:
+            results.append(f"❌ {filename}: {error}")
 
-    for file in files:
-        try:
-            # Save temp file
-            file_path = os.path.join(temp_dir, file.filename)
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            # Register using our Updated Engine
-            face_engine.register_new_face(name, file_path)
-            
-            results.append(f"✅ {file.filename}: Registered successfully")
-            
-            # Cleanup temp file
-            os.remove(file_path)
-            
-        except ValueError as e:
-            results.append(f"❌ {file.filename}: {str(e)}")
-        except Exception as e:
-            results.append(f"❌ {file.filename}: Unexpected Error {str(e)}")
+    # Tag photos indexed before this person was known (stored faces only)
+    retag = any(ok for ok, _ in outcomes)
+    if retag:
+        background_tasks.add_task(face_engine.retag_existing_photos, [name])
 
     return {
         "person": name,
         "summary": results,
-        "total_references_now": face_engine.known_names.count(name)
+        "total_references_now": face_engine.gallery.count(name),
+        "retag": "queued" if retag else "skipped"
     }
 
 @router.get("/list")
@@ -1,11 +1,14 @@
 # backend/app/api/routes_ingest.py
 import os
-import shutil
-from fastapi import APIRouter, UploadFile, File, BackgroundTasks, HTTPException, Depends #type:ignore
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query, Request #type:ignore
+from fastapi.concurrency import run_in_threadpool #type:ignore
 from pydantic import BaseModel #type:ignore
 
-from app.dependencies import get_ingest_service
-from app.services.ingestion_service import IngestionService
+from app.dependencies import get_job_manager, get_folder_watcher, get_upload_store, get_db
+from app.services.job_queue import JobManager
+from app.services.folder_watcher import FolderWatcher
+from app.services.upload_store import BulkUpload, UploadLimitError, UploadStore, clean_filename
+from app.services.db_service import VectorDB
 from app.core.config import settings
 
 router = APIRouter()
@@ -19,32 +22,124 @@ class FolderRequest(BaseModel):
 
 @router.post("/upload")
 async def upload_image(
-    background_tasks: BackgroundTasks, 
     file: UploadFile = File(...),
-    service: IngestionService = Depends(get_ingest_service)
+    jobs: JobManager = Depends(get_job_manager),
+    store: UploadStore = Depends(get_upload_store)
 ):
     try:
-        # Save file to disk
-        file_path = os.path.join(settings.UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        filename = clean_filename(file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        # Save file to disk in chunks, under its content hash (no name collisions)
+        writer = await run_in_threadpool(store.writer, filename)
+        try:
+            while chunk := await file.read(settings.UPLOAD_CHUNK_SIZE):
+                await run_in_threadpool(writer.write, chunk)
+        except Exception:
+            await run_in_threadpool(writer.abort)
+            raise
+        file_path = await run_in_threadpool(writer.commit)
         
-        # Trigger Service in background
-        background_tasks.add_task(service.process_image, file_path)
+        # Queue it as a durable job (survives restarts, retried on failure)
+        job_id = await run_in_threadpool(jobs.create_job, "upload", filename, [file_path])
         
-        return {"status": "queued", "filename": file.filename}
+        return {"status": "queued", "filename": filename, "job_id": job_id}
+    except UploadLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/bulk")
+async def bulk_upload(
+    request: Request,
+    name: str = Query(None, description="Label for the job (defaults to the content type)"),
+    jobs: JobManager = Depends(get_job_manager),
+    store: UploadStore = Depends(get_upload_store)
+):
+    """
+    Many images in one request: a multipart form with any number of files
+    (archive parts are extracted too), or a zip/tar(.gz) archive as the raw
+    body. The body is parsed as it streams in and every image is queued
+    the moment it is stored. Bodies, files and archive contents over the
+    UPLOAD_* / ARCHIVE_* limits are refused with 413.
+    """
+    content_type = request.headers.get("content-type", "")
+    job_id = await run_in_threadpool(jobs.create_job, "bulk", name or content_type.split(";")[0], (), False)
+    try:
+        upload = BulkUpload(store, content_type, on_file=lambda path: jobs.add_items(job_id, [path]))
+        async for chunk in request.stream():
+            await run_in_threadpool(upload.feed, chunk)
+        await run_in_threadpool(upload.close)
+    except UploadLimitError as e:
+        raise HTTPException(status_code=413, detail={"error": str(e), "job_id": job_id})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e), "job_id": job_id})
+    finally:
+        # Whatever landed is ingested, even if the body was cut short
+        await run_in_threadpool(jobs.seal, job_id)
+
+    return {"status": "queued", "job_id": job_id, **upload.summary()}
+
 @router.post("/folder")
 async def scan_folder(
-    background_tasks: BackgroundTasks, 
     request: FolderRequest,
-    service: IngestionService = Depends(get_ingest_service)
+    jobs: JobManager = Depends(get_job_manager)
 ):
     if not os.path.exists(request.path):
         raise HTTPException(status_code=404, detail="Folder path not found")
         
-    background_tasks.add_task(service.process_folder, request.path)
+    # The worker enumerates the folder into the job, then ingests it file by file
+    job_id = jobs.create_job("folder", request.path, sealed=False)
     
-    return {"status": "queued", "path": request.path}
\ No newline at end of file
+    return {"status": "queued", "path": request.path, "job_id": job_id}
+
+@router.get("/jobs")
+def list_jobs(
+    limit: int = Query(50, ge=1, le=500),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """Most recent ingestion jobs with per-state counts, images/sec and ETA."""
+    return jobs.list_jobs(limit)
+
+@router.get("/jobs/{job_id}")
+def job_status(job_id: int, jobs: JobManager = Depends(get_job_manager)):
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: int, jobs: JobManager = Depends(get_job_manager)):
+    if not jobs.cancel(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.get_job(job_id)
+
+@router.post("/watch")
+def watch_folder(request: FolderRequest, watcher: FolderWatcher = Depends(get_folder_watcher)):
+    """
+    Keeps a folder in sync: new/modified files are ingested, deleted files
+    leave the index and renames are re-pointed without running the models.
+    """
+    if not os.path.isdir(request.path):
+        raise HTTPException(status_code=404, detail="Folder path not found")
+    return watcher.add(request.path)
+
+@router.get("/watch")
+def list_watched(watcher: FolderWatcher = Depends(get_folder_watcher)):
+    return watcher.list_folders()
+
+@router.delete("/watch")
+def unwatch_folder(
+    path: str = Query(..., description="Folder to stop watching (indexed photos are kept)"),
+    watcher: FolderWatcher = Depends(get_folder_watcher)
+):
+    if not watcher.remove(path):
+        raise HTTPException(status_code=404, detail="Folder is not watched")
+    return {"status": "removed", "path": path}
+
+@router.get("/stats")
+async def writer_stats(db: VectorDB = Depends(get_db)):
+    """Bulk upsert writer counters: flushes, points written, latencies."""
+    return db.writer.stats()
@@ -0,0 +1,84 @@
+# backend/app/api/routes_media.py
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response #type:ignore
+
+from app.dependencies import get_db, get_thumbnail_service
+from app.services.db_service import VectorDB
+from app.services.thumbnail_service import ThumbnailService
+
+router = APIRouter()
+
+# Thumbnails are content-addressed, so a URL's bytes never change
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+@router.get("/thumb/{point_id}")
+def get_thumbnail(
+    point_id: str,
+    request: Request,
+    size: int = Query(256, ge=16, le=2048, description="Longest side in pixels (rounded up to a bucket)"),
+    db: VectorDB = Depends(get_db),
+    thumbnails: ThumbnailService = Depends(get_thumbnail_service)
+):
+    """
+    Serves a preview of an indexed photo with ETag/Last-Modified validation
+    and byte ranges. Points indexed before thumbnails existed get theirs
+    generated on the first request.
+    """
+    payload = db.get_image(point_id)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    key = payload.get("content_hash") or point_id.replace("-", "")
+    bucket = thumbnails.bucket(size)
+    try:
+        path = thumbnails.ensure(key, bucket, payload["path"])
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Original image is missing")
+
+    stat = os.stat(path)
+    etag = f'"{key[:16]}-{bucket}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    # 1. Conditional requests
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")] + ['*']:
+        return Response(status_code=304, headers=headers)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and not if_none_match:
+        try:
+            if int(stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp():
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    # 2. Single byte range
+    range_header = request.headers.get("range")
+    if range_header:
+        match = _RANGE_RE.match(range_header.strip())
+        total = len(data)
+        if not match or match.groups() == ("", ""):
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{total}"})
+        start, end = match.groups()
+        if start == "":
+            # Suffix range: the last N bytes
+            start, end = max(0, total - int(end)), total - 1
+        else:
+            start, end = int(start), min(int(end) if end else total - 1, total - 1)
+        if start > end or start >= total:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{total}"})
+        headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+        return Response(content=data[start:end + 1], status_code=206, media_type=thumbnails.media_type, headers=headers)
+
+    return Response(content=data, media_type=thumbnails.media_type, headers=headers)
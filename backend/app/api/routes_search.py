@@ -1,54 +1,78 @@
 # backend/app/api/routes_search.py
-from fastapi import APIRouter, Depends, Query #type:ignore
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response #type:ignore
+from typing import List, Optional
 from pydantic import BaseModel #type:ignore
 
-from app.dependencies import get_db, get_agent
-from app.services.db_service import VectorDB
-from app.services.agent import SearchAgent
-from app.services.ai_service import AIEngine # We need this to embed the query
+from app.core.metrics import server_timing, timed, track_request
+from app.dependencies import get_search_service
+from app.services.search_service import SearchService
 
 router = APIRouter()
 
-# Response Model
+# Fields a client may ask for (response name -> payload key; None = no payload needed)
+PROJECTABLE_FIELDS = {"image_path": "path", "people": "people", "caption": "caption", "thumbnail_url": None}
+
+# Response Model (unrequested fields are left out of the JSON)
 class SearchResponse(BaseModel):
-    image_path: str
+    id: str
     score: float
-    people: List[str]
-    caption: str
+    image_path: Optional[str] = None
+    people: Optional[List[str]] = None
+    caption: Optional[str] = None
+    thumbnail_url: Optional[str] = None
 
-@router.get("/", response_model=List[SearchResponse])
+@router.get("/", response_model=List[SearchResponse], response_model_exclude_none=True)
 async def search_images(
+    response: Response,
     q: str = Query(..., description="Natural language search query"),
-    db: VectorDB = Depends(get_db),
-    agent: SearchAgent = Depends(get_agent)
+    limit: int = Query(10, ge=1, le=100, description="Results per page"),
+    offset: int = Query(0, ge=0, le=10000, description="Results to skip (use X-Next-Offset)"),
+    score_threshold: Optional[float] = Query(None, description="Drop results scoring below this"),
+    fields: Optional[str] = Query(None, description="Comma-separated subset of: image_path, people, caption, thumbnail_url"),
+    service: SearchService = Depends(get_search_service)
 ):
-    # 1. Agent Analysis
-    intent = agent.parse_query(q)
-    target_people = intent.get('people', [])
-    visual_query = intent.get('visual_query', q)
-
-    # 2. Convert text to vector (We can instantiate a temporary AIEngine or reuse one)
-    # Optimization: It's better to make AIEngine a dependency too, but for now:
-    # We will assume db.search_hybrid handles the embedding or we pass an embedder.
-    # Let's assume AIEngine is handled inside the Service layer in a real production app.
-    # For this tutorial, let's grab the global AI engine from dependencies to be safe:
-    from app.dependencies import ingest_service_instance 
-    ai_engine = ingest_service_instance.ai_engine 
-    
-    query_vector = ai_engine.generate_text_embedding(visual_query)
-
-    # 3. Perform Search
-    results = db.search_hybrid(query_vector, target_people)
+    wanted = list(PROJECTABLE_FIELDS)
+    if fields:
+        wanted = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in wanted if f not in PROJECTABLE_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    # 1-3. Agent Analysis -> Text Vector -> Hybrid Search (all cached)
+    with track_request() as timings:
+        with timed("search_total"):
+            results, has_more = await service.search(
+                q, limit=limit, offset=offset, score_threshold=score_threshold,
+                fields=[PROJECTABLE_FIELDS[f] for f in wanted if PROJECTABLE_FIELDS[f]]
+            )
+    # Stages missing from the header were served from cache
+    response.headers["Server-Timing"] = server_timing(timings)
+    if has_more:
+        response.headers["X-Next-Offset"] = str(offset + limit)
 
     # 4. Format Output
     response_data = []
     for point in results:
-        response_data.append(SearchResponse(
-            image_path=point.payload['path'],
-            score=point.score,
-            people=point.payload['people'],
-            caption=point.payload.get('caption', '')
-        ))
-
-    return response_data
\ No newline at end of file
+        payload = point.payload or {}
+        item = SearchResponse(id=str(point.id), score=point.score)
+        if "image_path" in wanted:
+            item.image_path = payload.get('path')
+        if "people" in wanted:
+            item.people = payload.get('people', [])
+        if "caption" in wanted:
+            item.caption = payload.get('caption', '')
+        if "thumbnail_url" in wanted:
+            item.thumbnail_url = f"/media/thumb/{point.id}"
+        response_data.append(item)
+
+    return response_data
+
+@router.get("/cache")
+async def cache_stats(service: SearchService = Depends(get_search_service)):
+    """Hit/miss counters for the intent, vector and result caches."""
+    return service.cache.stats()
+
+@router.get("/encoder")
+async def encoder_stats(service: SearchService = Depends(get_search_service)):
+    """Queue depth and batch-size histogram of the CLIP text micro-batcher."""
+    return service.text_encoder.stats()
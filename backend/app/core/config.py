@@ -17,6 +17,148 @@ class Settings:
     UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
     FACES_DIR = os.path.join(DATA_DIR, "faces")
     QDRANT_PATH = os.path.join(DATA_DIR, "qdrant_data")
+    THUMBNAIL_DIR = os.path.join(DATA_DIR, "thumbnails")
+
+    # STARTUP SETTINGS
+    # "search": search API only (CLIP text + agent), "ingest": ingestion + faces, "all": both
+    APP_ROLE = os.getenv("APP_ROLE", "all").lower()
+    # Build the role's engines at startup instead of on first request
+    PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "false").lower() == "true"
+
+    # INGESTION SETTINGS
+    # Number of images pushed through CLIP/BLIP in a single forward pass
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "8"))
+
+    # Inference backend for CLIP/BLIP: "torch" or "onnx" (onnxruntime, CPU)
+    AI_BACKEND = os.getenv("AI_BACKEND", "torch")
+    ONNX_MODEL_DIR = os.path.join(DATA_DIR, "onnx_models")
+    ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "false").lower() == "true"  # dynamic int8 weights
+    ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))  # 0 = onnxruntime default
+    ONNX_PARITY_MIN_COSINE = float(os.getenv("ONNX_PARITY_MIN_COSINE", "0.99"))
+    # BLIP captions through ONNX too. Its greedy loop has no KV cache (the
+    # whole prefix is re-run per token), so torch generate() stays the
+    # default until `--check` shows ONNX captioning is faster on your hardware
+    ONNX_CAPTIONS = os.getenv("ONNX_CAPTIONS", "false").lower() == "true"
+
+    # Largest side any consumer needs from a decoded photo: face detection
+    # runs at 640, CLIP at 224, BLIP at 384, thumbnails up to their biggest bucket
+    DECODE_MAX_SIDE = int(os.getenv("DECODE_MAX_SIDE", "640"))
+
+    # Pipeline: bounded queue size between stages and worker threads per stage
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "32"))
+    PIPELINE_DECODE_WORKERS = int(os.getenv("PIPELINE_DECODE_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+    PIPELINE_FACE_WORKERS = int(os.getenv("PIPELINE_FACE_WORKERS", "2"))
+    PIPELINE_CLIP_WORKERS = int(os.getenv("PIPELINE_CLIP_WORKERS", "1"))
+    PIPELINE_BLIP_WORKERS = int(os.getenv("PIPELINE_BLIP_WORKERS", "1"))
+    PIPELINE_WRITE_WORKERS = int(os.getenv("PIPELINE_WRITE_WORKERS", "1"))
+
+    # Vector store: "server" (Qdrant at QDRANT_HOST:QDRANT_PORT), "embedded"
+    # (in-process Qdrant persisted under QDRANT_PATH) or "memory" (tests/benchmarks)
+    VECTOR_STORE = os.getenv("VECTOR_STORE", "server").lower()
+    QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
+    QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+
+    # Qdrant photo collection profile
+    QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", "16"))
+    QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+    QDRANT_HNSW_EF = int(os.getenv("QDRANT_HNSW_EF", "128"))  # query-time beam width
+    QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "int8").lower()  # "int8" or "none"
+    QDRANT_QUANT_RESCORE = os.getenv("QDRANT_QUANT_RESCORE", "true").lower() == "true"
+    QDRANT_QUANT_OVERSAMPLING = float(os.getenv("QDRANT_QUANT_OVERSAMPLING", "2.0"))
+    QDRANT_ON_DISK_VECTORS = os.getenv("QDRANT_ON_DISK_VECTORS", "true").lower() == "true"
+    # Apply profile changes to an existing collection on startup
+    QDRANT_MIGRATE = os.getenv("QDRANT_MIGRATE", "true").lower() == "true"
+
+    # Face references: own collection, streamed page by page on startup
+    FACE_COLLECTION = os.getenv("FACE_COLLECTION", "face_references")
+    FACE_EMBEDDING_SIZE = 512
+    FACE_LOAD_PAGE_SIZE = int(os.getenv("FACE_LOAD_PAGE_SIZE", "1000"))
+
+    # Faces found in indexed photos (one point per face, payload photo_id).
+    # Kept so a newly registered person is tagged in existing photos without
+    # re-ingesting; disabling it lets ingestion skip recognition while the
+    # gallery is empty.
+    PHOTO_FACE_COLLECTION = os.getenv("PHOTO_FACE_COLLECTION", "photo_faces")
+    STORE_FACE_EMBEDDINGS = os.getenv("STORE_FACE_EMBEDDINGS", "true").lower() == "true"
+
+    # Cross-process change tokens (one point in STATE_COLLECTION): writers
+    # stamp it, search replicas poll it every N seconds to drop stale caches
+    # and reload the face gallery
+    STATE_COLLECTION = os.getenv("STATE_COLLECTION", "app_state")
+    REPLICA_SYNC_INTERVAL = float(os.getenv("REPLICA_SYNC_INTERVAL", "5.0"))
+
+    # Face matching: cosine cut-off, names tagged per face (ingest and
+    # re-tagging; 1 = best match only), and whether to compare against one
+    # averaged prototype per person instead of every reference
+    FACE_MATCH_THRESHOLD = float(os.getenv("FACE_MATCH_THRESHOLD", "0.5"))
+    FACE_MATCH_TOP_K = int(os.getenv("FACE_MATCH_TOP_K", "1"))
+    FACE_USE_PROTOTYPES = os.getenv("FACE_USE_PROTOTYPES", "false").lower() == "true"
+
+    # InsightFace: model pack ("buffalo_l", "buffalo_s", "buffalo_sc"), the
+    # largest detector input side, and whether smaller photos are detected at
+    # their own size (rounded up to a multiple of 32) instead of being padded
+    FACE_MODEL_PACK = os.getenv("FACE_MODEL_PACK", "buffalo_l")
+    FACE_DET_SIZE = int(os.getenv("FACE_DET_SIZE", "640"))
+    FACE_DET_ADAPTIVE = os.getenv("FACE_DET_ADAPTIVE", "true").lower() == "true"
+    FACE_DET_THRESHOLD = float(os.getenv("FACE_DET_THRESHOLD", "0.5"))
+
+    # Search caches: max entries and TTL (seconds) per tier
+    CACHE_INTENT_SIZE = int(os.getenv("CACHE_INTENT_SIZE", "1024"))
+    CACHE_INTENT_TTL = float(os.getenv("CACHE_INTENT_TTL", "3600"))
+    CACHE_VECTOR_SIZE = int(os.getenv("CACHE_VECTOR_SIZE", "4096"))
+    CACHE_VECTOR_TTL = float(os.getenv("CACHE_VECTOR_TTL", "86400"))
+    CACHE_RESULT_SIZE = int(os.getenv("CACHE_RESULT_SIZE", "1024"))
+    CACHE_RESULT_TTL = float(os.getenv("CACHE_RESULT_TTL", "600"))
+
+    # Search request path: threads for CLIP text encoding and per-stage
+    # concurrency limits (requests beyond the limit wait their turn)
+    SEARCH_ENCODE_WORKERS = int(os.getenv("SEARCH_ENCODE_WORKERS", "2"))
+    SEARCH_LLM_CONCURRENCY = int(os.getenv("SEARCH_LLM_CONCURRENCY", "8"))
+    SEARCH_ENCODE_CONCURRENCY = int(os.getenv("SEARCH_ENCODE_CONCURRENCY", "4"))
+    SEARCH_QDRANT_CONCURRENCY = int(os.getenv("SEARCH_QDRANT_CONCURRENCY", "16"))
+    # Hits kept per query for paging; deeper pages query Qdrant directly
+    SEARCH_CANDIDATE_POOL = int(os.getenv("SEARCH_CANDIDATE_POOL", "200"))
+    # Micro-batching of CLIP text encodes: collect for up to N ms / N queries
+    TEXT_BATCH_WINDOW_MS = float(os.getenv("TEXT_BATCH_WINDOW_MS", "5"))
+    TEXT_BATCH_MAX = int(os.getenv("TEXT_BATCH_MAX", "32"))
+
+    # Thumbnails: size buckets (longest side, px), format ("webp" or "jpeg") and quality
+    THUMBNAIL_SIZES = [int(s) for s in os.getenv("THUMBNAIL_SIZES", "128,256,512").split(",")]
+    THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "webp")
+    THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+
+    # Buffered Qdrant writer: flush after N points or after N seconds
+    UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "64"))
+    UPSERT_FLUSH_INTERVAL = float(os.getenv("UPSERT_FLUSH_INTERVAL", "2.0"))
+    UPSERT_MAX_RETRIES = int(os.getenv("UPSERT_MAX_RETRIES", "3"))
+    # Points buffered (incl. failed batches kept for retry) before add() blocks
+    UPSERT_MAX_PENDING = int(os.getenv("UPSERT_MAX_PENDING", "2048"))
+
+    # Durable ingestion jobs (stored in users.db): files claimed (and
+    # checkpointed) at a time, attempts per file and the first retry delay
+    # (doubles each attempt)
+    JOB_CHUNK_SIZE = int(os.getenv("JOB_CHUNK_SIZE", "64"))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "30"))
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+
+    # Watch mode: filesystem events (watchdog/inotify) when available,
+    # otherwise a full rescan every WATCH_POLL_INTERVAL seconds.
+    # Events are applied once a folder has been quiet for WATCH_DEBOUNCE seconds.
+    WATCH_USE_EVENTS = os.getenv("WATCH_USE_EVENTS", "true").lower() == "true"
+    WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", "60"))
+    WATCH_DEBOUNCE = float(os.getenv("WATCH_DEBOUNCE", "2.0"))
+
+    # Uploads are streamed to disk in chunks of this many bytes
+    UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1 << 20)))
+    # Upload limits: bytes of one stored file (upload, form part or archive
+    # entry), bytes of one bulk request body, and per bulk request the
+    # entries and extracted bytes of its archives (zip bombs)
+    UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(200 << 20)))
+    UPLOAD_MAX_TOTAL_BYTES = int(os.getenv("UPLOAD_MAX_TOTAL_BYTES", str(20 << 30)))
+    ARCHIVE_MAX_ENTRIES = int(os.getenv("ARCHIVE_MAX_ENTRIES", "100000"))
+    ARCHIVE_MAX_UNCOMPRESSED_BYTES = int(os.getenv("ARCHIVE_MAX_UNCOMPRESSED_BYTES", str(50 << 30)))
+
     # AI PROVIDER SETTINGS
     # Options: "ollama", "groq"
     LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq") 
@@ -29,6 +171,11 @@ class Settings:
     GROQ_API_KEY = os.getenv("GROQ_API_KEY", "")
     GROQ_MODEL = os.getenv("LLM_MODEL","openai/gpt-oss-120b") # Faster and smarter than local llama3
 
+    # Local name matching in front of the LLM
+    NAME_FUZZY_CUTOFF = float(os.getenv("NAME_FUZZY_CUTOFF", "0.8"))
+    # Upper bound on names put into the prompt when the query needs the full list
+    AGENT_MAX_PROMPT_NAMES = int(os.getenv("AGENT_MAX_PROMPT_NAMES", "50"))
+
     # AUTH SETTINGS
     SECRET_KEY = os.getenv("SECRET_KEY", "super_secret_random_string_change_this")
     ALGORITHM = "HS256"
@@ -42,5 +189,7 @@ class Settings:
         os.makedirs(self.UPLOAD_DIR, exist_ok=True)
         os.makedirs(self.FACES_DIR, exist_ok=True)
         os.makedirs(self.QDRANT_PATH, exist_ok=True)
+        if self.APP_ROLE not in ("search", "ingest", "all"):
+            raise ValueError(f"APP_ROLE must be search, ingest or all, got '{self.APP_ROLE}'")
 
 settings = Settings()
\ No newline at end of file
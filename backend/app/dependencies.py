@@ -1,46 +1,203 @@
 # backend/app/dependencies.py
-from app.services.db_service import VectorDB
-from app.services.ai_service import AIEngine
-from app.services.face_service import FaceEngine
-from app.services.ingestion_service import IngestionService
-from app.services.agent import SearchAgent
+import threading
+import time
 
-# Global placeholders
+from app.core.config import settings
+
+# Startup roles and the components each one needs up front
+ROLE_COMPONENTS = {
+    "search": ["db", "face_engine", "ai_engine", "agent", "search_service", "thumbnails"],
+    "ingest": ["db", "face_engine", "ai_engine", "ingest_service", "thumbnails"],
+    "all": ["db", "face_engine", "ai_engine", "ingest_service", "agent", "search_service", "thumbnails"],
+}
+
+# Global placeholders (filled on first use)
 db_instance = None
+ai_engine_instance = None
+face_engine = None
 ingest_service_instance = None
 agent_instance = None
-face_engine = None
+search_service_instance = None
+thumbnail_service_instance = None
+job_manager_instance = None
+folder_watcher_instance = None
+upload_store_instance = None
+replica_sync_instance = None
 
-def get_face_engine():
-    return face_engine
+# Seconds spent constructing each component
+load_timings = {}
+_lock = threading.RLock()
+
+def _load(name: str, factory):
+    """Builds a component once, under a lock, and records how long it took."""
+    with _lock:
+        print(f"⏳ Loading {name}...")
+        start = time.perf_counter()
+        instance = factory()
+        load_timings[name] = round(time.perf_counter() - start, 3)
+        print(f"✅ {name} ready in {load_timings[name]:.2f}s")
+        return instance
+
+# Heavy modules (torch, transformers, insightface, langchain) are only
+# imported inside the getters, so a role never imports what it doesn't use.
 
 def get_db():
+    global db_instance
+    if db_instance is None:
+        with _lock:
+            if db_instance is None:
+                from app.services.db_service import create_vector_db
+                db_instance = _load("db", create_vector_db)
     return db_instance
 
+def get_ai_engine():
+    global ai_engine_instance
+    if ai_engine_instance is None:
+        with _lock:
+            if ai_engine_instance is None:
+                from app.services.ai_service import AIEngine
+                ai_engine_instance = _load("ai_engine", AIEngine)
+    return ai_engine_instance
+
+def get_face_engine():
+    global face_engine
+    if face_engine is None:
+        with _lock:
+            if face_engine is None:
+                from app.services.face_service import FaceEngine
+                face_engine = _load("face_engine", lambda: FaceEngine(db_client=get_db(), references_dir="./data/faces"))
+    return face_engine
+
 def get_ingest_service():
+    global ingest_service_instance
+    if ingest_service_instance is None:
+        with _lock:
+            if ingest_service_instance is None:
+                from app.services.ingestion_service import IngestionService
+                ingest_service_instance = _load("ingest_service", lambda: IngestionService(get_db(), get_face_engine(), get_ai_engine(), get_thumbnail_service()))
     return ingest_service_instance
 
 def get_agent():
+    global agent_instance
+    if agent_instance is None:
+        with _lock:
+            if agent_instance is None:
+                from app.services.agent import SearchAgent
+                engine = get_face_engine()
+                # Reads the live gallery, never a stale copy
+                agent_instance = _load("agent", lambda: SearchAgent(names_provider=lambda: engine.gallery.people))
     return agent_instance
 
+def get_search_service():
+    global search_service_instance
+    if search_service_instance is None:
+        with _lock:
+            if search_service_instance is None:
+                from app.services.search_service import SearchService
+                search_service_instance = _load("search_service", lambda: SearchService(get_db(), get_agent(), get_ai_engine(), get_face_engine()))
+    return search_service_instance
+
+def get_thumbnail_service():
+    global thumbnail_service_instance
+    if thumbnail_service_instance is None:
+        with _lock:
+            if thumbnail_service_instance is None:
+                from app.services.thumbnail_service import ThumbnailService
+                thumbnail_service_instance = _load("thumbnails", ThumbnailService)
+    return thumbnail_service_instance
+
+def get_job_manager():
+    global job_manager_instance
+    if job_manager_instance is None:
+        with _lock:
+            if job_manager_instance is None:
+                from app.services.job_queue import JobManager
+                # The ingest service (and its models) is built by the worker on first use
+                job_manager_instance = _load("job_manager", lambda: JobManager(get_ingest_service))
+    return job_manager_instance
+
+def get_folder_watcher():
+    global folder_watcher_instance
+    if folder_watcher_instance is None:
+        with _lock:
+            if folder_watcher_instance is None:
+                from app.services.folder_watcher import FolderWatcher
+                folder_watcher_instance = _load("folder_watcher", lambda: FolderWatcher(get_job_manager(), get_db))
+    return folder_watcher_instance
+
+def get_upload_store():
+    global upload_store_instance
+    if upload_store_instance is None:
+        with _lock:
+            if upload_store_instance is None:
+                from app.services.upload_store import UploadStore
+                upload_store_instance = _load("upload_store", UploadStore)
+    return upload_store_instance
+
+def get_replica_sync():
+    global replica_sync_instance
+    if replica_sync_instance is None:
+        with _lock:
+            if replica_sync_instance is None:
+                from app.services.replica_sync import ReplicaSync
+                # Only refreshes a face engine this replica actually loaded
+                replica_sync_instance = _load("replica_sync", lambda: ReplicaSync(get_db(), lambda: face_engine))
+    return replica_sync_instance
+
+_GETTERS = {
+    "db": get_db,
+    "ai_engine": get_ai_engine,
+    "face_engine": get_face_engine,
+    "ingest_service": get_ingest_service,
+    "agent": get_agent,
+    "search_service": get_search_service,
+    "thumbnails": get_thumbnail_service,
+}
+
 def init_resources():
-    """Initializes all heavy models. Called by main.py on startup."""
-    global db_instance, ingest_service_instance, agent_instance , face_engine
-    
-    print("⏳ Initializing Global Services...")
-    
-    # 1. Load DB
-    db_instance = VectorDB()
-    
-    # 2. Load Engines
-    ai_engine = AIEngine()
-    face_engine = FaceEngine(db_client=db_instance, references_dir="./data/faces")
-    
-    # 3. Create Services
-    ingest_service_instance = IngestionService(db_instance, face_engine, ai_engine)
-    
-    # 4. Create Agent
-    known_people = list(set(face_engine.known_names))
-    agent_instance = SearchAgent(known_people=known_people)
-    
-    print("✅ All Systems Ready.")
\ No newline at end of file
+    """
+    Called by main.py on startup. Everything is lazy; with PRELOAD_MODELS
+    the components of the current APP_ROLE are built now instead of on the
+    first request.
+    """
+    print(f"⏳ Starting in '{settings.APP_ROLE}' role...")
+    if settings.PRELOAD_MODELS:
+        for name in ROLE_COMPONENTS[settings.APP_ROLE]:
+            _GETTERS[name]()
+    if settings.APP_ROLE in ("ingest", "all"):
+        # Resume unfinished ingestion jobs from their last checkpoint
+        get_job_manager().start()
+        # Re-attach watched folders; the first rescan catches offline changes
+        get_folder_watcher().start()
+    else:
+        # Picks up what the ingest process writes: new photos, new faces
+        get_replica_sync().start()
+    print("✅ All Systems Ready.")
+
+def resource_status():
+    """Which components are loaded and how long each took (models included)."""
+    models = {}
+    if ai_engine_instance is not None:
+        models.update(ai_engine_instance.load_timings)
+    if face_engine is not None and face_engine.load_seconds is not None:
+        models["insightface"] = face_engine.load_seconds
+    return {
+        "role": settings.APP_ROLE,
+        "components": dict(load_timings),
+        "models": models,
+    }
+
+async def shutdown_resources():
+    """Flushes buffered writes and closes clients. Called by main.py on shutdown."""
+    if replica_sync_instance is not None:
+        replica_sync_instance.stop()
+    if folder_watcher_instance is not None:
+        folder_watcher_instance.stop()
+    if job_manager_instance is not None:
+        job_manager_instance.stop()
+    if search_service_instance is not None:
+        await search_service_instance.close()
+    if db_instance is not None:
+        print("💾 Flushing pending writes...")
+        db_instance.close()
+        await db_instance.aclose()
@@ -1,31 +1,52 @@
 # backend/app/main.py
-from fastapi import FastAPI #type:ignore
+from fastapi import FastAPI, Response #type:ignore
 from contextlib import asynccontextmanager
 import uvicorn
 
-from app.api import routes_search, routes_ingest , routes_faces  ,routes_auth
-from app.dependencies import init_resources
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+from app.dependencies import init_resources, shutdown_resources, resource_status
 
 # Lifespan handles startup/shutdown logic
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Load models
+    # Startup: Models load lazily (or now, with PRELOAD_MODELS)
     init_resources()
     yield
-    # Shutdown: Clean up (if needed)
+    # Shutdown: Flush buffered DB writes
     print("🛑 Shutting down...")
+    await shutdown_resources()
 
 app = FastAPI(title="Smart Image Search", lifespan=lifespan)
 
-# Register the Routes
-app.include_router(routes_search.router, prefix="/search", tags=["Search"])
-app.include_router(routes_ingest.router, prefix="/ingest", tags=["Ingestion"])
-app.include_router(routes_faces.router,prefix ="/face",tags=["Face Resgister"])
+# Register the Routes (only the ones this role serves, so a search replica
+# never imports the ingestion stack)
+from app.api import routes_auth
 app.include_router(routes_auth.router,prefix = "/api", tags=["User Login/Signup"])
 
+if settings.APP_ROLE in ("search", "all"):
+    from app.api import routes_search, routes_media
+    app.include_router(routes_search.router, prefix="/search", tags=["Search"])
+    app.include_router(routes_media.router, prefix="/media", tags=["Media"])
+
+if settings.APP_ROLE in ("ingest", "all"):
+    from app.api import routes_ingest, routes_faces
+    app.include_router(routes_ingest.router, prefix="/ingest", tags=["Ingestion"])
+    app.include_router(routes_faces.router,prefix ="/face",tags=["Face Resgister"])
+
 @app.get("/")
 def root():
     return {"message": "Image Search API is running. Go to /docs for Swagger UI."}
 
+@app.get("/status")
+def status():
+    """Startup role plus load time of every component built so far."""
+    return resource_status()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint: per-stage latency histograms, counters and queue depths."""
+    return Response(content=REGISTRY.render(), media_type=REGISTRY.CONTENT_TYPE)
+
 if __name__ == "__main__":
-    uvicorn.run(host="localhost",port="8000")
\ No newline at end of file
+    uvicorn.run(host="localhost",port="8000")
@@ -1,37 +1,47 @@
 # backend/app/services/agent_service.py
-from typing import List
+from typing import Callable, List
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
-from langchain_ollama import ChatOllama
-from langchain_groq import ChatGroq
 from pydantic import BaseModel, Field
 
 from app.core.config import settings
+from app.services.name_resolver import NameResolver
 
 # 1. Define the Expected Output Structure (Pydantic)
 class SearchIntent(BaseModel):
     people: List[str] = Field(description="List of known names found in the query")
     visual_query: str = Field(description="Visual scene description for CLIP, without names")
 
+def create_llm():
+    """Builds the chat model selected by LLM_PROVIDER ('groq' or 'ollama')."""
+    if settings.LLM_PROVIDER == "groq":
+        from langchain_groq import ChatGroq
+
+        print("🚀 Using Groq (Cloud) for Agent")
+        return ChatGroq(
+            temperature=0, 
+            model_name=settings.GROQ_MODEL, 
+            api_key=settings.GROQ_API_KEY
+        )
+
+    from langchain_ollama import ChatOllama
+
+    print("🦙 Using Ollama (Local) for Agent")
+    return ChatOllama(
+        model=settings.OLLAMA_MODEL, 
+        base_url=settings.OLLAMA_BASE_URL,
+        format="json" # Native JSON mode for Ollama
+    )
+
 class SearchAgent:
-    def __init__(self, known_people: List[str]):
-        self.known_people = known_people
+    def __init__(self, names_provider: Callable[[], List[str]], llm=None):
+        # Reads the live list of registered people, so /face/register
+        # is picked up without rebuilding the agent
+        self.resolver = NameResolver(names_provider)
         
-        # 2. Select the Model based on Config
-        if settings.LLM_PROVIDER == "groq":
-            print("🚀 Using Groq (Cloud) for Agent")
-            self.llm = ChatGroq(
-                temperature=0, 
-                model_name=settings.GROQ_MODEL, 
-                api_key=settings.GROQ_API_KEY
-            )
-        else:
-            print("🦙 Using Ollama (Local) for Agent")
-            self.llm = ChatOllama(
-                model=settings.OLLAMA_MODEL, 
-                base_url=settings.OLLAMA_BASE_URL,
-                format="json" # Native JSON mode for Ollama
-            )
+        # 2. Select the Model based on Config (any LangChain runnable can be
+        # passed in instead, e.g. the benchmark's local stand-in)
+        self.llm = llm if llm is not None else create_llm()
 
         # 3. Create the Prompt Template
         # We inject the 'format_instructions' automatically
@@ -54,23 +64,57 @@ class SearchAgent:
 
         self.prompt = PromptTemplate(
             template=template,
-            input_variables=["query"],
-            partial_variables={"known_people": str(self.known_people), "format_instructions": self.parser.get_format_instructions()}
+            input_variables=["query", "known_people"],
+            partial_variables={"format_instructions": self.parser.get_format_instructions()}
         )
 
         # 4. Connect the Chain (Prompt -> LLM -> Parser)
         self.chain = self.prompt | self.llm | self.parser
 
+    def _prompt_names(self, match) -> List[str]:
+        """Only the names the LLM actually has to choose between."""
+        if match.candidates or match.exact:
+            return match.exact + [c for c in match.candidates if c not in match.exact]
+        # Relation words ("my sister") with no name in sight: offer everyone, capped
+        return self.resolver.names[:settings.AGENT_MAX_PROMPT_NAMES]
+
+    def _local_intent(self, user_query: str, match):
+        """The answer when the LLM is not needed, else None."""
+        if match.needs_llm:
+            return None
+        if not match.exact:
+            return {"people": [], "visual_query": user_query, "source": "local"}
+        return {"people": match.exact, "visual_query": match.remainder or user_query, "source": "local"}
+
     def parse_query(self, user_query: str):
         """
         Input: "Pic of me and Rahul eating"
         Output: {'people': ['me', 'rahul'], 'visual_query': 'people eating food'}
+        Name-free and exact-name queries are answered locally, without the LLM.
         """
+        match = self.resolver.resolve(user_query)
+        local = self._local_intent(user_query, match)
+        if local is not None:
+            return local
+
         try:
-            # Invoke the chain
-            result = self.chain.invoke({"query": user_query})
+            # Invoke the chain with just the candidate names
+            result = self.chain.invoke({"query": user_query, "known_people": str(self._prompt_names(match))})
             return result
         except Exception as e:
             print(f"⚠️ Agent Error: {e}")
             # Fallback
-            return {"people": [], "visual_query": user_query}
\ No newline at end of file
+            return {"people": [], "visual_query": user_query, "fallback": True}
+
+    async def aparse_query(self, user_query: str):
+        """Same as parse_query, but awaits the LLM instead of blocking the event loop."""
+        match = self.resolver.resolve(user_query)
+        local = self._local_intent(user_query, match)
+        if local is not None:
+            return local
+
+        try:
+            return await self.chain.ainvoke({"query": user_query, "known_people": str(self._prompt_names(match))})
+        except Exception as e:
+            print(f"⚠️ Agent Error: {e}")
+            return {"people": [], "visual_query": user_query, "fallback": True}
@@ -1,30 +1,126 @@
 # backend/ai_engine.py
-from sentence_transformers import SentenceTransformer
-from transformers import BlipProcessor, BlipForConditionalGeneration
 from PIL import Image
-import torch
+from typing import List
+import threading
+import time
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import timed
+from app.services.image_loader import decode_image
+
+CLIP_MODEL_NAME = 'clip-ViT-B-32'
+BLIP_MODEL_NAME = "Salesforce/blip-image-captioning-base"
+
+class LazyModels:
+    """
+    Loads each model on first access and records how long it took.
+    A search replica that never captions never pays for BLIP.
+    """
+
+    def __init__(self):
+        self._models = {}
+        # Re-entrant: a loader may need another lazily loaded model
+        self._lock = threading.RLock()
+        self.load_timings = {}
+
+    def _get(self, name: str, loader):
+        model = self._models.get(name)
+        if model is None:
+            with self._lock:
+                model = self._models.get(name)
+                if model is None:
+                    start = time.perf_counter()
+                    model = loader()
+                    self.load_timings[name] = round(time.perf_counter() - start, 3)
+                    print(f"✅ {name} ready in {self.load_timings[name]:.2f}s")
+                    self._models[name] = model
+        return model
+
+class TorchBackend(LazyModels):
+    """PyTorch CLIP (sentence-transformers) + BLIP (transformers)."""
 
-class AIEngine:
     def __init__(self):
+        super().__init__()
+        import torch
+
+        self.torch = torch
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         print(f"⚙️ AI Engine utilizing: {self.device}")
 
+    def _load_clip(self):
+        from sentence_transformers import SentenceTransformer
+
         # 1. Load CLIP Model (For Vector Search)
         # 'clip-ViT-B-32' outputs a 512-dimensional vector
         print("⏳ Loading CLIP Model...")
-        self.clip_model = SentenceTransformer('clip-ViT-B-32', device=self.device)
+        return SentenceTransformer(CLIP_MODEL_NAME, device=self.device)
+
+    def _load_blip(self):
+        from transformers import BlipProcessor, BlipForConditionalGeneration
 
         # 2. Load VLM Model (For Image Captioning - Optional but powerful)
         print("⏳ Loading BLIP Captioning Model...")
-        self.blip_processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-        self.blip_model = BlipForConditionalGeneration.from_pretrained("Salesforce/blip-image-captioning-base").to(self.device)
+        processor = BlipProcessor.from_pretrained(BLIP_MODEL_NAME)
+        model = BlipForConditionalGeneration.from_pretrained(BLIP_MODEL_NAME).to(self.device)
+        return processor, model
+
+    @property
+    def clip_model(self):
+        return self._get("clip", self._load_clip)
+
+    @property
+    def blip_processor(self):
+        return self._get("blip", self._load_blip)[0]
+
+    @property
+    def blip_model(self):
+        return self._get("blip", self._load_blip)[1]
+
+    def encode_images(self, images: List[Image.Image]) -> np.ndarray:
+        # CLIP handles the preprocessing internally
+        return self.clip_model.encode(images, batch_size=len(images))
+
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        # CLIP can encode text directly
+        return self.clip_model.encode(texts, batch_size=len(texts))
+
+    def caption_images(self, images: List[Image.Image]) -> List[str]:
+        # The processor resizes every image to the same resolution, so the
+        # batch stacks into one tensor; generate() pads the output sequences.
+        inputs = self.blip_processor(images=images, return_tensors="pt").to(self.device)
+        with self.torch.no_grad():
+            out = self.blip_model.generate(**inputs, max_new_tokens=50)
+        return self.blip_processor.batch_decode(out, skip_special_tokens=True)
+
+def create_backend(name: str = None):
+    """Builds the inference backend selected by AI_BACKEND ('torch' or 'onnx')."""
+    name = (name or settings.AI_BACKEND).lower()
+    if name == "onnx":
+        from app.services.onnx_backend import OnnxBackend
+        return OnnxBackend()
+    if name == "torch":
+        return TorchBackend()
+    raise ValueError(f"Unknown AI_BACKEND: {name}")
+
+class AIEngine:
+    def __init__(self, backend=None):
+        self.backend = backend or create_backend()
+
+    @property
+    def load_timings(self):
+        return getattr(self.backend, "load_timings", {})
+
+    @staticmethod
+    def load_image(image_path):
+        """Decodes a file into an upright, reduced RGB PIL image (raises on corrupt files)."""
+        return decode_image(image_path).rgb
 
     def generate_embedding(self, image_path):
         """Converts image to a 512-dim vector for search."""
         try:
-            img = Image.open(image_path)
-            # CLIP handles the preprocessing internally
-            vector = self.clip_model.encode(img)
+            img = self.load_image(image_path)
+            vector = self.backend.encode_images([img])[0]
             return vector.tolist() # Convert numpy -> list for DB
         except Exception as e:
             print(f"❌ Error embedding {image_path}: {e}")
@@ -33,22 +129,33 @@ class AIEngine:
     def generate_caption(self, image_path):
         """Creates a text description of the image."""
         try:
-            img = Image.open(image_path).convert('RGB')
-            
-            # Prepare inputs
-            inputs = self.blip_processor(img, return_tensors="pt").to(self.device)
-            
-            # Generate caption
-            out = self.blip_model.generate(**inputs, max_new_tokens=50)
-            caption = self.blip_processor.decode(out[0], skip_special_tokens=True)
-            
-            return caption
+            img = self.load_image(image_path)
+            return self.backend.caption_images([img])[0]
         except Exception as e:
             print(f"❌ Error captioning {image_path}: {e}")
             return ""
-        
+
+    def generate_embeddings_batch(self, images: List[Image.Image]) -> List[List[float]]:
+        """Embeds a mini-batch of decoded images with a single CLIP encode call."""
+        if not images:
+            return []
+        with timed("clip_image", items=len(images)):
+            return self.backend.encode_images(images).tolist()
+
+    def generate_captions_batch(self, images: List[Image.Image]) -> List[str]:
+        """Captions a mini-batch of decoded images with a single BLIP generate call."""
+        if not images:
+            return []
+        with timed("blip_caption", items=len(images)):
+            return self.backend.caption_images(images)
+
     def generate_text_embedding(self, text_query):
         """Converts a search phrase (e.g. 'party at night') to a vector."""
-        # CLIP can encode text directly
-        vector = self.clip_model.encode(text_query)
-        return vector.tolist()
\ No newline at end of file
+        return self.backend.encode_texts([text_query])[0].tolist()
+
+    def generate_text_embeddings_batch(self, text_queries: List[str]) -> List[List[float]]:
+        """Encodes several search phrases with one CLIP call."""
+        if not text_queries:
+            return []
+        with timed("clip_text", items=len(text_queries)):
+            return self.backend.encode_texts(text_queries).tolist()
@@ -1,112 +1,837 @@
-from qdrant_client import QdrantClient, models
-from typing import List, Any ,Tuple
+from abc import ABC, abstractmethod
+from qdrant_client import QdrantClient, AsyncQdrantClient, models
+from typing import List, Any ,Tuple, Dict
+from collections import OrderedDict
+import asyncio
+import threading
+import time
 import uuid
+import weakref
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import QUEUE_DEPTH, timed
+
+class BufferedUpsertWriter:
+    """
+    Collects PointStructs (per collection) and sends them to Qdrant in one
+    batched upsert once a size or age threshold is reached.
+    Points with the same ID are coalesced, so the newest version wins.
+    Failed batches stay buffered for the next flush; once max_pending points
+    wait, add() blocks (and keeps retrying) instead of growing the buffer.
+    """
+
+    def __init__(self, client: QdrantClient, max_points: int = None, max_delay: float = None, max_retries: int = None, on_flush=None, max_pending: int = None):
+        # on_flush(collection names) runs after points became visible
+        self.client = client
+        self.on_flush = on_flush
+        self.max_points = max_points or settings.UPSERT_BATCH_SIZE
+        self.max_delay = max_delay if max_delay is not None else settings.UPSERT_FLUSH_INTERVAL
+        self.max_retries = max_retries if max_retries is not None else settings.UPSERT_MAX_RETRIES
+        self.max_pending = max(max_pending or settings.UPSERT_MAX_PENDING, self.max_points)
+
+        self._buffers: Dict[str, "OrderedDict[Any, models.PointStruct]"] = {}
+        self._oldest = None  # time.monotonic() of the oldest buffered point
+        self._inflight = 0   # points swapped out by a flush that hasn't returned
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+        # Stats
+        self.flush_count = 0
+        self.points_flushed = 0
+        self.failed_attempts = 0
+        self.backpressure_waits = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+        # Background timer for the age threshold
+        self._closed = threading.Event()
+        self._timer = threading.Thread(target=self._timer_loop, name="upsert-writer", daemon=True)
+        self._timer.start()
+
+    def add(self, collection_name: str, point: models.PointStruct):
+        while True:
+            with self._lock:
+                buffer = self._buffers.setdefault(collection_name, OrderedDict())
+                # Replacing a buffered point never grows the buffer
+                if point.id in buffer or self._pending_locked() + self._inflight < self.max_pending:
+                    buffer[point.id] = point
+                    if self._oldest is None:
+                        self._oldest = time.monotonic()
+                    full = self._pending_locked() >= self.max_points
+                    break
+            # Backpressure: Qdrant keeps failing, so the producer waits on a
+            # flush (with its retries and backoff) instead of piling up points
+            if self._closed.is_set():
+                raise RuntimeError("Upsert buffer is full and the writer is closed")
+            self.backpressure_waits += 1
+            self.flush()
+
+        # Flushing on the caller's thread slows producers down when Qdrant lags
+        if full:
+            self.flush()
+
+    def get_pending(self, collection_name: str, point_id):
+        """Returns a buffered (not yet flushed) point, or None."""
+        with self._lock:
+            return self._buffers.get(collection_name, {}).get(point_id)
+
+    def hold(self):
+        """
+        Holds off flushes (use as a context manager). Inside, a point is
+        either still buffered, so safe to change in place, or already in
+        Qdrant; never swapped out mid-upsert and visible in neither.
+        """
+        return self._flush_lock
+
+    def discard(self, collection_name: str, point_id) -> bool:
+        """Drops a buffered point before it is written. Returns True if it was pending."""
+        with self._lock:
+            return self._buffers.get(collection_name, {}).pop(point_id, None) is not None
+
+    def _pending_locked(self) -> int:
+        return sum(len(b) for b in self._buffers.values())
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._pending_locked()
+
+    def flush(self) -> List[Any]:
+        """
+        Sends everything buffered so far. Failed batches go back into the
+        buffer; returns the IDs of the points that are still unwritten
+        (empty when everything reached Qdrant).
+        """
+        with self._flush_lock:
+            with self._lock:
+                batches, self._buffers = self._buffers, {}
+                self._oldest = None
+                self._inflight = sum(len(b) for b in batches.values())
+
+            flushed = set()
+            unflushed = []
+            for collection_name, buffer in batches.items():
+                points = list(buffer.values())
+                if not points:
+                    continue
+                if self._upsert_with_retry(collection_name, points):
+                    flushed.add(collection_name)
+                else:
+                    self._requeue(collection_name, buffer)
+                    unflushed.extend(buffer)
+                with self._lock:
+                    self._inflight -= len(buffer)
+
+            # Newly visible data: let caches know
+            if flushed and self.on_flush:
+                self.on_flush(flushed)
+            return unflushed
+
+    def _upsert_with_retry(self, collection_name: str, points: List[models.PointStruct]) -> bool:
+        delay = 0.2
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                with timed("qdrant_upsert", items=len(points)):
+                    self.client.upsert(collection_name=collection_name, points=points, wait=True)
+            except Exception as e:
+                self.failed_attempts += 1
+                print(f"⚠️ Bulk upsert of {len(points)} points failed (attempt {attempt + 1}): {e}")
+                if attempt < self.max_retries:
+                    time.sleep(delay)
+                    delay *= 2
+                continue
+
+            elapsed = (time.perf_counter() - start) * 1000
+            self.flush_count += 1
+            self.points_flushed += len(points)
+            self.last_flush_ms = elapsed
+            self.max_flush_ms = max(self.max_flush_ms, elapsed)
+            self._total_flush_ms += elapsed
+            return True
+        return False
+
+    def _requeue(self, collection_name: str, buffer):
+        """Puts a failed batch back without clobbering newer versions of a point."""
+        with self._lock:
+            current = self._buffers.setdefault(collection_name, OrderedDict())
+            for point_id, point in buffer.items():
+                current.setdefault(point_id, point)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+        print(f"❌ Kept {len(buffer)} points buffered for the next flush")
+
+    def _timer_loop(self):
+        interval = max(0.1, min(self.max_delay, 1.0))
+        while not self._closed.wait(interval):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.max_delay
+            if due:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"⚠️ Background flush failed: {e}")
+
+    def close(self):
+        """Stops the timer and flushes whatever is left."""
+        self._closed.set()
+        self._timer.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "flush_count": self.flush_count,
+            "points_flushed": self.points_flushed,
+            "pending_points": self.pending_count(),
+            "failed_attempts": self.failed_attempts,
+            "backpressure_waits": self.backpressure_waits,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "avg_flush_ms": round(self._total_flush_ms / self.flush_count, 2) if self.flush_count else 0.0,
+        }
+
+class _SerializedClient:
+    """Wraps a client so only one thread talks to it at a time."""
+
+    def __init__(self, client):
+        self._client = client
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return call
+
+# The single point of STATE_COLLECTION holding the change tokens
+STATE_POINT_ID = "00000000-0000-0000-0000-000000000001"
+
+# Open stores, for the upsert buffer depth gauge (weak: the gauge never keeps one alive)
+_open_stores = weakref.WeakSet()
+
+def _upsert_buffer_depth():
+    return {("upsert_buffer",): sum(db.writer.pending_count() for db in list(_open_stores))}
+
+QUEUE_DEPTH.add_callback(_upsert_buffer_depth)
+
+class VectorDB(ABC):
+    """
+    Vector store interface shared by every backend. Subclasses only decide
+    how to connect (_connect) and how to search without blocking the event
+    loop (asearch_hybrid); collections, writes and dedup lookups are common.
+    """
+
+    # Payload indexes, HNSW and quantization only exist on a Qdrant server
+    supports_profile = True
 
-class VectorDB:
     def __init__(self):
-        # Initialize Local Qdrant
-        self.client = QdrantClient(host = "localhost",port=6333)
+        self.client = self._connect()
         self.collection_name = "my_photos"
 
-        # Ensure Collection Exists
+        # Ensure Collection Exists (with the configured performance profile)
         if not self.client.collection_exists(self.collection_name):
             self.client.create_collection(
                 collection_name=self.collection_name,
                 vectors_config=models.VectorParams(
                     size=512, 
-                    distance=models.Distance.COSINE
+                    distance=models.Distance.COSINE,
+                    on_disk=settings.QDRANT_ON_DISK_VECTORS
                 ),
+                hnsw_config=self._hnsw_config(),
+                quantization_config=self._quantization_config(),
             )
             print(f"📦 Created collection: {self.collection_name}")
+        elif settings.QDRANT_MIGRATE and self.supports_profile:
+            self._migrate_collection_profile()
+        if self.supports_profile:
+            self._ensure_payload_indexes()
+        self.search_params = self._search_params() if self.supports_profile else None
+
+        # Face references live in their own collection, indexed by name
+        self.faces_collection = settings.FACE_COLLECTION
+        if not self.client.collection_exists(self.faces_collection):
+            self.client.create_collection(
+                collection_name=self.faces_collection,
+                vectors_config=models.VectorParams(
+                    size=settings.FACE_EMBEDDING_SIZE,
+                    distance=models.Distance.COSINE
+                ),
+            )
+            if self.supports_profile:
+                self.client.create_payload_index(
+                    collection_name=self.faces_collection,
+                    field_name="name",
+                    field_schema=models.PayloadSchemaType.KEYWORD
+                )
+            print(f"📦 Created collection: {self.faces_collection}")
+            self._migrate_legacy_references()
+
+        # Every face found in an indexed photo, so new people can be tagged
+        # retroactively without decoding or detecting again
+        self.photo_faces_collection = settings.PHOTO_FACE_COLLECTION
+        if not self.client.collection_exists(self.photo_faces_collection):
+            self.client.create_collection(
+                collection_name=self.photo_faces_collection,
+                vectors_config=models.VectorParams(
+                    size=settings.FACE_EMBEDDING_SIZE,
+                    distance=models.Distance.COSINE,
+                    on_disk=settings.QDRANT_ON_DISK_VECTORS
+                ),
+            )
+            if self.supports_profile:
+                self.client.create_payload_index(
+                    collection_name=self.photo_faces_collection,
+                    field_name="photo_id",
+                    field_schema=models.PayloadSchemaType.KEYWORD
+                )
+            print(f"📦 Created collection: {self.photo_faces_collection}")
+
+        # Change tokens shared between processes (see publish_change)
+        self.state_collection = settings.STATE_COLLECTION
+        if not self.client.collection_exists(self.state_collection):
+            self.client.create_collection(
+                collection_name=self.state_collection,
+                vectors_config=models.VectorParams(size=1, distance=models.Distance.DOT),
+            )
+        if not self.client.retrieve(collection_name=self.state_collection, ids=[STATE_POINT_ID]):
+            self.client.upsert(
+                collection_name=self.state_collection,
+                points=[models.PointStruct(id=STATE_POINT_ID, vector=[1.0], payload={})]
+            )
+
+        # Bumped whenever searchable data changes; search caches key on it
+        self.data_generation = 0
+        # Striped locks: path merges of one point never interleave
+        self._path_locks = [threading.Lock() for _ in range(64)]
+
+        # All writes go through the buffered writer
+        self.writer = BufferedUpsertWriter(self.client, on_flush=self._flushed)
+        _open_stores.add(self)
+
+    @abstractmethod
+    def _connect(self):
+        """Returns the (sync) Qdrant client this store talks to."""
+
+    def bump_generation(self):
+        self.data_generation += 1
+
+    def _flushed(self, collections):
+        self.bump_generation()
+        if self.faces_collection in collections:
+            self.publish_change("faces")
+        if collections - {self.faces_collection}:
+            self.publish_change("data")
+
+    def publish_change(self, kind: str):
+        """
+        Stamps the shared state point: "data" (photos, paths, tags) or
+        "faces" (references). Search replicas in other processes poll it
+        with read_changes(). Never fatal for the write that caused it.
+        """
+        try:
+            self.client.set_payload(
+                collection_name=self.state_collection,
+                payload={kind: time.time_ns()},
+                points=[STATE_POINT_ID]
+            )
+        except Exception as e:
+            print(f"⚠️ Could not publish {kind} change: {e}")
+
+    def read_changes(self) -> Dict[str, int]:
+        """The latest change tokens, e.g. {"data": ..., "faces": ...}."""
+        points = self.client.retrieve(collection_name=self.state_collection, ids=[STATE_POINT_ID], with_payload=True)
+        return dict(points[0].payload or {}) if points else {}
+
+    # --- Collection performance profile ---
+
+    @staticmethod
+    def _hnsw_config():
+        return models.HnswConfigDiff(
+            m=settings.QDRANT_HNSW_M,
+            ef_construct=settings.QDRANT_HNSW_EF_CONSTRUCT
+        )
+
+    @staticmethod
+    def _quantization_config():
+        """int8 scalar quantization; the quantized copy stays in RAM for fast scoring."""
+        if settings.QDRANT_QUANTIZATION != "int8":
+            return None
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True
+            )
+        )
+
+    @staticmethod
+    def _search_params():
+        quantization = None
+        if settings.QDRANT_QUANTIZATION == "int8":
+            # Search the int8 copy, then rescore the top hits on the originals
+            quantization = models.QuantizationSearchParams(
+                rescore=settings.QDRANT_QUANT_RESCORE,
+                oversampling=settings.QDRANT_QUANT_OVERSAMPLING
+            )
+        return models.SearchParams(hnsw_ef=settings.QDRANT_HNSW_EF, quantization=quantization)
+
+    def _migrate_collection_profile(self):
+        """Brings an existing photo collection in line with the configured profile."""
+        config = self.client.get_collection(self.collection_name).config
+        hnsw = config.hnsw_config
+        vectors = config.params.vectors
+        on_disk = bool(getattr(vectors, "on_disk", False))
+        quantized = config.quantization_config is not None
+
+        hnsw_changed = hnsw.m != settings.QDRANT_HNSW_M or hnsw.ef_construct != settings.QDRANT_HNSW_EF_CONSTRUCT
+        disk_changed = on_disk != settings.QDRANT_ON_DISK_VECTORS
+        quant_changed = quantized != (settings.QDRANT_QUANTIZATION == "int8")
+        if not (hnsw_changed or disk_changed or quant_changed):
+            return
+
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            vectors_config={"": models.VectorParamsDiff(on_disk=settings.QDRANT_ON_DISK_VECTORS)} if disk_changed else None,
+            hnsw_config=self._hnsw_config() if hnsw_changed else None,
+            quantization_config=(self._quantization_config() or models.Disabled.DISABLED) if quant_changed else None,
+        )
+        print(f"🔧 Migrated {self.collection_name} profile (hnsw={hnsw_changed}, on_disk={disk_changed}, quantization={quant_changed})")
+
+    def _ensure_payload_indexes(self):
+        """Keyword indexes behind the people filter and the path/hash lookups."""
+        existing = self.client.get_collection(self.collection_name).payload_schema or {}
+        for field in ("people", "path", "paths", "content_hash"):
+            if field not in existing:
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field,
+                    field_schema=models.PayloadSchemaType.KEYWORD
+                )
+                print(f"🗂️ Indexed payload field: {field}")
+
+    def _migrate_legacy_references(self):
+        """Moves reference faces that older versions stored in the photo collection."""
+        legacy_filter = models.Filter(must_not=[
+            models.IsEmptyCondition(is_empty=models.PayloadField(key="name"))
+        ])
+        moved = 0
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=legacy_filter,
+                limit=settings.FACE_LOAD_PAGE_SIZE,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True
+            )
+            if points:
+                self.client.upsert(
+                    collection_name=self.faces_collection,
+                    points=[models.PointStruct(id=p.id, vector=p.vector, payload=p.payload) for p in points]
+                )
+                moved += len(points)
+            if offset is None:
+                break
+
+        if moved:
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=models.FilterSelector(filter=legacy_filter)
+            )
+            print(f"🚚 Moved {moved} reference faces to {self.faces_collection}")
+
+    def flush(self) -> List[Any]:
+        """Pushes any buffered points to Qdrant. Returns the IDs that could not be written."""
+        return self.writer.flush()
+
+    def close(self):
+        """Flushes pending writes. Called from the app's shutdown hook."""
+        self.writer.close()
+        _open_stores.discard(self)
+
+    async def aclose(self):
+        pass
 
     def save_reference_face(self, name: str, embedding: List[float]):
         """Stores a known person's face signature."""
         point_id = str(uuid.uuid4())
-        self.client.upsert(
-            collection_name=self.collection_name,
-            points=[
-                models.PointStruct(
-                    id=point_id,
-                    vector=embedding,
-                    payload={"name": name}
-                )
-            ]
+        self.writer.add(
+            self.faces_collection,
+            models.PointStruct(
+                id=point_id,
+                vector=[float(x) for x in embedding],
+                payload={"name": name}
+            )
         )
         print(f"👤 Saved reference face for: {name}")
 
-    def load_all_references(self) -> Tuple[List[str], List[List[float]]]:
+    def save_reference_faces(self, name: str, embeddings: List[List[float]]):
+        """Stores several reference faces of one person with a single upsert."""
+        if not len(embeddings):
+            return
+        points = [
+            models.PointStruct(
+                id=str(uuid.uuid4()),
+                vector=[float(x) for x in embedding],
+                payload={"name": name}
+            )
+            for embedding in embeddings
+        ]
+        # Written directly (not buffered): the caller reports success right away
+        self.client.upsert(collection_name=self.faces_collection, points=points, wait=True)
+        self.publish_change("faces")
+        print(f"👤 Saved {len(points)} reference faces for: {name}")
+
+    def load_all_references(self) -> Tuple[List[str], np.ndarray]:
         """
         Fetches all known faces from DB on startup.
-        Returns: (List of Names, List of Embeddings)
+        Streams the face collection page by page into a preallocated
+        float32 matrix, so no reference is dropped and nothing is copied twice.
+        Returns: (List of Names, (N, dim) float32 matrix)
         """
-        # We assume you have fewer than 2000 reference people.
-        # scroll() is efficient for dumping data.
-        response = self.client.scroll(
-            collection_name=self.collection_name,
-            limit=2000,
-            with_payload=True,
-            with_vectors=True
-        )
-        
-        # response is a tuple: (list_of_points, next_page_offset)
-        points = response[0]
-        
+        total = self.client.count(collection_name=self.faces_collection, exact=True).count
+        matrix = np.empty((total, settings.FACE_EMBEDDING_SIZE), dtype=np.float32)
         names = []
-        embeddings = []
-        
-        for point in points:
-            if point.payload and 'name' in point.payload:
+
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.faces_collection,
+                limit=settings.FACE_LOAD_PAGE_SIZE,
+                offset=offset,
+                with_payload=["name"],
+                with_vectors=True
+            )
+            for point in points:
+                # References added while we were streaming: grow once
+                if len(names) == len(matrix):
+                    matrix = np.concatenate([matrix, np.empty((max(1, len(matrix)), matrix.shape[1]), dtype=np.float32)])
+                matrix[len(names)] = point.vector
                 names.append(point.payload['name'])
-                embeddings.append(point.vector)
-            
-        return names, embeddings
+            if offset is None:
+                break
 
-    def save_image(self, image_path: str, vector: List[float], people: List[str], caption: str):
+        return names, matrix[:len(names)]
+
+    # --- Per-photo faces ---
+    def save_photo_faces(self, photo_id: str, embeddings: np.ndarray) -> List[str]:
         """
-        Saves the image data + metadata.
+        Buffers the face embeddings of one photo. IDs derive from the photo
+        and face index, so re-ingesting a photo overwrites its faces.
+        Returns the point IDs.
         """
-        point_id = str(uuid.uuid4())
-        
-        self.client.upsert(
-            collection_name=self.collection_name,
-            points=[
+        ids = []
+        for i, embedding in enumerate(embeddings):
+            ids.append(str(uuid.uuid5(uuid.UUID(photo_id), str(i))))
+            self.writer.add(
+                self.photo_faces_collection,
                 models.PointStruct(
-                    id=point_id,
-                    vector=vector,
-                    payload={
-                        "path": image_path,
-                        "people": people,
-                        "caption": caption
-                    }
+                    id=ids[-1],
+                    vector=[float(x) for x in embedding],
+                    payload={"photo_id": photo_id}
                 )
-            ]
+            )
+        return ids
+
+    def iter_photo_faces(self, page_size: int = None):
+        """Yields (photo_ids, (n, dim) float32 matrix) pages of every stored face."""
+        page_size = page_size or settings.FACE_LOAD_PAGE_SIZE
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.photo_faces_collection,
+                limit=page_size,
+                offset=offset,
+                with_payload=["photo_id"],
+                with_vectors=True
+            )
+            if points:
+                matrix = np.asarray([point.vector for point in points], dtype=np.float32)
+                yield [point.payload["photo_id"] for point in points], matrix
+            if offset is None:
+                break
+
+    def add_people(self, tags: Dict[str, List[str]], chunk_size: int = 256) -> int:
+        """
+        Merges names into the 'people' of already indexed photos
+        ({photo_id: [names]}). One retrieve and one batched payload update
+        per chunk. Returns how many photos changed.
+        """
+        changed = 0
+        photo_ids = list(tags)
+        for start in range(0, len(photo_ids), chunk_size):
+            chunk = photo_ids[start:start + chunk_size]
+            with self.writer.hold():
+                changed += self._add_people_chunk(tags, chunk)
+
+        if changed:
+            self.bump_generation()
+        return changed
+
+    def _add_people_chunk(self, tags: Dict[str, List[str]], chunk: List[str]) -> int:
+        """One chunk of add_people; the caller holds off flushes."""
+        changed = 0
+        operations = []
+
+        # Photos still in the write buffer are updated in place
+        stored = []
+        for photo_id in chunk:
+            pending = self.writer.get_pending(self.collection_name, photo_id)
+            if pending is None:
+                stored.append(photo_id)
+                continue
+            people = pending.payload.get("people") or []
+            new = [n for n in tags[photo_id] if n not in people]
+            if new:
+                pending.payload["people"] = people + new
+                changed += 1
+
+        for point in self.client.retrieve(collection_name=self.collection_name, ids=stored,
+                                          with_payload=["people"], with_vectors=False) if stored else []:
+            people = point.payload.get("people") or []
+            new = [n for n in tags[str(point.id)] if n not in people]
+            if new:
+                operations.append(models.SetPayloadOperation(set_payload=models.SetPayload(
+                    payload={"people": people + new}, points=[point.id]
+                )))
+        if operations:
+            self.client.batch_update_points(collection_name=self.collection_name, update_operations=operations)
+            changed += len(operations)
+            self.publish_change("data")
+
+        return changed
+
+    @staticmethod
+    def point_id_for_hash(content_hash: str) -> str:
+        """Deterministic point ID: the first 128 bits of the content hash."""
+        return str(uuid.UUID(hex=content_hash[:32]))
+
+    def get_image(self, point_id: str):
+        """Returns the payload of an image point (buffered or stored), or None."""
+        pending = self.writer.get_pending(self.collection_name, point_id)
+        if pending is not None:
+            return pending.payload
+
+        points = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=[point_id],
+            with_payload=True,
+            with_vectors=False
+        )
+        return points[0].payload if points else None
+
+    def find_by_path(self, image_path: str):
+        """Returns (point_id, payload) of the image indexed under this path, or None."""
+        points, _ = self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=models.Filter(should=[
+                models.FieldCondition(key="paths", match=models.MatchValue(value=image_path)),
+                # Points written before deduplication only carry 'path'
+                models.FieldCondition(key="path", match=models.MatchValue(value=image_path)),
+            ]),
+            limit=1,
+            with_payload=True,
+            with_vectors=False
         )
-        print(f"💾 Saved: {image_path}")
+        if not points:
+            return None
+        return str(points[0].id), points[0].payload
 
-    def search_hybrid(self, query_vector: List[float], must_contain_people: List[str] = []) -> List[Any]:
+    def _set_paths(self, point_id: str, paths: List[str]):
         """
-        Performs vector search with metadata filtering using the NEW API.
+        Rewrites the path list of a point, deleting it when no path is left.
+        The caller holds writer.hold(), so a buffered point can't be swapped
+        out between the lookup and the in-place update.
         """
-        search_filter = None
+        if not paths:
+            self.bump_generation()
+            if not self.writer.discard(self.collection_name, point_id):
+                self.client.delete(
+                    collection_name=self.collection_name,
+                    points_selector=models.PointIdsList(points=[point_id])
+                )
+            # Its faces go with it
+            self.client.delete(
+                collection_name=self.photo_faces_collection,
+                points_selector=models.FilterSelector(filter=models.Filter(must=[
+                    models.FieldCondition(key="photo_id", match=models.MatchValue(value=point_id))
+                ]))
+            )
+            self.publish_change("data")
+            return
+
+        self.bump_generation()
+        update = {"paths": paths, "path": paths[0]}
+        pending = self.writer.get_pending(self.collection_name, point_id)
+        if pending is not None:
+            pending.payload.update(update)
+        else:
+            self.client.set_payload(
+                collection_name=self.collection_name,
+                payload=update,
+                points=[point_id]
+            )
+            self.publish_change("data")
+
+    def _path_lock(self, point_id: str) -> threading.Lock:
+        return self._path_locks[hash(str(point_id)) % len(self._path_locks)]
+
+    def add_path(self, point_id: str, image_path: str):
+        """Merges another location of an already indexed image into its point."""
+        # Read-modify-write: two duplicates linked at once must not drop each
+        # other, and a flush in between must not hide the point from both views
+        with self._path_lock(point_id), self.writer.hold():
+            payload = self.get_image(point_id)
+            if payload is None:
+                return
+            paths = payload.get("paths") or [payload["path"]]
+            if image_path not in paths:
+                self._set_paths(point_id, paths + [image_path])
+                print(f"🔗 Linked duplicate: {image_path}")
+
+    def remove_path(self, point_id: str, image_path: str):
+        """Forgets one location of an image; the point goes away with its last path."""
+        with self._path_lock(point_id), self.writer.hold():
+            payload = self.get_image(point_id)
+            if payload is None:
+                return
+            paths = payload.get("paths") or [payload["path"]]
+            if image_path in paths:
+                self._set_paths(point_id, [p for p in paths if p != image_path])
+
+    def save_image(self, image_path: str, vector: List[float], people: List[str], caption: str, content_hash: str = None, paths: List[str] = None, size: int = None, thumbnails: List[int] = None):
+        """
+        Saves the image data + metadata.
+        With a content_hash the point ID is deterministic, so re-ingesting the
+        same bytes overwrites the point instead of adding a duplicate.
+        """
+        point_id = self.point_id_for_hash(content_hash) if content_hash else str(uuid.uuid4())
+        paths = paths or [image_path]
+        
+        self.writer.add(
+            self.collection_name,
+            models.PointStruct(
+                id=point_id,
+                vector=vector,
+                payload={
+                    "path": paths[0],
+                    "paths": paths,
+                    "people": people,
+                    "caption": caption,
+                    "content_hash": content_hash,
+                    "size": size,
+                    "thumbnails": thumbnails or [],
+                    "indexed_at": time.time()
+                }
+            )
+        )
+        self.bump_generation()
+        print(f"💾 Queued: {image_path}")
+        return point_id
 
-        # Build Filter (If specific people are requested)
-        if must_contain_people:
-            conditions = [
-                models.FieldCondition(
-                    key="people", 
-                    match=models.MatchValue(value=person)
-                ) for person in must_contain_people
-            ]
-            search_filter = models.Filter(must=conditions)
+    @staticmethod
+    def _people_filter(must_contain_people: List[str]):
+        """Every requested person must be tagged on the photo."""
+        if not must_contain_people:
+            return None
+        conditions = [
+            models.FieldCondition(
+                key="people", 
+                match=models.MatchValue(value=person)
+            ) for person in must_contain_people
+        ]
+        return models.Filter(must=conditions)
 
+    def search_hybrid(self, query_vector: List[float], must_contain_people: List[str] = [], limit: int = 10, offset: int = 0, score_threshold: float = None, with_payload=True) -> List[Any]:
+        """
+        Performs vector search with metadata filtering using the NEW API.
+        with_payload may be True or a list of payload keys to return.
+        """
         # --- THE FIX: Use query_points() instead of search() ---
         # This matches the documentation link you provided.
-        result = self.client.query_points(
-            collection_name=self.collection_name,
-            query=query_vector,
-            query_filter=search_filter,
-            limit=10
-        )
+        with timed("qdrant_query"):
+            result = self.client.query_points(
+                collection_name=self.collection_name,
+                query=query_vector,
+                query_filter=self._people_filter(must_contain_people),
+                limit=limit,
+                offset=offset,
+                score_threshold=score_threshold,
+                with_payload=with_payload,
+                search_params=self.search_params
+            )
         
         # The new API returns an object with a .points attribute
-        return result.points
\ No newline at end of file
+        return result.points
+
+    async def asearch_hybrid(self, query_vector: List[float], must_contain_people: List[str] = [], limit: int = 10, offset: int = 0, score_threshold: float = None, with_payload=True) -> List[Any]:
+        """search_hybrid without blocking the event loop."""
+        return await asyncio.to_thread(
+            self.search_hybrid, query_vector, must_contain_people,
+            limit, offset, score_threshold, with_payload
+        )
+
+class ServerVectorDB(VectorDB):
+    """Qdrant server over the network (QDRANT_HOST:QDRANT_PORT)."""
+
+    def _connect(self):
+        # Search requests use the async client so they never block the event loop
+        self.aclient = AsyncQdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
+        return QdrantClient(host=settings.QDRANT_HOST, port=settings.QDRANT_PORT)
+
+    async def asearch_hybrid(self, query_vector: List[float], must_contain_people: List[str] = [], limit: int = 10, offset: int = 0, score_threshold: float = None, with_payload=True) -> List[Any]:
+        """search_hybrid on the async client, for the request path."""
+        with timed("qdrant_query"):
+            result = await self.aclient.query_points(
+                collection_name=self.collection_name,
+                query=query_vector,
+                query_filter=self._people_filter(must_contain_people),
+                limit=limit,
+                offset=offset,
+                score_threshold=score_threshold,
+                with_payload=with_payload,
+                search_params=self.search_params
+            )
+        return result.points
+
+    async def aclose(self):
+        await self.aclient.close()
+
+class EmbeddedVectorDB(VectorDB):
+    """
+    In-process Qdrant (local mode): points persist under QDRANT_PATH, or only
+    in memory with path=":memory:". Search is an exact NumPy dot product
+    with payload filtering, and no request ever leaves the process.
+    """
+
+    supports_profile = False
+
+    def __init__(self, path: str = None):
+        self.path = path or settings.QDRANT_PATH
+        super().__init__()
+
+    def _connect(self):
+        if self.path == ":memory:":
+            client = QdrantClient(location=":memory:")
+        else:
+            client = QdrantClient(path=self.path)
+        # Local mode is not thread-safe; the writer, pipeline and search
+        # threads take turns
+        return _SerializedClient(client)
+
+def create_vector_db(store: str = None) -> VectorDB:
+    """Builds the vector store selected by VECTOR_STORE (server, embedded, memory)."""
+    store = (store or settings.VECTOR_STORE).lower()
+    if store == "server":
+        return ServerVectorDB()
+    if store == "embedded":
+        return EmbeddedVectorDB()
+    if store == "memory":
+        return EmbeddedVectorDB(path=":memory:")
+    raise ValueError(f"Unknown VECTOR_STORE: {store}")
@@ -0,0 +1,91 @@
+# backend/app/services/dedup.py
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app.services.db_service import VectorDB
+
+# Deduplicator.check verdicts
+NEW = "new"
+INDEXED = "indexed"
+DUPLICATE = "duplicate"
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    """Hashes a file in chunks so large originals never sit in memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Deduplicator:
+    """
+    Decides whether a file needs the models at all.
+    1. Cheap pre-check: the path is already indexed, its size matches and it
+       was not modified after indexing -> skip without hashing.
+    2. Otherwise hash it. If the hash already has a point, just link the
+       new path to it -> skip.
+    Files with the same hash inside one import are claimed once; the other
+    paths ride along and are written with the first copy. Their outcome is
+    the first copy's: the pipeline reports them once it settles.
+    """
+
+    def __init__(self, db: VectorDB):
+        self.db = db
+        self._inflight: Dict[str, List[str]] = {}
+        self._riders: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def check(self, path: str) -> Tuple[str, Optional[str], int]:
+        """
+        Returns (verdict, content_hash, size). The verdict is INDEXED (nothing
+        to do), DUPLICATE (rides along with a copy claimed earlier in this
+        run) or NEW (claimed: this file goes through the models).
+        The file is hashed in chunks and nothing is kept: holding raw bytes
+        until decode would let the pipeline queues pin hundreds of originals.
+        """
+        stat = os.stat(path)
+
+        # 1. Pre-check by path, size and mtime
+        record = self.db.find_by_path(path)
+        if record is not None:
+            _, payload = record
+            if payload.get("content_hash") and payload.get("size") == stat.st_size \
+                    and stat.st_mtime <= payload.get("indexed_at", 0):
+                return INDEXED, payload["content_hash"], stat.st_size
+
+        # 2. Hash the bytes (streamed; the decoder reopens the file)
+        content_hash = file_sha256(path)
+
+        # The file at this path changed: detach the path from its old point
+        if record is not None:
+            old_id, payload = record
+            if payload.get("content_hash") != content_hash:
+                self.db.remove_path(old_id, path)
+
+        point_id = self.db.point_id_for_hash(content_hash)
+        if self.db.get_image(point_id) is not None:
+            self.db.add_path(point_id, path)
+            return INDEXED, content_hash, stat.st_size
+
+        # 3. Same bytes already being processed in this run
+        with self._lock:
+            if content_hash in self._inflight:
+                if path not in self._inflight[content_hash]:
+                    self._inflight[content_hash].append(path)
+                self._riders[content_hash] += 1
+                return DUPLICATE, content_hash, stat.st_size
+            self._inflight[content_hash] = [path]
+            self._riders[content_hash] = 0
+        return NEW, content_hash, stat.st_size
+
+    def release(self, content_hash: str) -> Tuple[List[str], int]:
+        """
+        Ends the claim on a hash. Returns every path seen for it and how
+        many DUPLICATE verdicts rode along (([], 0) once released).
+        """
+        with self._lock:
+            return self._inflight.pop(content_hash, []), self._riders.pop(content_hash, 0)
@@ -0,0 +1,178 @@
+# backend/app/services/face_gallery.py
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+
+class FaceGallery:
+    """
+    In-memory gallery of reference faces.
+    Embeddings live in one contiguous float32 matrix that doubles its
+    capacity when full, so registering a face never copies the whole gallery.
+    Each row also carries an index into the list of distinct people.
+    """
+
+    def __init__(self, dim: int = None, capacity: int = 64, use_prototypes: bool = None):
+        self.dim = dim or settings.FACE_EMBEDDING_SIZE
+        self.use_prototypes = settings.FACE_USE_PROTOTYPES if use_prototypes is None else use_prototypes
+
+        self._matrix = np.empty((max(1, capacity), self.dim), dtype=np.float32)
+        self._label_ids = np.empty(max(1, capacity), dtype=np.int32)
+        self._size = 0
+
+        self._names: List[str] = []           # one entry per row
+        self._people: List[str] = []          # distinct names, indexed by label id
+        self._person_index: Dict[str, int] = {}
+
+        self._prototypes = None               # cached (P, dim) matrix
+        self._version = 0                     # bumped by every add
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_arrays(cls, names: Sequence[str], embeddings: np.ndarray, **kwargs) -> "FaceGallery":
+        gallery = cls(capacity=max(64, len(names)), **kwargs)
+        if len(names):
+            gallery.add_many(names, embeddings)
+        return gallery
+
+    # --- Read access ---
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def names(self) -> List[str]:
+        """Name of every reference row (same order as embeddings)."""
+        return self._names
+
+    @property
+    def people(self) -> List[str]:
+        """Distinct registered people."""
+        return list(self._people)
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        return self._matrix[:self._size]
+
+    def count(self, name: str) -> int:
+        label = self._person_index.get(name)
+        if label is None:
+            return 0
+        return int(np.count_nonzero(self._label_ids[:self._size] == label))
+
+    # --- Writes ---
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if needed <= len(self._matrix):
+            return
+        capacity = len(self._matrix)
+        while capacity < needed:
+            capacity *= 2
+
+        matrix = np.empty((capacity, self.dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        labels = np.empty(capacity, dtype=np.int32)
+        labels[:self._size] = self._label_ids[:self._size]
+        self._matrix, self._label_ids = matrix, labels
+
+    def add_many(self, names: Sequence[str], embeddings):
+        """Appends several references in one go (one growth step at most)."""
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        if len(names) != len(embeddings):
+            raise ValueError("names and embeddings must have the same length")
+
+        with self._lock:
+            self._reserve(len(names))
+            start = self._size
+            self._matrix[start:start + len(names)] = embeddings
+            for offset, name in enumerate(names):
+                label = self._person_index.get(name)
+                if label is None:
+                    label = len(self._people)
+                    self._person_index[name] = label
+                    self._people.append(name)
+                self._label_ids[start + offset] = label
+            self._names.extend(names)
+            self._size += len(names)
+            self._prototypes = None
+            self._version += 1
+
+    def add(self, name: str, embedding):
+        self.add_many([name], [embedding])
+
+    # --- Matching ---
+
+    def _snapshot(self):
+        """
+        Rows, labels and people as of one moment, taken under the lock.
+        Rows are only appended (growth copies into a new buffer), so views
+        of the first `size` rows never change under a concurrent add_many.
+        """
+        with self._lock:
+            size = self._size
+            return (self._matrix[:size], self._label_ids[:size], list(self._people),
+                    self._prototypes, self._version)
+
+    def _prototype_matrix(self, matrix, labels, people, prototypes, version) -> np.ndarray:
+        """One L2-normalised mean embedding per person (cached until the next add)."""
+        if prototypes is None:
+            sums = np.zeros((len(people), self.dim), dtype=np.float32)
+            np.add.at(sums, labels, matrix)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            prototypes = sums / np.maximum(norms, 1e-12)
+            with self._lock:
+                # Only cache if no face was added while we were computing
+                if self._version == version:
+                    self._prototypes = prototypes
+        return prototypes
+
+    def _score(self, embeddings) -> Tuple[np.ndarray, List[str]]:
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        matrix, labels, people, prototypes, version = self._snapshot()
+        if len(matrix) == 0 or len(queries) == 0:
+            return np.empty((len(queries), len(people)), dtype=np.float32), people
+
+        if self.use_prototypes:
+            return queries @ self._prototype_matrix(matrix, labels, people, prototypes, version).T, people
+
+        # Best reference per person: (F, N) sims reduced to (F, P)
+        sims = queries @ matrix.T
+        scores = np.full((len(people), len(queries)), -np.inf, dtype=np.float32)
+        np.maximum.at(scores, labels, sims.T)
+        return scores.T, people
+
+    def similarity(self, embeddings) -> np.ndarray:
+        """
+        Scores every query face against every person with one matrix multiply.
+        Returns an (F, P) matrix, P = number of distinct people.
+        """
+        return self._score(embeddings)[0]
+
+    def match(self, embeddings, top_k: int = None, threshold: float = None) -> List[List[Tuple[str, float]]]:
+        """
+        For each query face, returns up to top_k (name, score) pairs whose
+        score clears the threshold, best first.
+        """
+        top_k = top_k or settings.FACE_MATCH_TOP_K
+        threshold = settings.FACE_MATCH_THRESHOLD if threshold is None else threshold
+
+        scores, people = self._score(embeddings)
+        if scores.shape[1] == 0:
+            return [[] for _ in range(len(scores))]
+
+        k = min(top_k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+        results = []
+        for row, candidates in zip(scores, top):
+            ranked = sorted(candidates, key=lambda i: -row[i])
+            results.append([(people[i], float(row[i])) for i in ranked if row[i] > threshold])
+        return results
+
+    def best_matches(self, embeddings, threshold: float = None) -> List[Optional[str]]:
+        """Convenience wrapper: the single best name per face, or None."""
+        return [m[0][0] if m else None for m in self.match(embeddings, top_k=1, threshold=threshold)]
@@ -1,31 +1,89 @@
 # backend/face_engine.py
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 import cv2
 import numpy as np
-from insightface.app import FaceAnalysis
+
+from app.core.config import settings
+from app.core.metrics import timed
+from app.services.face_gallery import FaceGallery
 
 class FaceEngine:
     def __init__(self, db_client, references_dir=".data/faces"):
         self.db = db_client
         self.references_dir = references_dir
         
-        print("⏳ Loading AI Models...")
-        self.app = FaceAnalysis(name='buffalo_l', providers=['CPUExecutionProvider'])
-        self.app.prepare(ctx_id=0, det_size=(640, 640))
+        # The InsightFace models load on first detection; search-only
+        # processes just need the gallery below
+        self._app = None
+        self._app_lock = threading.Lock()
+        self.load_seconds = None
+
+        # Bumped on every gallery change; search caches key on it
+        self.generation = 0
+        # Serializes registrations: one DB write + one gallery update at a time
+        self._register_lock = threading.Lock()
+        self._retag_lock = threading.Lock()
 
         # 1. Try Loading from DB
         print("🔄 Checking Database for known faces...")
-        self.known_names, self.known_embeddings = self.db.load_all_references()
+        names, embeddings = self.db.load_all_references()
+        self.gallery = FaceGallery.from_arrays(names, embeddings)
 
-        # 2. If DB is empty, Scan Folder
-        if not self.known_names:
+        # 2. If DB is empty, Scan Folder. Seeding runs the face models and
+        # writes to the DB, so only ingest-capable roles do it; search
+        # replicas serve whatever the DB holds
+        if len(self.gallery):
+            print(f"✅ Loaded {len(self.gallery)} references for {len(self.gallery.people)} people from Database.")
+        elif settings.APP_ROLE in ("ingest", "all"):
             print("⚠️ DB empty! Scanning 'faces/' folder...")
             self._ingest_references_from_disk()
         else:
-            print(f"✅ Loaded {len(self.known_names)} people from Database.")
-            
-        # Convert list to numpy array for fast calculation
-        self.known_embeddings = np.array(self.known_embeddings)
+            print("⚠️ DB has no face references yet; an ingest instance seeds them from 'faces/'")
+
+    @property
+    def app(self):
+        """The FaceAnalysis pipeline, loaded on first use."""
+        if self._app is None:
+            with self._app_lock:
+                if self._app is None:
+                    from insightface.app import FaceAnalysis
+
+                    print(f"⏳ Loading AI Models ({settings.FACE_MODEL_PACK})...")
+                    start = time.perf_counter()
+                    # Only the two heads we use: no gender/age or 3D landmark models
+                    app = FaceAnalysis(
+                        name=settings.FACE_MODEL_PACK,
+                        allowed_modules=['detection', 'recognition'],
+                        providers=['CPUExecutionProvider']
+                    )
+                    size = settings.FACE_DET_SIZE
+                    app.prepare(ctx_id=0, det_size=(size, size), det_thresh=settings.FACE_DET_THRESHOLD)
+                    self.load_seconds = round(time.perf_counter() - start, 3)
+                    print(f"✅ Face models ready in {self.load_seconds:.2f}s")
+                    self._app = app
+        return self._app
+
+    @property
+    def known_names(self):
+        """Name of every stored reference (one entry per reference photo)."""
+        return self.gallery.names
+
+    @property
+    def known_embeddings(self):
+        return self.gallery.embeddings
+
+    def reload_gallery(self):
+        """Rebuilds the gallery from the DB (references registered by another process)."""
+        names, embeddings = self.db.load_all_references()
+        gallery = FaceGallery.from_arrays(names, embeddings)
+        with self._register_lock:
+            self.gallery = gallery
+            self.generation += 1
+        print(f"🔄 Reloaded {len(gallery)} face references for {len(gallery.people)} people")
 
     def _ingest_references_from_disk(self):
         """One-time setup: Reads images and saves to DB."""
@@ -39,50 +97,136 @@ class FaceEngine:
                 img_path = os.path.join(self.references_dir, file)
                 
                 img = cv2.imread(img_path)
-                faces = self.app.get(img)
+                if img is None:
+                    continue
+                faces = self.detect_faces(img, embed=False)
                 
                 if len(faces) > 0:
-                    embedding = faces[0].normed_embedding
+                    embedding = self._embed(img, faces[0])
                     
                     # SAVE TO DB INSTANTLY
                     self.db.save_reference_face(name, embedding)
                     
                     # Update local memory
-                    self.known_names.append(name)
-                    self.known_embeddings.append(embedding)
+                    self.gallery.add(name, embedding)
+                    self.generation += 1
                     print(f"   💾 Saved to DB: {name}")
 
-    def detect_and_recognize(self, image_path):
-        """Identifies people in a new photo."""
-        img = cv2.imread(image_path)
-        if img is None: return []
+        self.db.flush()
 
-        faces = self.app.get(img)
-        found_names = []
+    @staticmethod
+    def _read_bgr(image):
+        """Accepts a path or an already decoded BGR array (see image_loader)."""
+        if isinstance(image, np.ndarray):
+            return image
+        return cv2.imread(image)
 
-        if len(self.known_embeddings) == 0:
-            return []
+    @staticmethod
+    def _det_input_size(img: np.ndarray) -> Tuple[int, int]:
+        """
+        Detector input (width, height). Adaptive mode keeps the photo's aspect
+        ratio and never upsamples, so a 640x427 photo runs at 640x448 instead
+        of a padded 640x640; multiples of 32 keep the SCRFD strides aligned.
+        """
+        limit = settings.FACE_DET_SIZE
+        if not settings.FACE_DET_ADAPTIVE:
+            return limit, limit
+        h, w = img.shape[:2]
+        scale = min(1.0, limit / max(h, w))
+        return (max(32, int(np.ceil(w * scale / 32)) * 32),
+                max(32, int(np.ceil(h * scale / 32)) * 32))
 
-        for face in faces:
-            # Compare against all known vectors
-            sims = np.dot(self.known_embeddings, face.normed_embedding)
-            best_idx = np.argmax(sims)
-            
-            if sims[best_idx] > 0.5:
-                found_names.append(self.known_names[best_idx])
-        
-        return list(set(found_names))
-    
-    def register_new_face(self, name: str, image_path: str):
+    def detect_faces(self, img: np.ndarray, embed: bool = True):
+        """
+        Runs the detector and, only when asked and only on found faces, the
+        recognition model. Returns insightface Face objects.
+        """
+        from insightface.app.common import Face
+
+        app = self.app
+        bboxes, kpss = app.det_model.detect(img, input_size=self._det_input_size(img), max_num=0, metric='default')
+        faces = []
+        for i in range(bboxes.shape[0]):
+            face = Face(bbox=bboxes[i, 0:4], kps=kpss[i] if kpss is not None else None, det_score=bboxes[i, 4])
+            if embed:
+                self._embed(img, face)
+            faces.append(face)
+        return faces
+
+    def _embed(self, img: np.ndarray, face) -> np.ndarray:
+        """Aligns one detected face and runs the recognition model on it."""
+        self.app.models['recognition'].get(img, face)
+        return face.normed_embedding
+
+    def analyze(self, image, keep_embeddings: bool = False) -> Tuple[List[str], Optional[np.ndarray]]:
+        """
+        Detects faces and names the known ones. Returns (people, embeddings);
+        embeddings are the normalized face vectors when keep_embeddings is
+        set (for retroactive tagging), otherwise None.
         """
-        Manually adds a specific image as a reference for a person.
+        img = self._read_bgr(image)
+        if img is None: return [], None
+
+        # Nobody to recognise and nothing to keep: skip both models
+        if len(self.gallery) == 0 and not keep_embeddings:
+            return [], None
+
+        # Detector first; the recognition model only runs on photos with faces
+        with timed("face_detect", items=1):
+            faces = self.detect_faces(img, embed=False)
+        if not faces:
+            return [], None
+
+        with timed("face_embed", items=len(faces)):
+            embeddings = np.stack([self._embed(img, face) for face in faces]).astype(np.float32)
+        found_names = set()
+        if len(self.gallery):
+            # Compare every face against the whole gallery in one matrix multiply
+            with timed("face_match", items=len(faces)):
+                matches = self.gallery.match(embeddings, top_k=settings.FACE_MATCH_TOP_K)
+                found_names = {name for candidates in matches for name, _ in candidates}
+        return list(found_names), (embeddings if keep_embeddings else None)
+
+    def detect_and_recognize(self, image):
+        """Identifies people in a new photo (path or BGR array)."""
+        return self.analyze(image)[0]
+
+    def retag_existing_photos(self, names: List[str]) -> int:
+        """
+        Tags already indexed photos with newly registered people, using the
+        face embeddings stored at ingest: no decoding, no detection. Each
+        page of stored faces is matched against the whole gallery at once,
+        so a face is only tagged when the new person is among its top
+        FACE_MATCH_TOP_K matches, exactly as at ingest.
+        Returns the number of photos updated.
+        """
+        names = set(names)
+        with self._retag_lock:
+            start = time.perf_counter()
+            tags = {}
+            scanned = 0
+            for photo_ids, embeddings in self.db.iter_photo_faces():
+                scanned += len(photo_ids)
+                matches = self.gallery.match(embeddings, top_k=settings.FACE_MATCH_TOP_K)
+                for photo_id, candidates in zip(photo_ids, matches):
+                    for name, _ in candidates:
+                        if name in names:
+                            tags.setdefault(photo_id, set()).add(name)
+
+            changed = self.db.add_people({pid: sorted(people) for pid, people in tags.items()})
+            print(f"🏷️ Re-tagged {changed} photos with {', '.join(sorted(names))} "
+                  f"({scanned} stored faces in {time.perf_counter() - start:.2f}s)")
+            return changed
+
+    def _reference_embedding(self, img: Optional[np.ndarray]) -> np.ndarray:
+        """
+        The single face of a registration photo.
         Strict Mode: Fails if 0 faces or >1 face found.
         """
-        img = cv2.imread(image_path)
         if img is None:
             raise ValueError("Could not read image file.")
 
-        faces = self.app.get(img)
+        faces = self.detect_faces(img, embed=False)
 
         if len(faces) == 0:
             raise ValueError(f"❌ No face detected in image. Please use a clear photo.")
@@ -91,17 +235,42 @@ class FaceEngine:
             # For reference data, we want certainty. Reject group photos.
             raise ValueError(f"❌ Multiple faces detected. Please use a solo photo for registration.")
 
-        # Get the embedding
-        embedding = faces[0].normed_embedding
-        
-        # 1. Save to DB
-        self.db.save_reference_face(name, embedding.tolist())
-        
-        # 2. Update In-Memory Lists (so we don't need to restart server)
-        self.known_names.append(name)
-        if len(self.known_embeddings) > 0:
-            self.known_embeddings = np.vstack([self.known_embeddings, embedding])
-        else:
-            self.known_embeddings = np.array([embedding])
-            
-        return True
\ No newline at end of file
+        return self._embed(img, faces[0])
+
+    def register_faces_batch(self, name: str, images: List[Optional[np.ndarray]]) -> List[Tuple[bool, Optional[str]]]:
+        """
+        Registers several decoded BGR photos of one person at once.
+        Detection runs on a small thread pool (onnxruntime releases the GIL);
+        accepted faces are then written with one upsert and added to the
+        gallery in one step. Returns (ok, error) per image, in order.
+        """
+        def detect(img):
+            try:
+                return self._reference_embedding(img), None
+            except ValueError as e:
+                return None, str(e)
+            except Exception as e:
+                return None, f"Unexpected Error {e}"
+
+        workers = max(1, min(settings.PIPELINE_FACE_WORKERS, len(images)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            detected = list(pool.map(detect, images))
+
+        accepted = [embedding for embedding, _ in detected if embedding is not None]
+        if accepted:
+            matrix = np.stack(accepted).astype(np.float32)
+            with self._register_lock:
+                # 1. Save to DB
+                self.db.save_reference_faces(name, matrix.tolist())
+                # 2. Update In-Memory Gallery (so we don't need to restart server)
+                self.gallery.add_many([name] * len(accepted), matrix)
+                self.generation += 1
+
+        return [(embedding is not None, error) for embedding, error in detected]
+    
+    def register_new_face(self, name: str, image_path: str):
+        """Manually adds a specific image as a reference for a person."""
+        ok, error = self.register_faces_batch(name, [cv2.imread(image_path)])[0]
+        if not ok:
+            raise ValueError(error)
+        return True
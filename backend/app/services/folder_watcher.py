@@ -0,0 +1,386 @@
+# backend/app/services/folder_watcher.py
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, Float, Integer, String, and_, inspect # type: ignore
+from sqlalchemy.dialects.sqlite import insert # type: ignore
+
+from app.core.config import settings
+from app.services.dedup import file_sha256
+from app.services.ingestion_service import IMAGE_EXTENSIONS
+from app.services.job_queue import JobItem, JobManager
+from app.services.user_db import Base, SessionLocal, engine
+
+# Optional: inotify/FSEvents through watchdog; without it folders are polled
+try:
+    from watchdog.observers import Observer # type: ignore
+except ImportError:
+    Observer = None
+
+# 1. Tables (live in users.db next to the job queue)
+class WatchedFolder(Base):
+    __tablename__ = "watched_folders"
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String, unique=True)
+    created_at = Column(Float)
+    last_sync_at = Column(Float, nullable=True)
+
+class ManifestEntry(Base):
+    """
+    Size/mtime of every image under a watched folder as last ingested.
+    A queued file keeps its stat in queued_size/queued_mtime (with its
+    job_id) until the job item settles; only then does size/mtime move.
+    """
+    __tablename__ = "watch_manifest"
+    # The same file can sit under two watched folders (nested watches)
+    folder_id = Column(Integer, primary_key=True)
+    path = Column(String, primary_key=True)
+    size = Column(Integer, nullable=True)       # None: not ingested yet
+    mtime = Column(Float, nullable=True)
+    job_id = Column(Integer, nullable=True, index=True)
+    queued_size = Column(Integer, nullable=True)
+    queued_mtime = Column(Float, nullable=True)
+
+# Manifests from before per-folder keys are only a cache: drop them and
+# let the first rescan rebuild them (unchanged files dedup by hash)
+if inspect(engine).has_table(ManifestEntry.__tablename__) and \
+        "job_id" not in {c["name"] for c in inspect(engine).get_columns(ManifestEntry.__tablename__)}:
+    ManifestEntry.__table__.drop(bind=engine)
+
+Base.metadata.create_all(bind=engine)
+
+
+def _is_image(path: str) -> bool:
+    return path.lower().endswith(IMAGE_EXTENSIONS)
+
+def _stat(path: str) -> Optional[Tuple[int, float]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+class _Watch:
+    """In-memory state of one watched folder: pending events and timers."""
+
+    def __init__(self, folder_id: int, path: str):
+        self.id = folder_id
+        self.path = path
+        self.lock = threading.Lock()
+        self.changed = set()
+        self.deleted = set()
+        self.moves: List[Tuple[str, str]] = []
+        self.rescan = True          # full scan on start: catches changes made while down
+        self.last_event = 0.0
+        self.last_scan = 0.0
+        self.observer_watch = None
+
+    # watchdog calls dispatch() on the observer thread
+    def dispatch(self, event):
+        with self.lock:
+            self.last_event = time.time()
+            if event.is_directory:
+                # A whole directory appeared, vanished or moved: diff everything
+                if event.event_type in ("created", "deleted", "moved"):
+                    self.rescan = True
+                return
+            if event.event_type == "moved":
+                self.moves.append((event.src_path, event.dest_path))
+            elif event.event_type == "deleted":
+                self.changed.discard(event.src_path)
+                self.deleted.add(event.src_path)
+            elif event.event_type in ("created", "modified", "closed"):
+                self.deleted.discard(event.src_path)
+                self.changed.add(event.src_path)
+
+    def drain(self):
+        with self.lock:
+            changed, deleted, moves = self.changed, self.deleted, self.moves
+            self.changed, self.deleted, self.moves = set(), set(), []
+            return changed, deleted, moves
+
+
+class FolderWatcher:
+    """
+    Keeps watched folders in sync with the index.
+    - New or modified files are queued as an ingestion job.
+    - Deleted files lose their path; the point goes with its last path.
+    - Renames keep their point: the new path is linked before the old one
+      is removed, so the models never run again. Moves reported by the
+      OS are used directly; when polling, a vanished file and a new file of
+      the same size are compared by content hash.
+    A manifest (path, size, mtime) in SQLite is what a rescan diffs against.
+    Queued files only enter it once their job item is done, so a file whose
+    ingestion never happened (crash, cancel) is picked up again.
+    """
+
+    def __init__(self, jobs: JobManager, db_provider: Callable, use_events: bool = None):
+        self.jobs = jobs
+        self.db_provider = db_provider
+        use_events = settings.WATCH_USE_EVENTS if use_events is None else use_events
+        self.observer = Observer() if (use_events and Observer is not None) else None
+        if use_events and Observer is None:
+            print(f"⚠️ watchdog not installed, polling watched folders every {settings.WATCH_POLL_INTERVAL:.0f}s")
+
+        self._watches: Dict[str, _Watch] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Lifecycle ---
+    def start(self):
+        """Re-attaches every folder watched before the restart."""
+        if self._thread is not None:
+            return
+        with SessionLocal() as session:
+            folders = [(f.id, f.path) for f in session.query(WatchedFolder).all()]
+        for folder_id, path in folders:
+            self._attach(folder_id, path)
+        if self.observer is not None:
+            self.observer.start()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._worker, name="folder-watcher", daemon=True)
+        self._thread.start()
+        if folders:
+            print(f"👀 Watching {len(folders)} folders")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(10)
+        self._thread = None
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join(5)
+
+    def _attach(self, folder_id: int, path: str):
+        watch = _Watch(folder_id, path)
+        if self.observer is not None and os.path.isdir(path):
+            watch.observer_watch = self.observer.schedule(watch, path, recursive=True)
+        with self._lock:
+            self._watches[path] = watch
+
+    # --- Management ---
+    def add(self, path: str) -> Dict:
+        path = os.path.abspath(path)
+        with SessionLocal() as session:
+            folder = session.query(WatchedFolder).filter(WatchedFolder.path == path).first()
+            if folder is None:
+                folder = WatchedFolder(path=path, created_at=time.time())
+                session.add(folder)
+                session.commit()
+            folder_id = folder.id
+        if path not in self._watches:
+            self._attach(folder_id, path)
+        return self._describe(path)
+
+    def remove(self, path: str) -> bool:
+        """Stops watching. Indexed photos stay; only the manifest is dropped."""
+        path = os.path.abspath(path)
+        with self._lock:
+            watch = self._watches.pop(path, None)
+        if watch is not None and watch.observer_watch is not None:
+            self.observer.unschedule(watch.observer_watch)
+        with SessionLocal() as session:
+            folder = session.query(WatchedFolder).filter(WatchedFolder.path == path).first()
+            if folder is None:
+                return watch is not None
+            session.query(ManifestEntry).filter(ManifestEntry.folder_id == folder.id).delete()
+            session.delete(folder)
+            session.commit()
+        return True
+
+    def _describe(self, path: str) -> Dict:
+        with SessionLocal() as session:
+            folder = session.query(WatchedFolder).filter(WatchedFolder.path == path).first()
+            files = session.query(ManifestEntry).filter(ManifestEntry.folder_id == folder.id).count()
+            return {
+                "path": folder.path,
+                "files": files,
+                "last_sync_at": folder.last_sync_at,
+                "mode": "events" if self.observer is not None else "polling",
+            }
+
+    def list_folders(self) -> List[Dict]:
+        with self._lock:
+            paths = list(self._watches)
+        return [self._describe(path) for path in paths]
+
+    # --- Sync ---
+    def _worker(self):
+        while not self._stop.wait(0.5):
+            try:
+                self._settle_queued()
+            except Exception as e:
+                print(f"❌ Manifest update failed: {e}")
+            with self._lock:
+                watches = list(self._watches.values())
+            now = time.time()
+            for watch in watches:
+                try:
+                    polling = self.observer is None or watch.observer_watch is None
+                    if watch.rescan or (polling and now - watch.last_scan >= settings.WATCH_POLL_INTERVAL):
+                        watch.rescan = False
+                        watch.drain()
+                        self._full_scan(watch)
+                    elif now - watch.last_event >= settings.WATCH_DEBOUNCE:
+                        changed, deleted, moves = watch.drain()
+                        if changed or deleted or moves:
+                            self._apply_events(watch, changed, deleted, moves)
+                except Exception as e:
+                    print(f"❌ Sync of {watch.path} failed: {e}")
+
+    def _manifest(self, session, folder_id: int) -> Dict[str, Tuple[int, float]]:
+        """Known stats; a file still queued counts with its queued stat, so it isn't queued twice."""
+        rows = session.query(ManifestEntry).filter(ManifestEntry.folder_id == folder_id)
+        return {
+            e.path: (e.queued_size, e.queued_mtime) if e.job_id is not None else (e.size, e.mtime)
+            for e in rows
+        }
+
+    @staticmethod
+    def _settle_queued():
+        """
+        Moves queued stats into the manifest once their job items settle.
+        Done files are recorded. So are failed ones: they used up their
+        retries and are only tried again once they change. Cancelled files
+        keep their old entry (or none), so the next rescan queues them again.
+        """
+        with SessionLocal() as session:
+            rows = session.query(ManifestEntry, JobItem.state).join(JobItem, and_(
+                JobItem.job_id == ManifestEntry.job_id, JobItem.path == ManifestEntry.path
+            )).filter(JobItem.state.in_(("done", "failed", "cancelled"))).all()
+            for entry, state in rows:
+                if state == "cancelled" and entry.size is None:
+                    session.delete(entry)
+                    continue
+                if state != "cancelled":
+                    entry.size, entry.mtime = entry.queued_size, entry.queued_mtime
+                entry.job_id = entry.queued_size = entry.queued_mtime = None
+            if rows:
+                session.commit()
+
+    def _full_scan(self, watch: _Watch):
+        """Diffs the folder on disk against the manifest."""
+        watch.last_scan = time.time()
+        if not os.path.isdir(watch.path):
+            print(f"⚠️ Watched folder is missing: {watch.path}")
+            return
+        current = {}
+        for root, dirs, files in os.walk(watch.path):
+            for file in files:
+                if _is_image(file):
+                    path = os.path.join(root, file)
+                    stat = _stat(path)
+                    if stat is not None:
+                        current[path] = stat
+
+        with SessionLocal() as session:
+            known = self._manifest(session, watch.id)
+        changed = {p: s for p, s in current.items() if known.get(p) != s}
+        deleted = [p for p in known if p not in current]
+        self._sync(watch, known, changed, deleted, [])
+
+    def _apply_events(self, watch: _Watch, changed, deleted, moves):
+        """Applies collected events: only the touched paths are looked at."""
+        with SessionLocal() as session:
+            known = self._manifest(session, watch.id)
+        changed_stats = {}
+        for path in changed:
+            stat = _stat(path) if _is_image(path) else None
+            if stat is None:
+                if path in known:
+                    deleted.add(path)
+            elif known.get(path) != stat:
+                changed_stats[path] = stat
+        moves = [(src, dst) for src, dst in moves if _is_image(src) or _is_image(dst)]
+        self._sync(watch, known, changed_stats, [p for p in deleted if p in known], moves)
+
+    def _sync(self, watch: _Watch, known, changed: Dict[str, Tuple[int, float]],
+              deleted: List[str], moves: List[Tuple[str, str]]):
+        db = self.db_provider()
+        renamed = []
+
+        # 1. Renames the OS told us about
+        for src, dst in moves:
+            stat = _stat(dst) if _is_image(dst) else None
+            if src in known and stat is not None and self._repoint(db, src, dst):
+                renamed.append((src, dst, stat))
+                changed.pop(dst, None)
+            else:
+                if src in known:
+                    deleted.append(src)
+                if stat is not None:
+                    changed[dst] = stat
+
+        # 2. Renames seen by polling: a new file with the size and bytes of a vanished one
+        deleted_by_size: Dict[int, List[str]] = {}
+        for path in deleted:
+            deleted_by_size.setdefault(known[path][0], []).append(path)
+        for path, stat in list(changed.items()):
+            candidates = deleted_by_size.get(stat[0])
+            if path in known or not candidates:
+                continue
+            new_hash = None
+            for old in candidates:
+                record = db.find_by_path(old)
+                if record is None or not record[1].get("content_hash"):
+                    continue
+                new_hash = new_hash or file_sha256(path)
+                if record[1]["content_hash"] == new_hash and self._repoint(db, old, path, record):
+                    renamed.append((old, path, stat))
+                    candidates.remove(old)
+                    deleted.remove(old)
+                    del changed[path]
+                    break
+
+        # 3. New or modified files go through the durable job queue
+        job_id = None
+        if changed:
+            job_id = self.jobs.create_job("watch", watch.path, sorted(changed))
+            print(f"👀 {watch.path}: {len(changed)} new/modified files queued as job {job_id}")
+
+        # 4. Deletions last, so a copy queued above is never orphaned first
+        deleted = list(dict.fromkeys(deleted))
+        for path in deleted:
+            record = db.find_by_path(path)
+            if record is not None:
+                db.remove_path(record[0], path)
+        if deleted:
+            print(f"🗑️ {watch.path}: {len(deleted)} files removed from the index")
+        if renamed:
+            print(f"🔀 {watch.path}: {len(renamed)} files renamed")
+
+        # 5. Manifest: renames are final now, queued files wait for their job
+        with SessionLocal() as session:
+            gone = deleted + [src for src, _, _ in renamed]
+            if gone:
+                session.query(ManifestEntry).filter(
+                    ManifestEntry.folder_id == watch.id, ManifestEntry.path.in_(gone)
+                ).delete(synchronize_session=False)
+            for _, path, (size, mtime) in renamed:
+                row = {"size": size, "mtime": mtime, "job_id": None, "queued_size": None, "queued_mtime": None}
+                session.execute(insert(ManifestEntry).values(folder_id=watch.id, path=path, **row)
+                                .on_conflict_do_update(index_elements=["folder_id", "path"], set_=row))
+            for path, (size, mtime) in changed.items():
+                row = {"job_id": job_id, "queued_size": size, "queued_mtime": mtime}
+                session.execute(insert(ManifestEntry).values(folder_id=watch.id, path=path, **row)
+                                .on_conflict_do_update(index_elements=["folder_id", "path"], set_=row))
+            session.query(WatchedFolder).filter(WatchedFolder.id == watch.id) \
+                .update({"last_sync_at": time.time()})
+            session.commit()
+
+    @staticmethod
+    def _repoint(db, old: str, new: str, record=None) -> bool:
+        """Moves a path on its point: link the new one first, then drop the old."""
+        record = record or db.find_by_path(old)
+        if record is None:
+            return False
+        point_id, _ = record
+        db.add_path(point_id, new)
+        db.remove_path(point_id, old)
+        return True
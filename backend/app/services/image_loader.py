@@ -0,0 +1,51 @@
+# backend/app/services/image_loader.py
+import io
+from dataclasses import dataclass, field
+from typing import Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+
+
+@dataclass
+class DecodedImage:
+    """
+    One decode shared by every engine: an upright RGB PIL image for CLIP,
+    BLIP and thumbnails, and (on demand) the BGR array InsightFace expects.
+    """
+    path: str
+    rgb: Image.Image
+    original_size: Tuple[int, int]
+    _bgr: Optional[np.ndarray] = field(default=None, repr=False)
+
+    @property
+    def bgr(self) -> np.ndarray:
+        if self._bgr is None:
+            self._bgr = np.ascontiguousarray(np.asarray(self.rgb)[:, :, ::-1])
+        return self._bgr
+
+
+def decode_image(source: Union[str, bytes], path: str = None, max_side: int = None) -> DecodedImage:
+    """
+    Decodes a file path or raw bytes at the smallest resolution any model
+    needs. For JPEGs, draft() makes libjpeg scale by 1/2, 1/4 or 1/8 while
+    decoding, so a 24 MP photo never materialises at full size.
+    EXIF orientation is applied once here.
+    """
+    max_side = max_side or settings.DECODE_MAX_SIDE
+    if isinstance(source, (bytes, bytearray)):
+        img = Image.open(io.BytesIO(source))
+    else:
+        # Decode straight from disk: the file is never buffered whole
+        path = path or source
+        img = Image.open(source)
+
+    original_size = img.size
+    img.draft("RGB", (max_side, max_side))
+    img = ImageOps.exif_transpose(img)
+    img = img.convert("RGB")
+    if max(img.size) > max_side:
+        img.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+    return DecodedImage(path=path or "", rgb=img, original_size=original_size)
@@ -1,56 +1,41 @@
 # backend/ingestion_service.py
 import os
-import shutil
 from app.services.ai_service import AIEngine
 from app.services.face_service import FaceEngine
 from app.services.db_service import VectorDB
+from app.services.pipeline import IngestionPipeline
+from app.services.thumbnail_service import ThumbnailService
+
+IMAGE_EXTENSIONS = ('.jpg', '.png', '.jpeg')
 
 class IngestionService:
-    def __init__(self, db: VectorDB, face_engine: FaceEngine, ai_engine: AIEngine):
+    def __init__(self, db: VectorDB, face_engine: FaceEngine, ai_engine: AIEngine, thumbnails: ThumbnailService = None):
         self.db = db
         self.face_engine = face_engine
         self.ai_engine = ai_engine
+        self.thumbnails = thumbnails
 
-    def process_image(self, image_path: str):
-        """
-        Runs the full pipeline on a single image.
-        1. Detect Faces
-        2. Generate CLIP Vector
-        3. Generate Caption
-        4. Save to DB
-        """
-        try:
-            print(f"⚡ Processing: {image_path}")
-            
-            # A. Detect Faces
-            people = self.face_engine.detect_and_recognize(image_path)
-            print("People Face: ",people)
-            # B. Generate Vector (Visual)
-            vector = self.ai_engine.generate_embedding(image_path)
-
-            # C. Generate Caption (Text)
-            caption = self.ai_engine.generate_caption(image_path)
-            print("Caption: " , caption)
+    @staticmethod
+    def iter_images(folder_path: str):
+        """Yields image files under a directory (recursive), lazily."""
+        for root, dirs, files in os.walk(folder_path):
+            for file in files:
+                if file.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(root, file)
 
-            # D. Save to DB
-            self.db.save_image(image_path, vector, people, caption)
-            
-            return True
-        except Exception as e:
-            print(f"❌ Error processing {image_path}: {e}")
-            return False
+    def process_paths(self, image_paths, on_done=None):
+        """Runs a list (or generator) of images through the staged pipeline."""
+        pipeline = IngestionPipeline(self.db, self.face_engine, self.ai_engine, thumbnails=self.thumbnails)
+        saved = pipeline.run(image_paths, on_done=on_done)
+        # Make sure the tail of the import is persisted before reporting success
+        self.db.flush()
+        return saved
 
     def process_folder(self, folder_path: str):
-        """Scans a directory recursively."""
+        """Scans a directory recursively and ingests it through the pipeline."""
         if not os.path.exists(folder_path):
             print(f"❌ Folder not found: {folder_path}")
             return
 
-        count = 0
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if file.lower().endswith(('.jpg', '.png', '.jpeg')):
-                    full_path = os.path.join(root, file)
-                    self.process_image(full_path)
-                    count += 1
-        print(f"✅ Batch Ingestion Complete. Processed {count} images.")
\ No newline at end of file
+        count = self.process_paths(self.iter_images(folder_path))
+        print(f"✅ Batch Ingestion Complete. Processed {count} images.")
@@ -0,0 +1,401 @@
+# backend/app/services/job_queue.py
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Boolean, Column, Float, Index, Integer, String, UniqueConstraint, func # type: ignore
+from sqlalchemy.dialects.sqlite import insert # type: ignore
+
+from app.core.config import settings
+from app.core.metrics import QUEUE_DEPTH
+from app.services.user_db import Base, SessionLocal, engine
+
+# Job states: queued -> running -> done | cancelled
+# Item states: pending -> running -> done | failed | cancelled
+ACTIVE_JOB_STATES = ("queued", "running")
+ITEM_STATES = ("pending", "running", "done", "failed", "cancelled")
+
+# 1. Tables (live in users.db next to the users table)
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String)                   # upload | folder | bulk | watch
+    source = Column(String)                 # folder path, file name or archive name
+    state = Column(String, index=True, default="queued")
+    # False while items may still be added (folder scan, streaming upload)
+    sealed = Column(Boolean, default=True)
+    created_at = Column(Float)
+    started_at = Column(Float, nullable=True)   # start of the current run (reset on resume)
+    finished_at = Column(Float, nullable=True)
+
+class JobItem(Base):
+    __tablename__ = "ingest_job_items"
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, index=True)
+    path = Column(String)
+    state = Column(String, default="pending")
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(Float, default=0.0)
+    error = Column(String, nullable=True)
+    updated_at = Column(Float)
+    __table_args__ = (
+        UniqueConstraint("job_id", "path", name="uq_job_item_path"),
+        Index("ix_job_items_job_state", "job_id", "state"),
+    )
+
+Base.metadata.create_all(bind=engine)
+
+# Started managers, for the queue depth gauge (weak: the gauge never keeps one alive)
+_started = weakref.WeakSet()
+
+def _queue_depths():
+    """Files of active jobs still waiting (including ones backing off before a retry)."""
+    if not _started:
+        return {}
+    with SessionLocal() as session:
+        pending = session.query(func.count(JobItem.id)).join(IngestJob, IngestJob.id == JobItem.job_id) \
+            .filter(IngestJob.state.in_(ACTIVE_JOB_STATES), JobItem.state == "pending").scalar()
+    return {("ingest_jobs",): pending or 0}
+
+QUEUE_DEPTH.add_callback(_queue_depths)
+
+
+class JobManager:
+    """
+    Durable ingestion queue. Every file of a job is a row with its own
+    state, so a restart resumes where it stopped instead of redoing the
+    folder. One worker thread claims pending files in chunks and streams
+    them through a single IngestionService.process_paths run. A file is only checkpointed as
+    done once the vector store flush holding its point succeeds; failed
+    files (and files whose points could not be flushed) are retried with
+    exponential backoff up to JOB_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, ingest_provider: Callable, chunk_size: int = None,
+                 max_attempts: int = None, backoff: float = None):
+        # A getter, so the models are only built when there is work to do
+        self.ingest_provider = ingest_provider
+        self.chunk_size = chunk_size or settings.JOB_CHUNK_SIZE
+        self.max_attempts = max_attempts or settings.JOB_MAX_ATTEMPTS
+        self.backoff = backoff if backoff is not None else settings.JOB_RETRY_BACKOFF
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- Lifecycle ---
+    def start(self):
+        """Resets files interrupted by a crash/restart and starts the worker."""
+        if self._thread is not None:
+            return
+        now = time.time()
+        with SessionLocal() as session:
+            interrupted = session.query(JobItem).filter(JobItem.state == "running") \
+                .update({"state": "pending", "updated_at": now}, synchronize_session=False)
+            resumed = session.query(IngestJob).filter(IngestJob.state == "running") \
+                .update({"started_at": now}, synchronize_session=False)
+            # Streaming jobs (bulk uploads) are sealed by the request that
+            # feeds them; if the process died mid-request nobody will. What
+            # landed is ingested, like a body that was cut short. Folder jobs
+            # are left alone: the worker re-runs their scan.
+            orphaned = session.query(IngestJob).filter(
+                IngestJob.sealed.is_(False), IngestJob.kind != "folder",
+                IngestJob.state.in_(ACTIVE_JOB_STATES)).update({"sealed": True}, synchronize_session=False)
+            session.commit()
+        if resumed:
+            print(f"🔁 Resuming {resumed} ingestion jobs ({interrupted} files were interrupted)")
+        if orphaned:
+            print(f"🔒 Sealed {orphaned} streaming jobs left open by the previous run")
+
+        _started.add(self)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._worker, name="ingest-jobs", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0):
+        """Stops claiming and drains the pipeline; unfinished files resume on the next start."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+        _started.discard(self)
+
+    # --- Producers ---
+    def create_job(self, kind: str, source: str, paths: Iterable[str] = (), sealed: bool = True) -> int:
+        now = time.time()
+        with SessionLocal() as session:
+            # Open until its files are in: a sealed job with no files yet
+            # would be finished by the worker before they land
+            job = IngestJob(kind=kind, source=source, state="queued", sealed=False, created_at=now)
+            session.add(job)
+            session.commit()
+            job_id = job.id
+        self.add_items(job_id, paths)
+        if sealed:
+            self.seal(job_id)
+        return job_id
+
+    def add_items(self, job_id: int, paths: Iterable[str], batch_size: int = 1000) -> int:
+        """Adds files to a job. A path already in the job is ignored."""
+        added = 0
+        batch: List[str] = []
+        for path in paths:
+            batch.append(path)
+            if len(batch) >= batch_size:
+                added += self._insert_items(job_id, batch)
+                batch = []
+        if batch:
+            added += self._insert_items(job_id, batch)
+        if added:
+            self._wake.set()
+        return added
+
+    def _insert_items(self, job_id: int, paths: List[str]) -> int:
+        now = time.time()
+        rows = [{"job_id": job_id, "path": p, "state": "pending", "attempts": 0,
+                 "next_attempt_at": 0.0, "updated_at": now} for p in paths]
+        with SessionLocal() as session:
+            result = session.execute(insert(JobItem).values(rows).on_conflict_do_nothing())
+            session.commit()
+            return result.rowcount or 0
+
+    def seal(self, job_id: int):
+        """No more files will be added: the job finishes once its files are done."""
+        with SessionLocal() as session:
+            session.query(IngestJob).filter(IngestJob.id == job_id).update({"sealed": True})
+            session.commit()
+        self._wake.set()
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancels pending files. Files already in the pipeline still finish."""
+        now = time.time()
+        with SessionLocal() as session:
+            job = session.get(IngestJob, job_id)
+            if job is None:
+                return False
+            if job.state in ACTIVE_JOB_STATES:
+                job.state = "cancelled"
+                job.finished_at = now
+                session.query(JobItem).filter(JobItem.job_id == job_id, JobItem.state == "pending") \
+                    .update({"state": "cancelled", "updated_at": now}, synchronize_session=False)
+                session.commit()
+        return True
+
+    # --- Progress ---
+    def _describe(self, session, job: IngestJob) -> Dict:
+        counts = dict.fromkeys(ITEM_STATES, 0)
+        for state, n in session.query(JobItem.state, func.count(JobItem.id)) \
+                .filter(JobItem.job_id == job.id).group_by(JobItem.state):
+            counts[state] = n
+        total = sum(counts.values())
+        remaining = counts["pending"] + counts["running"]
+
+        # Throughput of the current run (files finished since the last (re)start)
+        rate, eta = None, None
+        if job.started_at:
+            end = job.finished_at or time.time()
+            done_this_run = session.query(func.count(JobItem.id)).filter(
+                JobItem.job_id == job.id, JobItem.state.in_(("done", "failed")),
+                JobItem.updated_at >= job.started_at).scalar()
+            elapsed = end - job.started_at
+            if elapsed > 0 and done_this_run:
+                rate = round(done_this_run / elapsed, 2)
+                if job.state in ACTIVE_JOB_STATES and job.sealed:
+                    eta = round(remaining / rate, 1)
+
+        return {
+            "id": job.id,
+            "kind": job.kind,
+            "source": job.source,
+            "state": job.state,
+            "sealed": job.sealed,
+            "total": total,
+            "counts": counts,
+            "images_per_sec": rate,
+            "eta_seconds": eta,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+
+    def get_job(self, job_id: int, include_errors: int = 20) -> Optional[Dict]:
+        with SessionLocal() as session:
+            job = session.get(IngestJob, job_id)
+            if job is None:
+                return None
+            info = self._describe(session, job)
+            failed = session.query(JobItem.path, JobItem.error).filter(
+                JobItem.job_id == job_id, JobItem.state == "failed").limit(include_errors).all()
+            info["errors"] = [{"path": p, "error": e} for p, e in failed]
+            return info
+
+    def list_jobs(self, limit: int = 50) -> List[Dict]:
+        with SessionLocal() as session:
+            jobs = session.query(IngestJob).order_by(IngestJob.id.desc()).limit(limit).all()
+            return [self._describe(session, job) for job in jobs]
+
+    # --- Worker ---
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                worked = self._scan_folders() or self._run()
+                self._finish_jobs()
+            except Exception as e:
+                print(f"❌ Ingestion job worker error: {e}")
+                worked = False
+            if not worked:
+                self._wake.wait(settings.JOB_POLL_INTERVAL)
+                self._wake.clear()
+
+    def _scan_folders(self) -> bool:
+        """Enumerates one unsealed folder job. Re-running a scan is harmless."""
+        with SessionLocal() as session:
+            job = session.query(IngestJob).filter(
+                IngestJob.kind == "folder", IngestJob.sealed.is_(False),
+                IngestJob.state.in_(ACTIVE_JOB_STATES)).order_by(IngestJob.id).first()
+            if job is None:
+                return False
+            job_id, folder = job.id, job.source
+
+        print(f"📂 Scanning {folder} for job {job_id}...")
+        added = self.add_items(job_id, self.ingest_provider().iter_images(folder))
+        self.seal(job_id)
+        print(f"✅ Job {job_id}: {added} files queued")
+        return True
+
+    def _claim(self) -> List[Tuple[int, int, str, int]]:
+        """Marks the next chunk of due files of the oldest active job as running.
+        Returns (item_id, job_id, path, attempts) tuples."""
+        now = time.time()
+        with SessionLocal() as session:
+            first = session.query(JobItem.job_id).join(IngestJob, IngestJob.id == JobItem.job_id).filter(
+                IngestJob.state.in_(ACTIVE_JOB_STATES), JobItem.state == "pending",
+                JobItem.next_attempt_at <= now).order_by(JobItem.job_id).first()
+            if first is None:
+                return []
+            job_id = first[0]
+            items = session.query(JobItem).filter(
+                JobItem.job_id == job_id, JobItem.state == "pending",
+                JobItem.next_attempt_at <= now).order_by(JobItem.id).limit(self.chunk_size).all()
+            for item in items:
+                item.state = "running"
+                item.updated_at = now
+            job = session.get(IngestJob, job_id)
+            if job.state == "queued":
+                job.state = "running"
+                job.started_at = now
+            session.commit()
+            return [(item.id, item.job_id, item.path, item.attempts) for item in items]
+
+    def _run(self) -> bool:
+        """
+        Runs one long-lived pipeline fed straight from the claim loop: the
+        next chunk is claimed while the previous one is still in flight, so
+        the stages never drain between chunks. Ends when nothing is due.
+        """
+        claimed = self._claim()
+        if not claimed:
+            return False
+
+        ingest = self.ingest_provider()
+        # A path can be queued by two jobs at once: entries per path, in feed order
+        inflight: Dict[str, Deque[Tuple[int, int]]] = {}
+        lock = threading.Lock()
+        # Successes only count once their points are in Qdrant, not just buffered
+        held: List[Tuple[int, int, List[str]]] = []
+
+        def feed():
+            chunk = claimed
+            while chunk:
+                with lock:
+                    for item_id, _, path, attempts in chunk:
+                        inflight.setdefault(path, deque()).append((item_id, attempts))
+                for _, _, path, _ in chunk:
+                    yield path
+                if self._stop.is_set():
+                    return
+                chunk = self._claim()
+
+        def on_done(path: str, ok: bool, error: Optional[str], point_ids: List[str]):
+            with lock:
+                entries = inflight.get(path)
+                if not entries:
+                    return
+                entry = entries.popleft()
+                if not entries:
+                    del inflight[path]
+            if not ok:
+                self._record(entry[0], entry[1], False, error)
+                return
+            held.append((entry[0], entry[1], point_ids))
+            if len(held) >= self.chunk_size:
+                self._checkpoint(ingest.db, held)
+                held.clear()
+                self._finish_jobs()
+
+        error = "No result from pipeline"
+        try:
+            ingest.process_paths(feed(), on_done=on_done)
+        except Exception as e:
+            print(f"❌ Ingestion run failed: {e}")
+            error = str(e)
+
+        self._checkpoint(ingest.db, held)
+        # Anything the pipeline never reported counts as a failed attempt
+        for entries in inflight.values():
+            for item_id, attempts in entries:
+                self._record(item_id, attempts, False, error)
+        return True
+
+    def _checkpoint(self, db, entries: List[Tuple[int, int, List[str]]]):
+        """
+        Flushes, then marks each file done unless one of its own points is
+        still unwritten; those files are retried. Points of other files
+        (or of other jobs) that failed to flush don't affect this one.
+        """
+        if not entries:
+            return
+        unflushed = {str(point_id) for point_id in db.flush()}
+        for item_id, attempts, point_ids in entries:
+            lost = [p for p in point_ids if str(p) in unflushed]
+            error = f"{len(lost)} points could not be written to the vector store" if lost else None
+            self._record(item_id, attempts, not lost, error)
+
+    def _record(self, item_id: int, attempts: int, ok: bool, error: Optional[str]):
+        """Checkpoints one file. Failures go back to pending until attempts run out."""
+        now = time.time()
+        values = {"updated_at": now}
+        if ok:
+            values.update(state="done", error=None)
+        else:
+            attempts += 1
+            values.update(attempts=attempts, error=(error or "")[:500])
+            if attempts < self.max_attempts:
+                values.update(state="pending", next_attempt_at=now + self.backoff * 2 ** (attempts - 1))
+            else:
+                values.update(state="failed")
+        with SessionLocal() as session:
+            # Never resurrect a file that was cancelled meanwhile
+            session.query(JobItem).filter(JobItem.id == item_id, JobItem.state == "running") \
+                .update(values, synchronize_session=False)
+            session.commit()
+
+    def _finish_jobs(self):
+        """Marks sealed jobs with nothing pending or running as done."""
+        now = time.time()
+        with SessionLocal() as session:
+            jobs = session.query(IngestJob).filter(
+                IngestJob.state.in_(ACTIVE_JOB_STATES), IngestJob.sealed.is_(True)).all()
+            for job in jobs:
+                open_items = session.query(func.count(JobItem.id)).filter(
+                    JobItem.job_id == job.id, JobItem.state.in_(("pending", "running"))).scalar()
+                if open_items == 0:
+                    job.state = "done"
+                    job.finished_at = now
+                    job.started_at = job.started_at or now
+                    print(f"✅ Ingestion job {job.id} finished")
+            session.commit()
@@ -0,0 +1,135 @@
+# backend/app/services/name_resolver.py
+import difflib
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+from app.core.config import settings
+
+# Words that point at a person without naming them ("me and my sister").
+# Only the LLM can map those, so they force the slow path.
+RELATION_WORDS = {
+    "me", "my", "mine", "myself", "i", "we", "us", "our",
+    "mom", "mum", "mother", "dad", "father", "parents", "brother", "sister",
+    "sibling", "wife", "husband", "partner", "girlfriend", "boyfriend",
+    "friend", "friends", "bestie", "son", "daughter", "kid", "kids",
+    "grandma", "grandpa", "uncle", "aunt", "cousin", "boss", "colleague",
+}
+
+# Connectors left dangling once a name is cut out of the query
+_EDGE_WORDS = {"and", "with", "of", "&", "plus", "featuring"}
+
+_TOKEN_RE = re.compile(r"[\w&]+(?:'\w+)?")
+
+
+@dataclass
+class NameMatch:
+    exact: List[str] = field(default_factory=list)       # names found verbatim
+    candidates: List[str] = field(default_factory=list)  # fuzzy / ambiguous hits
+    remainder: str = ""                                  # query without exact names
+    needs_llm: bool = False
+
+
+class NameResolver:
+    """
+    Finds registered people in a query without calling the LLM.
+    Only full names (as whole words) filter directly. A first name alone
+    may just be a word ("Rose", "Will", "Grace"), so it only makes its
+    people candidates for the LLM, like near-misses ("rahull") do.
+    The index is rebuilt whenever the live list of names changes.
+    """
+
+    def __init__(self, names_provider: Callable[[], List[str]], fuzzy_cutoff: float = None):
+        self.names_provider = names_provider
+        self.fuzzy_cutoff = fuzzy_cutoff or settings.NAME_FUZZY_CUTOFF
+        self._names: Tuple[str, ...] = ()
+        self._phrases: Dict[Tuple[str, ...], List[str]] = {}
+        self._first_names: Dict[Tuple[str, ...], List[str]] = {}
+        self._vocab: Dict[str, List[str]] = {}
+        self._max_words = 1
+
+    @staticmethod
+    def _tokens(text: str) -> List[str]:
+        tokens = []
+        for token in _TOKEN_RE.findall(text.lower()):
+            # "rahul's" -> "rahul"
+            if token.endswith("'s"):
+                token = token[:-2]
+            tokens.append(token)
+        return tokens
+
+    def _refresh(self):
+        names = tuple(sorted(set(self.names_provider())))
+        if names == self._names:
+            return
+
+        phrases: Dict[Tuple[str, ...], List[str]] = {}
+        first_names: Dict[Tuple[str, ...], List[str]] = {}
+        vocab: Dict[str, List[str]] = {}
+        for name in names:
+            words = tuple(self._tokens(name))
+            if not words:
+                continue
+            phrases.setdefault(words, []).append(name)
+            # First names map to every person who shares them
+            if len(words) > 1:
+                first_names.setdefault(words[:1], []).append(name)
+            for word in words:
+                vocab.setdefault(word, []).append(name)
+
+        self._names = names
+        self._phrases = phrases
+        self._first_names = first_names
+        self._vocab = vocab
+        self._max_words = max((len(p) for p in phrases), default=1)
+
+    @property
+    def names(self) -> List[str]:
+        self._refresh()
+        return list(self._names)
+
+    def resolve(self, query: str) -> NameMatch:
+        self._refresh()
+        tokens = self._tokens(query)
+        match = NameMatch()
+        used = [False] * len(tokens)
+
+        # 1. Longest-first phrase matching over the token stream
+        i = 0
+        while i < len(tokens):
+            for n in range(min(self._max_words, len(tokens) - i), 0, -1):
+                key = tuple(tokens[i:i + n])
+                people = self._phrases.get(key, [])
+                first = self._first_names.get(key, [])
+                if not people and not first:
+                    continue
+                if len(people) == 1 and not first:
+                    if people[0] not in match.exact:
+                        match.exact.append(people[0])
+                else:
+                    match.candidates.extend(p for p in people + first if p not in match.candidates)
+                for j in range(i, i + n):
+                    used[j] = True
+                i += n - 1
+                break
+            i += 1
+
+        # 2. Fuzzy pass over the words we could not place
+        vocab = list(self._vocab)
+        for token, taken in zip(tokens, used):
+            if taken or len(token) < 3 or token in RELATION_WORDS:
+                continue
+            for word in difflib.get_close_matches(token, vocab, n=2, cutoff=self.fuzzy_cutoff):
+                match.candidates.extend(p for p in self._vocab[word] if p not in match.candidates and p not in match.exact)
+
+        # 3. What is left is the visual part of the query
+        remainder = [t for t, taken in zip(tokens, used) if not taken]
+        while remainder and remainder[0] in _EDGE_WORDS:
+            remainder.pop(0)
+        while remainder and remainder[-1] in _EDGE_WORDS:
+            remainder.pop()
+        match.remainder = " ".join(remainder)
+
+        mentions_relation = bool(self._names) and any(t in RELATION_WORDS for t in tokens)
+        match.needs_llm = bool(match.candidates) or mentions_relation
+        return match
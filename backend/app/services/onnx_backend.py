@@ -0,0 +1,384 @@
+# backend/app/services/onnx_backend.py
+"""
+ONNX Runtime inference for CLIP and BLIP.
+
+The torch models are exported once into ONNX_MODEL_DIR (optionally with
+dynamic int8 weight quantization) and then served by onnxruntime, which we
+already ship for InsightFace. An export only lands in ONNX_MODEL_DIR once
+it passes the parity check against torch, which leaves a marker file next
+to the models; sessions are never opened on unverified models. Run it by
+hand with:
+
+    python -m app.services.onnx_backend --export [--quantize] --check
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.services.ai_service import LazyModels
+
+MODELS = ("clip_vision", "clip_text", "blip_vision", "blip_decoder")
+
+
+def _model_path(model_dir: str, name: str, quantized: bool) -> str:
+    return os.path.join(model_dir, f"{name}_int8.onnx" if quantized else f"{name}.onnx")
+
+
+def _parity_marker(model_dir: str, quantized: bool) -> str:
+    return os.path.join(model_dir, "parity_int8.json" if quantized else "parity.json")
+
+
+def _write_marker(model_dir: str, quantized: bool, report: Dict[str, float]):
+    with open(_parity_marker(model_dir, quantized), "w") as f:
+        json.dump({**report, "checked_at": time.time()}, f)
+
+
+def export_verified(model_dir: str = None, quantize: bool = None):
+    """
+    Exports into a scratch directory next to model_dir, checks parity there
+    and only then moves the models into place with a parity marker. A
+    drifted export never reaches the directory sessions are opened from.
+    Returns (torch_backend, parity report).
+    """
+    model_dir = model_dir or settings.ONNX_MODEL_DIR
+    quantize = settings.ONNX_QUANTIZE if quantize is None else quantize
+    parent = os.path.dirname(os.path.abspath(model_dir))
+    os.makedirs(parent, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix=".onnx-export-", dir=parent)
+    try:
+        torch_backend = export_models(model_dir=scratch, quantize=quantize)
+        candidate = OnnxBackend(model_dir=scratch, quantized=quantize)
+        candidate._ready = True
+        report = check_parity(torch_backend, candidate)
+
+        # Passed: promote. Markers of the previous export no longer apply
+        os.makedirs(model_dir, exist_ok=True)
+        for variant in (False, True):
+            if os.path.exists(_parity_marker(model_dir, variant)):
+                os.remove(_parity_marker(model_dir, variant))
+        for entry in os.listdir(scratch):
+            target = os.path.join(model_dir, entry)
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            os.replace(os.path.join(scratch, entry), target)
+        _write_marker(model_dir, quantize, report)
+        print(f"✅ ONNX models verified and installed in {model_dir}")
+        return torch_backend, report
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def export_models(torch_backend=None, model_dir: str = None, quantize: bool = None):
+    """Exports the CLIP towers and BLIP (vision encoder + text decoder) to ONNX."""
+    import torch
+    from app.services.ai_service import TorchBackend
+
+    model_dir = model_dir or settings.ONNX_MODEL_DIR
+    quantize = settings.ONNX_QUANTIZE if quantize is None else quantize
+    os.makedirs(model_dir, exist_ok=True)
+
+    backend = torch_backend or TorchBackend()
+    clip = backend.clip_model[0].model.cpu().eval()
+    blip = backend.blip_model.cpu().eval()
+
+    class ClipVision(torch.nn.Module):
+        def forward(self, pixel_values):
+            return clip.get_image_features(pixel_values=pixel_values)
+
+    class ClipText(torch.nn.Module):
+        def forward(self, input_ids, attention_mask):
+            return clip.get_text_features(input_ids=input_ids, attention_mask=attention_mask)
+
+    class BlipVision(torch.nn.Module):
+        def forward(self, pixel_values):
+            return blip.vision_model(pixel_values=pixel_values)[0]
+
+    class BlipDecoder(torch.nn.Module):
+        def forward(self, input_ids, attention_mask, encoder_hidden_states):
+            return blip.text_decoder(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                encoder_hidden_states=encoder_hidden_states,
+                return_dict=False,
+            )[0]
+
+    print("⏳ Exporting CLIP/BLIP to ONNX...")
+    pixels = torch.randn(1, 3, 224, 224)
+    blip_pixels = torch.randn(1, 3, 384, 384)
+    ids = torch.ones(1, 8, dtype=torch.long)
+    mask = torch.ones(1, 8, dtype=torch.long)
+    with torch.no_grad():
+        image_embeds = BlipVision()(blip_pixels)
+
+    exports = [
+        ("clip_vision", ClipVision(), (pixels,), ["pixel_values"], {"pixel_values": {0: "batch"}}),
+        ("clip_text", ClipText(), (ids, mask), ["input_ids", "attention_mask"],
+         {"input_ids": {0: "batch", 1: "seq"}, "attention_mask": {0: "batch", 1: "seq"}}),
+        ("blip_vision", BlipVision(), (blip_pixels,), ["pixel_values"], {"pixel_values": {0: "batch"}}),
+        ("blip_decoder", BlipDecoder(), (ids, mask, image_embeds), ["input_ids", "attention_mask", "encoder_hidden_states"],
+         {"input_ids": {0: "batch", 1: "seq"}, "attention_mask": {0: "batch", 1: "seq"}, "encoder_hidden_states": {0: "batch"}}),
+    ]
+    for name, module, args, inputs, axes in exports:
+        path = _model_path(model_dir, name, quantized=False)
+        with torch.no_grad():
+            torch.onnx.export(
+                module, args, path,
+                input_names=inputs, output_names=["output"],
+                dynamic_axes={**axes, "output": {0: "batch"}},
+                opset_version=17,
+            )
+        print(f"   📦 {path}")
+
+    # Pre/post-processing travels with the models
+    backend.clip_model[0].processor.save_pretrained(os.path.join(model_dir, "clip_processor"))
+    backend.blip_processor.save_pretrained(os.path.join(model_dir, "blip_processor"))
+    text_config = blip.config.text_config
+    with open(os.path.join(model_dir, "blip_tokens.json"), "w") as f:
+        json.dump({
+            "bos_token_id": text_config.bos_token_id,
+            "eos_token_id": text_config.sep_token_id,
+            "pad_token_id": text_config.pad_token_id,
+        }, f)
+
+    if quantize:
+        quantize_models(model_dir)
+    return backend
+
+
+def quantize_models(model_dir: str = None):
+    """Dynamic int8 weight quantization of every exported model."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    model_dir = model_dir or settings.ONNX_MODEL_DIR
+    for name in MODELS:
+        src = _model_path(model_dir, name, quantized=False)
+        dst = _model_path(model_dir, name, quantized=True)
+        quantize_dynamic(src, dst, weight_type=QuantType.QInt8)
+        print(f"   🗜️ {dst}")
+
+
+class OnnxBackend(LazyModels):
+    """
+    Same interface as TorchBackend, served by onnxruntime on CPU.
+    Each session loads on first use, so a search replica only opens clip_text.
+    Captions stay on torch generate() unless ONNX_CAPTIONS is set.
+    """
+
+    def __init__(self, model_dir: str = None, quantized: bool = None, onnx_captions: bool = None):
+        super().__init__()
+        self.model_dir = model_dir or settings.ONNX_MODEL_DIR
+        self.quantized = settings.ONNX_QUANTIZE if quantized is None else quantized
+        self.onnx_captions = settings.ONNX_CAPTIONS if onnx_captions is None else onnx_captions
+        self._export_lock = threading.Lock()
+        self._ready = False
+        self._export_error = None
+        print(f"⚙️ AI Engine utilizing: onnxruntime ({'int8' if self.quantized else 'fp32'}), "
+              f"captions via {'onnxruntime' if self.onnx_captions else 'torch'}")
+
+    def _ensure_exported(self):
+        """
+        Makes sure verified models are on disk. Called before any model is
+        loaded (outside the LazyModels lock). Search replicas never export:
+        that would load torch CLIP and BLIP on the request path.
+        """
+        if self._ready:
+            return
+        with self._export_lock:
+            if self._ready:
+                return
+            if self._export_error is not None:
+                raise self._export_error
+
+            missing = [n for n in MODELS if not os.path.exists(_model_path(self.model_dir, n, self.quantized))]
+            verified = os.path.exists(_parity_marker(self.model_dir, self.quantized))
+            if missing or not verified:
+                reason = f"missing ({', '.join(missing)})" if missing else "not verified against torch"
+                if settings.APP_ROLE == "search":
+                    raise RuntimeError(
+                        f"ONNX models in {self.model_dir} are {reason}. Export them with "
+                        f"`python -m app.services.onnx_backend --export` or from an ingest instance."
+                    )
+                print(f"⚠️ ONNX models {reason}, exporting from torch...")
+                try:
+                    export_verified(model_dir=self.model_dir, quantize=self.quantized)
+                except Exception as e:
+                    # Don't re-export on every call; a restart tries again
+                    self._export_error = e
+                    raise
+            self._ready = True
+
+    def _session(self, name: str):
+        self._ensure_exported()
+
+        def load():
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            if settings.ONNX_THREADS:
+                options.intra_op_num_threads = settings.ONNX_THREADS
+            return ort.InferenceSession(
+                _model_path(self.model_dir, name, self.quantized),
+                sess_options=options,
+                providers=["CPUExecutionProvider"],
+            )
+        return self._get(name, load)
+
+    @property
+    def clip_processor(self):
+        self._ensure_exported()
+
+        def load():
+            from transformers import CLIPProcessor
+            return CLIPProcessor.from_pretrained(os.path.join(self.model_dir, "clip_processor"))
+        return self._get("clip_processor", load)
+
+    @property
+    def blip_processor(self):
+        self._ensure_exported()
+
+        def load():
+            from transformers import BlipProcessor
+            return BlipProcessor.from_pretrained(os.path.join(self.model_dir, "blip_processor"))
+        return self._get("blip_processor", load)
+
+    @property
+    def tokens(self) -> Dict[str, int]:
+        self._ensure_exported()
+
+        def load():
+            with open(os.path.join(self.model_dir, "blip_tokens.json")) as f:
+                return json.load(f)
+        return self._get("blip_tokens", load)
+
+    @property
+    def torch_captioner(self):
+        """TorchBackend for captions while ONNX_CAPTIONS is off (BLIP loads on first caption)."""
+        def load():
+            from app.services.ai_service import TorchBackend
+            return TorchBackend()
+        return self._get("torch_captioner", load)
+
+    def encode_images(self, images: List[Image.Image]) -> np.ndarray:
+        pixels = self.clip_processor(images=images, return_tensors="np")["pixel_values"]
+        return self._session("clip_vision").run(None, {"pixel_values": pixels.astype(np.float32)})[0]
+
+    def encode_texts(self, texts: List[str]) -> np.ndarray:
+        tokens = self.clip_processor.tokenizer(texts, padding=True, truncation=True, max_length=77, return_tensors="np")
+        return self._session("clip_text").run(None, {
+            "input_ids": tokens["input_ids"].astype(np.int64),
+            "attention_mask": tokens["attention_mask"].astype(np.int64),
+        })[0]
+
+    def caption_images(self, images: List[Image.Image], max_new_tokens: int = 50) -> List[str]:
+        if not self.onnx_captions:
+            return self.torch_captioner.caption_images(images)
+        return self.caption_images_onnx(images, max_new_tokens)
+
+    def caption_images_onnx(self, images: List[Image.Image], max_new_tokens: int = 50) -> List[str]:
+        """
+        Greedy decoding, same as BlipForConditionalGeneration.generate defaults.
+        The decoder is exported without past key/values, so every step re-runs
+        the whole prefix (O(n^2) per caption).
+        """
+        pixels = self.blip_processor(images=images, return_tensors="np")["pixel_values"].astype(np.float32)
+        image_embeds = self._session("blip_vision").run(None, {"pixel_values": pixels})[0]
+
+        batch = len(images)
+        ids = np.full((batch, 1), self.tokens["bos_token_id"], dtype=np.int64)
+        finished = np.zeros(batch, dtype=bool)
+        for _ in range(max_new_tokens):
+            logits = self._session("blip_decoder").run(None, {
+                "input_ids": ids,
+                "attention_mask": np.ones_like(ids),
+                "encoder_hidden_states": image_embeds,
+            })[0]
+            next_ids = logits[:, -1, :].argmax(axis=-1)
+            next_ids = np.where(finished, self.tokens["pad_token_id"], next_ids)
+            ids = np.concatenate([ids, next_ids[:, None]], axis=1)
+            finished |= next_ids == self.tokens["eos_token_id"]
+            if finished.all():
+                break
+        return self.blip_processor.batch_decode(ids, skip_special_tokens=True)
+
+
+def _sample_images() -> List[Image.Image]:
+    """Deterministic synthetic images: flat colours, gradients and noise."""
+    rng = np.random.default_rng(0)
+    images = []
+    for color in [(200, 40, 40), (30, 160, 60), (20, 60, 200)]:
+        images.append(Image.new("RGB", (320, 240), color))
+    gradient = np.linspace(0, 255, 256, dtype=np.uint8)
+    images.append(Image.fromarray(np.stack([np.tile(gradient, (256, 1))] * 3, axis=-1)))
+    images.append(Image.fromarray(rng.integers(0, 255, (256, 256, 3), dtype=np.uint8)))
+    return images
+
+
+SAMPLE_TEXTS = ["a dog on the beach", "birthday party at night", "snowy mountains", "two people eating pizza"]
+
+
+def _cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def check_parity(torch_backend, onnx_backend, images: List[Image.Image] = None, texts: List[str] = None, min_cosine: float = None) -> Dict[str, float]:
+    """
+    Compares ONNX against torch on the same inputs. Vectors must stay above
+    min_cosine so existing torch embeddings in Qdrant remain searchable.
+    Caption agreement and caption latency are reported but not enforced
+    (int8 may reword).
+    """
+    images = images or _sample_images()
+    texts = texts or SAMPLE_TEXTS
+    min_cosine = min_cosine or settings.ONNX_PARITY_MIN_COSINE
+
+    image_cos = _cosine(np.asarray(torch_backend.encode_images(images)), onnx_backend.encode_images(images))
+    text_cos = _cosine(np.asarray(torch_backend.encode_texts(texts)), onnx_backend.encode_texts(texts))
+    # Captions are timed too: ONNX_CAPTIONS should only be turned on where it wins
+    start = time.perf_counter()
+    torch_caps = torch_backend.caption_images(images)
+    torch_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    onnx_caps = onnx_backend.caption_images_onnx(images)
+    onnx_ms = (time.perf_counter() - start) * 1000
+
+    report = {
+        "image_min_cosine": float(image_cos.min()),
+        "text_min_cosine": float(text_cos.min()),
+        "caption_match_rate": sum(a == b for a, b in zip(torch_caps, onnx_caps)) / len(images),
+        "torch_caption_ms": round(torch_ms, 1),
+        "onnx_caption_ms": round(onnx_ms, 1),
+    }
+    print(f"🔍 ONNX parity: {report}")
+    if report["image_min_cosine"] < min_cosine or report["text_min_cosine"] < min_cosine:
+        raise RuntimeError(f"ONNX embeddings drift from torch (min cosine < {min_cosine}): {report}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and verify ONNX versions of CLIP/BLIP")
+    parser.add_argument("--export", action="store_true", help="export the torch models to ONNX (parity is always checked)")
+    parser.add_argument("--quantize", action="store_true", help="also write int8 dynamically quantized models")
+    parser.add_argument("--check", action="store_true", help="compare the installed ONNX models against torch")
+    args = parser.parse_args()
+
+    if args.export:
+        # Exports, checks parity and installs in one step
+        export_verified(quantize=args.quantize)
+    elif args.check:
+        # Re-checks the installed models; a pass (re)writes the parity marker
+        from app.services.ai_service import TorchBackend
+        installed = OnnxBackend(quantized=args.quantize)
+        installed._ready = True
+        report = check_parity(TorchBackend(), installed)
+        _write_marker(installed.model_dir, args.quantize, report)
@@ -0,0 +1,334 @@
+# backend/app/services/pipeline.py
+import queue
+import threading
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import INGESTED, QUEUE_DEPTH, timed
+from app.services.dedup import DUPLICATE, NEW, Deduplicator
+from app.services.image_loader import decode_image
+
+# Marker pushed through the queues once a stage has no more work
+_STOP = object()
+
+
+@dataclass
+class PipelineItem:
+    """One image travelling through the ingestion stages."""
+    path: str
+    image: Any = None             # DecodedImage shared by every model
+    people: List[str] = field(default_factory=list)
+    face_embeddings: Any = None   # (n_faces, 512) array, stored for later re-tagging
+    vector: Optional[List[float]] = None
+    caption: str = ""
+    content_hash: Optional[str] = None
+    size: Optional[int] = None
+    thumbnails: List[int] = field(default_factory=list)
+    point_ids: List[str] = field(default_factory=list)  # points written (or already holding) this image
+    skipped: bool = False  # already indexed, nothing left to do
+    duplicate: bool = False  # rides along with a copy claimed earlier in this run
+    riders: int = 0          # duplicates riding along with this one
+    error: Optional[str] = None
+
+
+class _Stage:
+    """
+    A pool of worker threads reading from a bounded inbox and writing to the
+    next stage's inbox. Workers block on a full outbox, which is what gives
+    the pipeline its backpressure.
+    """
+
+    def __init__(self, name: str, fn: Callable[[List[PipelineItem]], None], workers: int, inbox: queue.Queue, outbox: Optional[queue.Queue], batch_size: int = 1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.inbox = inbox
+        self.outbox = outbox
+        self.batch_size = max(1, batch_size)
+        self.downstream_workers = 0
+        self._alive = self.workers
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"ingest-{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def join(self):
+        for t in self._threads:
+            t.join()
+
+    def _next_batch(self):
+        """Blocks for one item, then greedily drains up to batch_size."""
+        first = self.inbox.get()
+        if first is _STOP:
+            return [], True
+
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                item = self.inbox.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _loop(self):
+        stopped = False
+        while not stopped:
+            batch, stopped = self._next_batch()
+            if not batch:
+                continue
+
+            # Items that already failed or were skipped upstream just pass through
+            todo = [item for item in batch if item.error is None and not item.skipped]
+            if todo:
+                try:
+                    with timed(f"ingest_{self.name}", items=len(todo)):
+                        self.fn(todo)
+                except Exception as e:
+                    for item in todo:
+                        item.error = item.error or f"{self.name}: {e}"
+
+            if self.outbox is not None:
+                for item in batch:
+                    self.outbox.put(item)
+
+        # The last worker out tells every downstream worker to stop
+        with self._lock:
+            self._alive -= 1
+            last = self._alive == 0
+        if last and self.outbox is not None:
+            for _ in range(self.downstream_workers):
+                self.outbox.put(_STOP)
+
+
+# Pipelines currently running, for the queue depth gauge
+_running = weakref.WeakSet()
+
+def _queue_depths():
+    depths = {}
+    for pipeline in list(_running):
+        for name, q in pipeline.queue_depths().items():
+            depths[(f"pipeline_{name}",)] = depths.get((f"pipeline_{name}",), 0) + q
+    return depths
+
+QUEUE_DEPTH.add_callback(_queue_depths)
+
+
+class IngestionPipeline:
+    """
+    Staged, concurrent ingestion; every import (uploads included) runs on it.
+    discover -> hash -> decode -> faces -> clip -> blip -> write, each stage
+    with its own thread pool and a bounded queue in front of it.
+    """
+
+    def __init__(self, db, face_engine, ai_engine, batch_size: int = None, thumbnails=None):
+        self.db = db
+        self.face_engine = face_engine
+        self.ai_engine = ai_engine
+        self.thumbnails = thumbnails
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.dedup = Deduplicator(db)
+        self._stages: List[_Stage] = []
+
+    def queue_depths(self):
+        """Items waiting in front of each stage."""
+        return {stage.name: stage.inbox.qsize() for stage in self._stages}
+
+    # --- Stage functions (each receives a list of live items) ---
+
+    def _hash(self, items: List[PipelineItem]):
+        for item in items:
+            try:
+                verdict, item.content_hash, item.size = self.dedup.check(item.path)
+                item.skipped = verdict != NEW
+                item.duplicate = verdict == DUPLICATE
+            except Exception as e:
+                item.error = f"hash: {e}"
+
+    def _decode(self, items: List[PipelineItem]):
+        for item in items:
+            try:
+                item.image = decode_image(item.path)
+            except Exception as e:
+                item.error = f"decode: {e}"
+                continue
+
+            # Previews come from the pixels we already have; never fatal
+            if self.thumbnails is not None and item.content_hash:
+                try:
+                    item.thumbnails = self.thumbnails.generate(item.content_hash, item.image.rgb)
+                except Exception as e:
+                    print(f"⚠️ Thumbnail failed for {item.path}: {e}")
+
+    def _faces(self, items: List[PipelineItem]):
+        for item in items:
+            try:
+                item.people, item.face_embeddings = self.face_engine.analyze(
+                    item.image.bgr, keep_embeddings=settings.STORE_FACE_EMBEDDINGS
+                )
+            except Exception as e:
+                item.error = f"faces: {e}"
+
+    def _clip(self, items: List[PipelineItem]):
+        try:
+            vectors = self.ai_engine.generate_embeddings_batch([item.image.rgb for item in items])
+        except Exception as e:
+            print(f"⚠️ Batched embedding failed ({e}), falling back to per-image")
+            vectors = [self.ai_engine.generate_embedding(item.path) for item in items]
+        for item, vector in zip(items, vectors):
+            item.vector = vector
+
+    def _blip(self, items: List[PipelineItem]):
+        try:
+            captions = self.ai_engine.generate_captions_batch([item.image.rgb for item in items])
+        except Exception as e:
+            print(f"⚠️ Batched captioning failed ({e}), falling back to per-image")
+            captions = [self.ai_engine.generate_caption(item.path) for item in items]
+        for item, caption in zip(items, captions):
+            item.caption = caption
+            # Decoded pixels are no longer needed past this point
+            item.image = None
+
+    def _write(self, items: List[PipelineItem]):
+        for item in items:
+            paths, item.riders = self.dedup.release(item.content_hash) if item.content_hash else (None, 0)
+            try:
+                point_id = self.db.save_image(
+                    item.path, item.vector, item.people, item.caption,
+                    content_hash=item.content_hash, paths=paths, size=item.size,
+                    thumbnails=item.thumbnails
+                )
+                item.point_ids = [point_id]
+                if item.face_embeddings is not None and len(item.face_embeddings):
+                    item.point_ids += self.db.save_photo_faces(point_id, item.face_embeddings)
+            except Exception as e:
+                item.error = f"write: {e}"
+
+    # --- Orchestration ---
+
+    def run(self, paths: Iterable[str], on_done: Callable[[str, bool, Optional[str], List[str]], None] = None) -> int:
+        """
+        Pushes every path through the pipeline and blocks until all are done.
+        on_done(path, ok, error, point_ids) is called once per image from the
+        final stage; point_ids are the points holding it, which may still sit
+        in the write buffer. A duplicate of a file earlier in the run is
+        reported after that file, with its outcome.
+        Returns the number of images saved.
+        """
+        size = settings.PIPELINE_QUEUE_SIZE
+        queues = [queue.Queue(maxsize=size) for _ in range(7)]
+
+        stages = [
+            _Stage("hash", self._hash, settings.PIPELINE_DECODE_WORKERS, queues[0], queues[1]),
+            _Stage("decode", self._decode, settings.PIPELINE_DECODE_WORKERS, queues[1], queues[2]),
+            _Stage("faces", self._faces, settings.PIPELINE_FACE_WORKERS, queues[2], queues[3]),
+            _Stage("clip", self._clip, settings.PIPELINE_CLIP_WORKERS, queues[3], queues[4], self.batch_size),
+            _Stage("blip", self._blip, settings.PIPELINE_BLIP_WORKERS, queues[4], queues[5], self.batch_size),
+            _Stage("write", self._write, settings.PIPELINE_WRITE_WORKERS, queues[5], queues[6]),
+        ]
+        for stage, nxt in zip(stages, stages[1:]):
+            stage.downstream_workers = nxt.workers
+        # The write stage signals the collector below
+        stages[-1].downstream_workers = 1
+
+        for stage in stages:
+            stage.start()
+        self._stages = stages
+        _running.add(self)
+
+        # 1. Discovery runs in its own thread so walking the disk overlaps inference
+        def discover():
+            try:
+                for path in paths:
+                    queues[0].put(PipelineItem(path=path))
+            except Exception as e:
+                print(f"❌ Discovery failed: {e}")
+            finally:
+                for _ in range(stages[0].workers):
+                    queues[0].put(_STOP)
+
+        discovery = threading.Thread(target=discover, name="ingest-discover", daemon=True)
+        discovery.start()
+
+        # 2. Collect finished items on the calling thread
+        saved = skipped = 0
+
+        def report(item: PipelineItem):
+            nonlocal saved, skipped
+            ok = item.error is None
+            if ok and item.skipped:
+                skipped += 1
+                if item.content_hash:
+                    item.point_ids = [self.db.point_id_for_hash(item.content_hash)]
+                INGESTED.inc(result="skipped")
+            elif ok:
+                saved += 1
+                INGESTED.inc(result="saved")
+            else:
+                INGESTED.inc(result="failed")
+                print(f"❌ Error processing {item.path}: {item.error}")
+            if on_done:
+                try:
+                    on_done(item.path, ok, item.error, item.point_ids)
+                except Exception as e:
+                    print(f"⚠️ on_done callback failed for {item.path}: {e}")
+
+        # Duplicates share the outcome of the copy they ride along with, so
+        # they wait for it (or it waits for them: the counts settle either way)
+        waiting: Dict[str, List[PipelineItem]] = {}
+        settled: Dict[str, List[Any]] = {}  # hash -> [original, riders still to come]
+
+        def ride(rider: PipelineItem, original: PipelineItem):
+            if original.error is not None:
+                rider.error = f"duplicate of {original.path}: {original.error}"
+            report(rider)
+
+        while True:
+            item = queues[6].get()
+            if item is _STOP:
+                break
+            if item.duplicate and item.error is None:
+                entry = settled.get(item.content_hash)
+                if entry is None:
+                    waiting.setdefault(item.content_hash, []).append(item)
+                    continue
+                ride(item, entry[0])
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del settled[item.content_hash]
+                continue
+
+            if item.error is not None and item.content_hash and not item.skipped:
+                # Failed before the write stage released the claim
+                _, riders = self.dedup.release(item.content_hash)
+                item.riders = item.riders or riders
+            report(item)
+            if item.riders:
+                arrived = waiting.pop(item.content_hash, [])
+                for rider in arrived:
+                    ride(rider, item)
+                if item.riders > len(arrived):
+                    settled[item.content_hash] = [item, item.riders - len(arrived)]
+
+        # Riders whose copy never came back (a duplicate that failed upstream
+        # is still counted as one) must not vanish unreported
+        for riders in waiting.values():
+            for rider in riders:
+                rider.error = "the copy it duplicates was never processed"
+                report(rider)
+
+        discovery.join()
+        for stage in stages:
+            stage.join()
+        _running.discard(self)
+        if skipped:
+            print(f"⏭️ Skipped {skipped} images that were already indexed")
+        return saved
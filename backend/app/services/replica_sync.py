@@ -0,0 +1,69 @@
+# backend/app/services/replica_sync.py
+import threading
+from typing import Callable, Dict, Optional
+
+from app.core.config import settings
+
+
+class ReplicaSync:
+    """
+    Keeps a search replica in step with the ingest process. Writers stamp
+    change tokens in Qdrant (VectorDB.publish_change); this thread polls them
+    and, when one moved, invalidates the local result caches ("data") or
+    reloads the face gallery ("faces").
+    """
+
+    def __init__(self, db, face_engine_provider: Callable[[], object], interval: float = None):
+        self.db = db
+        # Returns the loaded FaceEngine or None: a replica that never built
+        # one has no gallery to refresh
+        self.face_engine_provider = face_engine_provider
+        self.interval = interval or settings.REPLICA_SYNC_INTERVAL
+        self._seen: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        # Whatever is stored now was loaded with the components
+        self._seen = self._read()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._worker, name="replica-sync", daemon=True)
+        self._thread.start()
+        print(f"🔁 Replica sync every {self.interval:g}s")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(10)
+        self._thread = None
+
+    def _read(self) -> Dict[str, int]:
+        try:
+            return self.db.read_changes()
+        except Exception as e:
+            print(f"⚠️ Replica sync could not read changes: {e}")
+            return dict(self._seen)
+
+    def sync_once(self):
+        """Applies whatever changed since the last poll."""
+        changes = self._read()
+        if changes.get("data") != self._seen.get("data"):
+            # Local bump only: this replica never publishes
+            self.db.bump_generation()
+        if changes.get("faces") != self._seen.get("faces"):
+            engine = self.face_engine_provider()
+            if engine is not None:
+                try:
+                    engine.reload_gallery()
+                except Exception as e:
+                    print(f"⚠️ Gallery reload failed: {e}")
+                    # Retried on the next poll
+                    changes["faces"] = self._seen.get("faces")
+        self._seen = changes
+
+    def _worker(self):
+        while not self._stop.wait(self.interval):
+            self.sync_once()
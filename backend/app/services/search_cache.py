@@ -0,0 +1,85 @@
+# backend/app/services/search_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+from app.core.config import settings
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe LRU cache with an optional time-to-live per entry."""
+
+    def __init__(self, maxsize: int, ttl: float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, stored_at = entry
+                if self.ttl is None or time.monotonic() - stored_at < self.ttl:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class SearchCache:
+    """
+    The three search tiers:
+    - intents: (query, people generation) -> parsed intent
+    - vectors: visual_query -> CLIP text vector (the model never changes)
+    - results: (vector, people filter, data generation) -> result points
+    Keys embed the generation counters of FaceEngine and VectorDB, so a new
+    registration or ingest makes older entries unreachable; LRU/TTL evicts them.
+    """
+
+    def __init__(self):
+        self.intents = LRUCache(settings.CACHE_INTENT_SIZE, settings.CACHE_INTENT_TTL)
+        self.vectors = LRUCache(settings.CACHE_VECTOR_SIZE, settings.CACHE_VECTOR_TTL)
+        self.results = LRUCache(settings.CACHE_RESULT_SIZE, settings.CACHE_RESULT_TTL)
+
+    def clear(self):
+        self.intents.clear()
+        self.vectors.clear()
+        self.results.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "intents": self.intents.stats(),
+            "vectors": self.vectors.stats(),
+            "results": self.results.stats(),
+        }
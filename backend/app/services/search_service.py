@@ -0,0 +1,115 @@
+# backend/app/services/search_service.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.metrics import timed
+from app.services.agent import SearchAgent
+from app.services.ai_service import AIEngine
+from app.services.db_service import VectorDB
+from app.services.face_service import FaceEngine
+from app.services.search_cache import SearchCache
+from app.services.text_encoder import BatchingTextEncoder
+
+
+class SearchService:
+    """
+    Natural language search: agent parse -> CLIP text vector -> Qdrant.
+    Every step is cached; see SearchCache for the keys and invalidation.
+    The request path is fully async: the LLM and Qdrant are awaited, CLIP
+    runs micro-batched on a small dedicated thread pool, and each stage has
+    its own concurrency limit so one slow dependency cannot eat every request.
+    """
+
+    def __init__(self, db: VectorDB, agent: SearchAgent, ai_engine: AIEngine, face_engine: FaceEngine, cache: SearchCache = None):
+        self.db = db
+        self.agent = agent
+        self.ai_engine = ai_engine
+        self.face_engine = face_engine
+        self.cache = cache or SearchCache()
+
+        self.encode_executor = ThreadPoolExecutor(max_workers=settings.SEARCH_ENCODE_WORKERS, thread_name_prefix="clip-text")
+        # Concurrent queries share CLIP calls; it also caps in-flight encodes
+        self.text_encoder = BatchingTextEncoder(ai_engine.generate_text_embeddings_batch, self.encode_executor)
+        self.llm_limit = asyncio.Semaphore(settings.SEARCH_LLM_CONCURRENCY)
+        self.qdrant_limit = asyncio.Semaphore(settings.SEARCH_QDRANT_CONCURRENCY)
+
+    async def parse(self, query: str) -> dict:
+        key = (query.strip().lower(), self.face_engine.generation)
+        intent = self.cache.intents.get(key)
+        if intent is None:
+            async with self.llm_limit:
+                with timed("agent_parse"):
+                    intent = await self.agent.aparse_query(query)
+            # Don't remember the fallback of a failed LLM call
+            if not intent.get("fallback"):
+                self.cache.intents.set(key, intent)
+        return intent
+
+    async def embed(self, visual_query: str) -> List[float]:
+        vector = self.cache.vectors.get(visual_query)
+        if vector is None:
+            # Includes the micro-batch wait; the CLIP call itself is clip_text
+            with timed("text_embed"):
+                vector = await self.text_encoder.encode(visual_query)
+            self.cache.vectors.set(visual_query, vector)
+        return vector
+
+    async def search(self, query: str, limit: int = 10, offset: int = 0, score_threshold: float = None, fields: List[str] = None) -> Tuple[List[Any], bool]:
+        """
+        Returns one page of results and whether more may follow.
+        The first SEARCH_CANDIDATE_POOL hits (full payload, no threshold) are
+        cached per (vector, people, data generation), so paging through them
+        never re-runs the query. Pages beyond the pool go straight to Qdrant.
+        """
+        # 1. Agent Analysis
+        intent = await self.parse(query)
+        target_people = intent.get('people', [])
+        visual_query = intent.get('visual_query', query)
+
+        # 2. Convert text to vector
+        query_vector = await self.embed(visual_query)
+
+        # 3. Perform Search (candidate pool)
+        pool_size = settings.SEARCH_CANDIDATE_POOL
+        key = (
+            np.asarray(query_vector, dtype=np.float32).tobytes(),
+            tuple(sorted(target_people)),
+            self.db.data_generation,
+        )
+        candidates = self.cache.results.get(key)
+        if candidates is None:
+            async with self.qdrant_limit:
+                candidates = await self.db.asearch_hybrid(query_vector, target_people, limit=pool_size)
+            self.cache.results.set(key, candidates)
+
+        # 4a. Page lies inside the pool (or the pool is everything there is)
+        exhausted = len(candidates) < pool_size
+        if offset + limit <= len(candidates) or exhausted:
+            hits = candidates
+            if score_threshold is not None:
+                # Scores are sorted, so the threshold just shortens the list
+                hits = [p for p in candidates if p.score >= score_threshold]
+            page = hits[offset:offset + limit]
+            # More follows inside the pool, or past a full, uncut pool
+            beyond_pool = not exhausted and len(hits) == len(candidates)
+            return page, offset + limit < len(hits) or (beyond_pool and offset + limit == len(hits))
+
+        # 4b. Deep page: ask Qdrant directly, fetching only the wanted fields
+        # (None = the whole payload, [] = none at all, e.g. IDs/thumbnails only)
+        with_payload = True if fields is None else (fields or False)
+        async with self.qdrant_limit:
+            page = await self.db.asearch_hybrid(
+                query_vector, target_people,
+                limit=limit, offset=offset,
+                score_threshold=score_threshold,
+                with_payload=with_payload
+            )
+        return page, len(page) == limit
+
+    async def close(self):
+        await self.text_encoder.close()
+        self.encode_executor.shutdown(wait=False)
@@ -0,0 +1,139 @@
+# backend/app/services/text_encoder.py
+import asyncio
+import weakref
+from collections import Counter
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.metrics import QUEUE_DEPTH
+
+# Upper edges of the batch-size histogram buckets
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+# Live encoders, for the queue depth gauge (weak: the gauge never keeps one alive)
+_encoders = weakref.WeakSet()
+
+def _queue_depths():
+    depth = sum(e._queue.qsize() for e in list(_encoders) if e._queue is not None)
+    return {("text_encoder",): depth}
+
+QUEUE_DEPTH.add_callback(_queue_depths)
+
+
+class BatchingTextEncoder:
+    """
+    Micro-batching front end for the CLIP text tower.
+    Concurrent callers await encode(text); a collector task gathers requests
+    for up to window_ms (or max_batch items), encodes them with one call on
+    the executor and hands each vector back to its caller.
+    """
+
+    def __init__(self, encode_batch: Callable[[List[str]], List[List[float]]], executor: Executor, window_ms: float = None, max_batch: int = None, max_inflight: int = None):
+        self.encode_batch = encode_batch
+        self.executor = executor
+        self.window = (settings.TEXT_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+        self.max_batch = max_batch or settings.TEXT_BATCH_MAX
+        self.max_inflight = max_inflight or settings.SEARCH_ENCODE_CONCURRENCY
+
+        # Created on first use, inside the running event loop
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        # The loop only keeps weak references to tasks: hold running batches here
+        self._batch_tasks: Set[asyncio.Task] = set()
+
+        # Stats
+        self.requests = 0
+        self.batches = 0
+        self.max_queue_depth = 0
+        self.batch_sizes = Counter()
+        _encoders.add(self)
+
+    def _ensure_started(self):
+        if self._collector is None or self._collector.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_inflight)
+            self._collector = asyncio.get_running_loop().create_task(self._collect())
+
+    async def encode(self, text: str) -> List[float]:
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self.requests += 1
+        await self._queue.put((text, future))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # While every slot is busy we wait here, and the queue keeps growing
+            # into a bigger next batch
+            await self._slots.acquire()
+            task = loop.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        try:
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            self.batches += 1
+            self.batch_sizes[self._bucket(len(batch))] += 1
+
+            loop = asyncio.get_running_loop()
+            try:
+                vectors = await loop.run_in_executor(self.executor, self.encode_batch, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            by_text = dict(zip(texts, vectors))
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+        finally:
+            self._slots.release()
+
+    @staticmethod
+    def _bucket(size: int) -> str:
+        for edge in BATCH_BUCKETS:
+            if size <= edge:
+                return str(edge)
+        return f"{BATCH_BUCKETS[-1]}+"
+
+    async def close(self):
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            self._collector = None
+        # Batches already on the executor still answer their callers
+        if self._batch_tasks:
+            await asyncio.gather(*self._batch_tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "batch_size_histogram": {b: self.batch_sizes.get(b, 0) for b in [str(e) for e in BATCH_BUCKETS] + [f"{BATCH_BUCKETS[-1]}+"]},
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+        }
@@ -0,0 +1,79 @@
+# backend/app/services/thumbnail_service.py
+import os
+import tempfile
+from typing import List
+
+from PIL import Image, ImageOps, features
+
+from app.core.config import settings
+
+
+class ThumbnailService:
+    """
+    Content-addressed, size-bucketed previews:
+    THUMBNAIL_DIR/<hash[:2]>/<hash>_<size>.<webp|jpg>
+    The key is the image's content hash, so a thumbnail never goes stale
+    and identical photos share one set of files.
+    """
+
+    def __init__(self, root: str = None, sizes: List[int] = None, fmt: str = None, quality: int = None):
+        self.root = root or settings.THUMBNAIL_DIR
+        self.sizes = sorted(sizes or settings.THUMBNAIL_SIZES)
+        self.quality = quality or settings.THUMBNAIL_QUALITY
+
+        fmt = (fmt or settings.THUMBNAIL_FORMAT).lower()
+        if fmt == "webp" and not features.check("webp"):
+            print("⚠️ Pillow has no WebP support, falling back to JPEG thumbnails")
+            fmt = "jpeg"
+        self.format = fmt
+        self.extension = "webp" if fmt == "webp" else "jpg"
+        self.media_type = "image/webp" if fmt == "webp" else "image/jpeg"
+        os.makedirs(self.root, exist_ok=True)
+
+    def bucket(self, requested: int) -> int:
+        """Smallest bucket that covers the requested size (largest if none does)."""
+        for size in self.sizes:
+            if size >= requested:
+                return size
+        return self.sizes[-1]
+
+    def path_for(self, key: str, size: int) -> str:
+        return os.path.join(self.root, key[:2], f"{key}_{size}.{self.extension}")
+
+    def _write(self, image: Image.Image, path: str):
+        """Atomic write, so a concurrent reader never sees half a file."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                image.save(f, format=self.format.upper(), quality=self.quality)
+            os.replace(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def generate(self, key: str, image: Image.Image, sizes: List[int] = None) -> List[int]:
+        """Writes every missing bucket from an already decoded RGB image."""
+        written = []
+        # Largest first: each smaller bucket is resized from the previous one
+        source = image
+        for size in sorted(sizes or self.sizes, reverse=True):
+            path = self.path_for(key, size)
+            thumb = source.copy()
+            thumb.thumbnail((size, size), Image.Resampling.LANCZOS)
+            if not os.path.exists(path):
+                self._write(thumb, path)
+            written.append(size)
+            source = thumb
+        return sorted(written)
+
+    def ensure(self, key: str, size: int, source_path: str) -> str:
+        """Path of one thumbnail, created from the original on first request."""
+        path = self.path_for(key, size)
+        if not os.path.exists(path):
+            with Image.open(source_path) as img:
+                img.draft("RGB", (size, size))
+                img = ImageOps.exif_transpose(img).convert("RGB")
+                self.generate(key, img, sizes=[size])
+        return path
@@ -0,0 +1,426 @@
+# backend/app/services/upload_store.py
+import hashlib
+import io
+import os
+import queue
+import tarfile
+import tempfile
+import threading
+import zipfile
+from typing import Callable, Dict, Optional
+
+from app.core.config import settings
+from app.services.ingestion_service import IMAGE_EXTENSIONS
+
+# python-multipart (already required by FastAPI forms) renamed its package
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header # type: ignore
+except ImportError:
+    from multipart.multipart import MultipartParser, parse_options_header # type: ignore
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+
+def _is_image(name: str) -> bool:
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+def _is_archive(name: str) -> bool:
+    return name.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+class UploadLimitError(ValueError):
+    """An upload went over one of the UPLOAD_* / ARCHIVE_* limits."""
+
+
+def clean_filename(name: Optional[str]) -> str:
+    """The base name of a client-supplied file name. ValueError if there is none."""
+    base = os.path.basename((name or "").replace("\\", "/")).strip()
+    if not base or base in (".", "..") or len(base) > 255 or any(ord(c) < 32 for c in base):
+        raise ValueError(f"Invalid file name: {name!r}")
+    return base
+
+
+class _ArchiveBudget:
+    """Entries and extracted bytes left for the archives of one request."""
+
+    def __init__(self):
+        self.entries = settings.ARCHIVE_MAX_ENTRIES
+        self.bytes = settings.ARCHIVE_MAX_UNCOMPRESSED_BYTES
+
+    def take_entry(self):
+        self.entries -= 1
+        if self.entries < 0:
+            raise UploadLimitError(f"Archives hold more than {settings.ARCHIVE_MAX_ENTRIES} entries")
+
+    def check_bytes(self, n: int):
+        if n > self.bytes:
+            raise UploadLimitError(f"Archives expand to more than {settings.ARCHIVE_MAX_UNCOMPRESSED_BYTES} bytes")
+
+    def take_bytes(self, n: int):
+        self.check_bytes(n)
+        self.bytes -= n
+
+
+class UploadWriter:
+    """One file being streamed into the store, hashed as it is written."""
+
+    def __init__(self, store: "UploadStore", filename: str, budget: Optional[_ArchiveBudget] = None):
+        self.store = store
+        self.budget = budget
+        self.size = 0
+        self.extension = os.path.splitext(filename)[1].lower()
+        fd, self.tmp_path = tempfile.mkstemp(dir=store.incoming_dir, suffix=".part")
+        self.file = os.fdopen(fd, "wb")
+        self.digest = hashlib.sha256()
+
+    def write(self, chunk: bytes):
+        # Counted as written, so a lying archive header gains nothing
+        self.size += len(chunk)
+        if self.size > settings.UPLOAD_MAX_FILE_BYTES:
+            raise UploadLimitError(f"File is larger than {settings.UPLOAD_MAX_FILE_BYTES} bytes")
+        if self.budget is not None:
+            self.budget.take_bytes(len(chunk))
+        self.digest.update(chunk)
+        self.file.write(chunk)
+
+    def commit(self) -> str:
+        """Moves the file to its content-addressed name. Identical bytes land on the same file."""
+        self.file.close()
+        path = self.store.path_for(self.digest.hexdigest(), self.extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(self.tmp_path)
+        else:
+            os.replace(self.tmp_path, path)
+        return path
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class UploadStore:
+    """
+    Uploaded originals under UPLOAD_DIR/<hash[:2]>/<hash><ext>.
+    Two uploads with the same name never overwrite each other, and the
+    same photo uploaded twice is stored once.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = root or settings.UPLOAD_DIR
+        self.incoming_dir = os.path.join(self.root, ".incoming")
+        os.makedirs(self.incoming_dir, exist_ok=True)
+
+    def path_for(self, content_hash: str, extension: str) -> str:
+        return os.path.join(self.root, content_hash[:2], content_hash + extension)
+
+    def writer(self, filename: str, budget: Optional[_ArchiveBudget] = None) -> UploadWriter:
+        return UploadWriter(self, filename, budget)
+
+    def save_stream(self, fileobj, filename: str, chunk_size: int = None, budget: Optional[_ArchiveBudget] = None) -> str:
+        """Copies a file object into the store in chunks."""
+        chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+        writer = self.writer(filename, budget)
+        try:
+            for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+                writer.write(chunk)
+        except Exception:
+            writer.abort()
+            raise
+        return writer.commit()
+
+
+# --- Sinks: consume a body chunk by chunk, report every stored image ---
+
+class _ImageSink:
+    def __init__(self, store: UploadStore, filename: str, on_file: Callable[[str], None]):
+        self.writer = store.writer(filename)
+        self.on_file = on_file
+
+    def feed(self, chunk: bytes):
+        self.writer.write(chunk)
+
+    def close(self):
+        self.on_file(self.writer.commit())
+
+    def abort(self):
+        self.writer.abort()
+
+
+class _ChunkPipe(io.RawIOBase):
+    """Blocking file object fed from another thread, so tarfile can read a body as it arrives."""
+
+    def __init__(self, maxsize: int = 16):
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=maxsize)
+        self._buffer = b""
+        self._pos = 0
+        self._eof = False
+
+    def readable(self):
+        return True
+
+    def put(self, chunk: Optional[bytes], alive: Callable[[], bool]):
+        # Never block forever on a reader that stopped (bad archive, end marker reached)
+        while alive():
+            try:
+                self._queue.put(chunk, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) - self._pos < size):
+            chunk = self._queue.get()
+            if chunk is None:
+                self._eof = True
+            else:
+                # Only the unread tail is copied, once per incoming chunk
+                self._buffer = self._buffer[self._pos:] + chunk
+                self._pos = 0
+        if size < 0:
+            size = len(self._buffer) - self._pos
+        data = self._buffer[self._pos:self._pos + size]
+        self._pos += len(data)
+        return data
+
+
+class _TarSink:
+    """Extracts a (compressed) tar stream in a thread while the body is still arriving."""
+
+    def __init__(self, store: UploadStore, on_file: Callable[[str], None], on_skip: Callable[[str], None], budget: _ArchiveBudget):
+        self.store = store
+        self.on_file = on_file
+        self.on_skip = on_skip
+        self.budget = budget
+        self.pipe = _ChunkPipe()
+        self.error: Optional[Exception] = None
+        self.thread = threading.Thread(target=self._extract, name="upload-tar", daemon=True)
+        self.thread.start()
+
+    def _extract(self):
+        try:
+            with tarfile.open(fileobj=self.pipe, mode="r|*") as archive:
+                for member in archive:
+                    self.budget.take_entry()
+                    if not member.isfile():
+                        continue
+                    if not _is_image(member.name):
+                        self.on_skip(member.name)
+                        continue
+                    self.on_file(self.store.save_stream(archive.extractfile(member), member.name, budget=self.budget))
+        except Exception as e:
+            self.error = e
+        finally:
+            # Drain whatever the request still sends after the end of the archive
+            while self.pipe.read(1 << 16):
+                pass
+
+    def _raise_error(self):
+        if isinstance(self.error, UploadLimitError):
+            raise self.error
+        if self.error:
+            raise ValueError(f"Invalid tar archive: {self.error}")
+
+    def feed(self, chunk: bytes):
+        self._raise_error()
+        self.pipe.put(chunk, self.thread.is_alive)
+
+    def close(self):
+        self.pipe.put(None, self.thread.is_alive)
+        self.thread.join()
+        self._raise_error()
+
+    def abort(self):
+        self.pipe.put(None, self.thread.is_alive)
+
+
+class _ZipSink:
+    """
+    Zip keeps its index at the end of the file, so the body is spooled to
+    disk first and extracted entry by entry once it is complete.
+    """
+
+    def __init__(self, store: UploadStore, on_file: Callable[[str], None], on_skip: Callable[[str], None], budget: _ArchiveBudget):
+        self.store = store
+        self.on_file = on_file
+        self.on_skip = on_skip
+        self.budget = budget
+        self.spool = tempfile.TemporaryFile(dir=store.incoming_dir)
+
+    def feed(self, chunk: bytes):
+        self.spool.write(chunk)
+
+    def close(self):
+        try:
+            self.spool.seek(0)
+            with zipfile.ZipFile(self.spool) as archive:
+                infos = archive.infolist()
+                # The index tells the sizes up front: refuse a bomb before extracting
+                for _ in infos:
+                    self.budget.take_entry()
+                self.budget.check_bytes(sum(info.file_size for info in infos if _is_image(info.filename)))
+                for info in infos:
+                    if info.is_dir():
+                        continue
+                    if not _is_image(info.filename):
+                        self.on_skip(info.filename)
+                        continue
+                    with archive.open(info) as entry:
+                        self.on_file(self.store.save_stream(entry, info.filename, budget=self.budget))
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"Invalid zip archive: {e}")
+        finally:
+            self.spool.close()
+
+    def abort(self):
+        self.spool.close()
+
+
+class _ArchiveSink:
+    """Picks tar or zip from the first bytes (zip files start with 'PK\\x03\\x04')."""
+
+    def __init__(self, store: UploadStore, on_file, on_skip, budget: _ArchiveBudget):
+        self.args = (store, on_file, on_skip, budget)
+        self.head = b""
+        self.sink = None
+
+    def feed(self, chunk: bytes):
+        if self.sink is None:
+            self.head += chunk
+            if len(self.head) < 4:
+                return
+            chunk, self.head = self.head, b""
+            self.sink = (_ZipSink if chunk.startswith(b"PK\x03\x04") else _TarSink)(*self.args)
+        self.sink.feed(chunk)
+
+    def close(self):
+        if self.sink is None:
+            raise ValueError("Archive is empty")
+        self.sink.close()
+
+    def abort(self):
+        if self.sink is not None:
+            self.sink.abort()
+
+
+class _MultipartSink:
+    """
+    Incremental multipart/form-data parser: each part is streamed into its
+    own sink as soon as its headers are read. Image parts are stored
+    directly; archive parts are extracted.
+    """
+
+    def __init__(self, boundary: bytes, open_part: Callable[[str], Optional[object]]):
+        self.open_part = open_part
+        self.part = None
+        self._headers: Dict[bytes, bytes] = {}
+        self._field = b""
+        self._value = b""
+        self.parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self.part = None
+
+    def _on_header_field(self, data, start, end):
+        self._field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._field.lower()] = self._value
+        self._field, self._value = b"", b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        # Plain form fields have no filename and are ignored
+        if filename is not None:
+            self.part = self.open_part(clean_filename(filename.decode("utf-8", "replace")))
+
+    def _on_part_data(self, data, start, end):
+        if self.part is not None:
+            self.part.feed(data[start:end])
+
+    def _on_part_end(self):
+        part, self.part = self.part, None
+        if part is not None:
+            part.close()
+
+    def feed(self, chunk: bytes):
+        self.parser.write(chunk)
+
+    def close(self):
+        self.parser.finalize()
+
+    def abort(self):
+        if self.part is not None:
+            self.part.abort()
+
+
+class BulkUpload:
+    """
+    One streaming bulk request: many files in a multipart form, or one
+    zip/tar archive as the raw body. Every image is handed to on_file as
+    soon as it is stored, so ingestion starts before the body has landed.
+    feed() blocks on disk I/O; call it from a worker thread.
+    """
+
+    def __init__(self, store: UploadStore, content_type: str, on_file: Callable[[str], None]):
+        self.store = store
+        self.on_file = on_file
+        self.accepted = 0
+        self.skipped = []
+        self.received = 0
+        self.budget = _ArchiveBudget()
+
+        media_type, options = parse_options_header(content_type.encode("latin-1"))
+        if media_type == b"multipart/form-data":
+            boundary = options.get(b"boundary")
+            if not boundary:
+                raise ValueError("Missing multipart boundary")
+            self.sink = _MultipartSink(boundary, self._open_part)
+        else:
+            # Raw body: application/zip, application/x-tar, application/gzip, ...
+            self.sink = _ArchiveSink(store, self._stored, self._skip, self.budget)
+
+    def _stored(self, path: str):
+        self.accepted += 1
+        self.on_file(path)
+
+    def _skip(self, name: str):
+        self.skipped.append(name)
+
+    def _open_part(self, filename: str):
+        if _is_image(filename):
+            return _ImageSink(self.store, filename, self._stored)
+        if _is_archive(filename):
+            return _ArchiveSink(self.store, self._stored, self._skip, self.budget)
+        self._skip(filename)
+        return None
+
+    def feed(self, chunk: bytes):
+        try:
+            self.received += len(chunk)
+            if self.received > settings.UPLOAD_MAX_TOTAL_BYTES:
+                raise UploadLimitError(f"Request body is larger than {settings.UPLOAD_MAX_TOTAL_BYTES} bytes")
+            self.sink.feed(chunk)
+        except Exception:
+            self.sink.abort()
+            raise
+
+    def close(self):
+        self.sink.close()
+
+    def summary(self) -> Dict:
+        return {"accepted": self.accepted, "skipped": self.skipped[:100], "skipped_count": len(self.skipped)}
@@ -0,0 +1,79 @@
+# backend/benchmarks/corpus.py
+"""Deterministic synthetic photo corpus: gradients and shapes at camera-like sizes."""
+import os
+import random
+import shutil
+from typing import Dict
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# (width, height) pairs from phone/camera photos, plus a few small web images
+SIZES = [(4032, 3024), (3024, 4032), (3000, 2000), (1920, 1080), (1280, 960), (800, 600), (640, 480)]
+
+
+def _photo(rng: random.Random, size) -> Image.Image:
+    w, h = size
+    # Smooth two-colour gradient, cheap to build at full resolution
+    a = np.array([rng.randrange(256) for _ in range(3)], dtype=np.float32)
+    b = np.array([rng.randrange(256) for _ in range(3)], dtype=np.float32)
+    t = np.linspace(0.0, 1.0, w, dtype=np.float32)[None, :, None]
+    row = (a * (1 - t) + b * t).astype(np.uint8)
+    img = Image.fromarray(np.repeat(row, h, axis=0), "RGB")
+
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(3, 12)):
+        x0, y0 = rng.randrange(w), rng.randrange(h)
+        x1, y1 = x0 + rng.randrange(w // 8, w // 2), y0 + rng.randrange(h // 8, h // 2)
+        colour = tuple(rng.randrange(256) for _ in range(3))
+        (draw.ellipse if rng.random() < 0.5 else draw.rectangle)([x0, y0, x1, y1], fill=colour)
+    return img
+
+
+def generate_corpus(root: str, count: int, seed: int = 42, duplicate_ratio: float = 0.05,
+                    png_ratio: float = 0.1, folders: int = 4) -> Dict:
+    """
+    Writes `count` images under root/<album_i>/. A share of them are exact
+    byte copies of earlier images, to exercise deduplication.
+    Returns a summary of what was written.
+    """
+    if os.path.exists(root):
+        shutil.rmtree(root)
+    rng = random.Random(seed)
+    written, duplicates, total_bytes = [], 0, 0
+
+    for i in range(count):
+        album = os.path.join(root, f"album_{i % folders}")
+        os.makedirs(album, exist_ok=True)
+
+        if written and rng.random() < duplicate_ratio:
+            source = rng.choice(written)
+            path = os.path.join(album, f"copy_{i:05d}{os.path.splitext(source)[1]}")
+            shutil.copyfile(source, path)
+            duplicates += 1
+        else:
+            img = _photo(rng, rng.choice(SIZES))
+            if rng.random() < png_ratio:
+                path = os.path.join(album, f"img_{i:05d}.png")
+                img.save(path, format="PNG", compress_level=1)
+            else:
+                path = os.path.join(album, f"img_{i:05d}.jpg")
+                img.save(path, format="JPEG", quality=90)
+        written.append(path)
+        total_bytes += os.path.getsize(path)
+
+    return {"images": count, "duplicates": duplicates, "bytes": total_bytes, "seed": seed}
+
+
+if __name__ == "__main__":
+    # Run as its own process by run.py, so generating full-size frames
+    # never counts towards the benchmark's peak RSS
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Writes a synthetic photo corpus")
+    parser.add_argument("root")
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    print(json.dumps(generate_corpus(args.root, args.count, seed=args.seed)))
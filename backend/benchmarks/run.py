@@ -0,0 +1,360 @@
+# backend/benchmarks/run.py
+"""
+Ingestion + search benchmark. Runs offline: the LLM and Qdrant are local
+stand-ins (see stand_ins.py), and with --models stub so are CLIP/BLIP
+and InsightFace.
+
+Run from backend/:
+    python -m benchmarks.run --images 300 --models stub --out results/base.json
+    python -m benchmarks.run --images 300 --models stub --out results/new.json --baseline results/base.json
+    python -m benchmarks.run --compare results/base.json results/new.json --max-regression 10
+
+What it does:
+1. Generates a deterministic synthetic corpus (with some exact duplicates)
+   in a child process, so its full-size frames never count towards peak RSS.
+2. Ingests it end to end with IngestionService.process_folder, then once
+   more to time the "already indexed" path.
+3. Replays a query set against GET /search/ through FastAPI's TestClient:
+   a cold round (empty caches) and warm rounds.
+4. Writes JSON with images/sec, per-stage time, p50/p95/p99 latency and
+   peak RSS, which --compare can diff between runs.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# (path in the results, True when higher is better)
+COMPARED_METRICS = [
+    ("ingest.images_per_sec", True),
+    ("ingest.reingest_images_per_sec", True),
+    ("search.cold.p50_ms", False),
+    ("search.cold.p95_ms", False),
+    ("search.cold.p99_ms", False),
+    ("search.warm.p50_ms", False),
+    ("search.warm.p95_ms", False),
+    ("search.warm.p99_ms", False),
+    ("ingest.peak_rss_mb", False),
+    ("ingest.rss_growth_mb", False),
+    ("peak_rss_mb", False),
+]
+
+
+def peak_rss_mb() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024, 1)
+
+
+def percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    import numpy as np
+
+    if not samples_ms:
+        return {"count": 0}
+    data = np.asarray(samples_ms)
+    return {
+        "count": len(samples_ms),
+        "mean_ms": round(float(data.mean()), 2),
+        "p50_ms": round(float(np.percentile(data, 50)), 2),
+        "p95_ms": round(float(np.percentile(data, 95)), 2),
+        "p99_ms": round(float(np.percentile(data, 99)), 2),
+        "max_ms": round(float(data.max()), 2),
+    }
+
+
+def stage_delta(before: Dict, after: Dict) -> Dict[str, Dict[str, float]]:
+    """Per-stage calls and seconds spent between two histogram snapshots."""
+    stages = {}
+    for key, (count, total) in after.items():
+        prev_count, prev_total = before.get(key, (0, 0.0))
+        if count - prev_count:
+            stages[key[0]] = {
+                "calls": count - prev_count,
+                "seconds": round(total - prev_total, 4),
+                "ms_per_call": round((total - prev_total) * 1000 / (count - prev_count), 3),
+            }
+    return dict(sorted(stages.items(), key=lambda kv: -kv[1]["seconds"]))
+
+
+def generate_corpus(root: str, count: int, seed: int) -> Dict:
+    """
+    Runs benchmarks.corpus in a child process: it decodes full-size frames,
+    and ru_maxrss would otherwise report the generator's peak, not ingestion's.
+    """
+    output = subprocess.check_output(
+        [sys.executable, "-m", "benchmarks.corpus", root, "--count", str(count), "--seed", str(seed)],
+        cwd=os.path.dirname(HERE),
+    )
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+# --- Setup ---
+
+def configure_environment(args):
+    """Must run before anything from app/ is imported: config is read at import time."""
+    os.environ["VECTOR_STORE"] = "memory"
+    os.environ["APP_ROLE"] = "search"
+    os.environ["PRELOAD_MODELS"] = "false"
+    if args.batch_size:
+        os.environ["INGEST_BATCH_SIZE"] = str(args.batch_size)
+
+
+def build_components(args, workdir: str):
+    """Builds the services with stand-ins and installs them as the app's singletons."""
+    from app import dependencies
+    from app.services.agent import SearchAgent
+    from app.services.ai_service import AIEngine
+    from app.services.db_service import create_vector_db
+    from app.services.ingestion_service import IngestionService
+    from app.services.thumbnail_service import ThumbnailService
+    from benchmarks.stand_ins import FakeLLM, StubBackend, StubFaceEngine
+
+    db = create_vector_db("memory")
+    if args.models == "stub":
+        ai_engine = AIEngine(backend=StubBackend(latency_ms=args.stub_latency_ms))
+        face_engine = StubFaceEngine()
+    else:
+        from app.services.face_service import FaceEngine
+
+        ai_engine = AIEngine()
+        face_engine = FaceEngine(db_client=db, references_dir=os.path.join(workdir, "faces"))
+
+    thumbnails = ThumbnailService(root=os.path.join(workdir, "thumbnails"))
+    ingest = IngestionService(db, face_engine, ai_engine, thumbnails)
+    agent = SearchAgent(names_provider=lambda: face_engine.gallery.people, llm=FakeLLM(args.llm_latency_ms))
+
+    dependencies.db_instance = db
+    dependencies.ai_engine_instance = ai_engine
+    dependencies.face_engine = face_engine
+    dependencies.thumbnail_service_instance = thumbnails
+    dependencies.ingest_service_instance = ingest
+    dependencies.agent_instance = agent
+    return ingest
+
+
+# --- Phases ---
+
+def bench_ingest(ingest, corpus_dir: str, images: int) -> Dict:
+    from app.core.metrics import STAGE_SECONDS
+
+    # Peak so far: imports and model setup. rss_growth_mb is how far
+    # ingestion pushes the peak beyond that
+    rss_before = peak_rss_mb()
+    before = STAGE_SECONDS.totals()
+    start = time.perf_counter()
+    ingest.process_folder(corpus_dir)
+    wall = time.perf_counter() - start
+    stages = stage_delta(before, STAGE_SECONDS.totals())
+    rss_after_first = peak_rss_mb()
+
+    # Same folder again: every file should be skipped by the dedup pre-check
+    start = time.perf_counter()
+    ingest.process_folder(corpus_dir)
+    rewall = time.perf_counter() - start
+
+    return {
+        "images": images,
+        "seconds": round(wall, 3),
+        "images_per_sec": round(images / wall, 2) if wall else None,
+        "reingest_seconds": round(rewall, 3),
+        "reingest_images_per_sec": round(images / rewall, 2) if rewall else None,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": rss_after_first,
+        "rss_growth_mb": round(rss_after_first - rss_before, 1),
+        "stages": stages,
+    }
+
+
+def _parse_server_timing(header: str) -> Dict[str, float]:
+    timings = {}
+    for part in filter(None, (p.strip() for p in header.split(","))):
+        name, _, dur = part.partition(";dur=")
+        if dur:
+            timings[name] = float(dur)
+    return timings
+
+
+def bench_search(queries: List[str], rounds: int, concurrency: int, limit: int) -> Dict:
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    def one(client, query) -> Tuple[float, Dict[str, float]]:
+        start = time.perf_counter()
+        response = client.get("/search/", params={"q": query, "limit": limit})
+        elapsed = (time.perf_counter() - start) * 1000
+        response.raise_for_status()
+        return elapsed, _parse_server_timing(response.headers.get("server-timing", ""))
+
+    results = {}
+    with TestClient(app) as client:
+        for round_no in range(rounds):
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                samples = list(pool.map(lambda q: one(client, q), queries))
+            label = "cold" if round_no == 0 else "warm"
+            bucket = results.setdefault(label, {"latencies": [], "stages": {}})
+            for elapsed, timings in samples:
+                bucket["latencies"].append(elapsed)
+                for stage, ms in timings.items():
+                    bucket["stages"].setdefault(stage, []).append(ms)
+
+    report = {"queries": len(queries), "rounds": rounds, "concurrency": concurrency}
+    for label, bucket in results.items():
+        report[label] = percentiles(bucket["latencies"])
+        report[label]["server_timing_mean_ms"] = {
+            stage: round(sum(v) / len(v), 3) for stage, v in sorted(bucket["stages"].items())
+        }
+    return report
+
+
+# --- Comparison ---
+
+def _lookup(results: Dict, path: str):
+    value = results
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def compare(base: Dict, new: Dict, max_regression: float = None) -> bool:
+    """Prints a table of key metrics; False when a metric regressed past max_regression %."""
+    ok = True
+    print(f"\n{'metric':36} {'base':>12} {'new':>12} {'change':>9}")
+    for path, higher_is_better in COMPARED_METRICS:
+        a, b = _lookup(base, path), _lookup(new, path)
+        if a is None or b is None:
+            continue
+        change = (b - a) / a * 100 if a else 0.0
+        worse = -change if higher_is_better else change
+        flag = ""
+        if max_regression is not None and worse > max_regression:
+            flag, ok = "  REGRESSION", False
+        print(f"{path:36} {a:>12} {b:>12} {change:>+8.1f}%{flag}")
+    return ok
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return ""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingestion and search benchmark with local stand-ins")
+    parser.add_argument("--images", type=int, default=200, help="Synthetic images to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--corpus", help="Use an existing folder instead of generating one")
+    parser.add_argument("--workdir", help="Where corpus, thumbnails and faces go (default: temp dir)")
+    parser.add_argument("--models", choices=["stub", "real"], default="stub",
+                        help="stub: deterministic CLIP/BLIP/face stand-ins; real: the configured models")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="Simulated model cost per item (stub models)")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="Simulated LLM latency per call")
+    parser.add_argument("--batch-size", type=int, help="Override INGEST_BATCH_SIZE")
+    parser.add_argument("--queries", default=os.path.join(HERE, "queries.txt"))
+    parser.add_argument("--rounds", type=int, default=3, help="Query rounds: the first is cold, the rest warm")
+    parser.add_argument("--concurrency", type=int, default=1, help="Parallel search requests")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--out", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare this run against an earlier results JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="Only compare two results files")
+    parser.add_argument("--max-regression", type=float, help="Exit 1 if a compared metric is worse by more than this %%")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            base = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        return 0 if compare(base, new, args.max_regression) else 1
+
+    configure_environment(args)
+    workdir = args.workdir or tempfile.mkdtemp(prefix="photo-bench-")
+    os.makedirs(workdir, exist_ok=True)
+
+    # 1. Corpus
+    if args.corpus:
+        from app.services.ingestion_service import IngestionService
+
+        corpus_dir = args.corpus
+        images = sum(1 for _ in IngestionService.iter_images(corpus_dir))
+        corpus = {"images": images, "path": corpus_dir}
+    else:
+        corpus_dir = os.path.join(workdir, "corpus")
+        print(f"🖼️ Generating {args.images} synthetic images in {corpus_dir}...")
+        corpus = generate_corpus(corpus_dir, args.images, args.seed)
+        images = args.images
+
+    # 2. Ingestion
+    ingest = build_components(args, workdir)
+    print("⏱️ Benchmarking ingestion...")
+    ingest_report = bench_ingest(ingest, corpus_dir, images)
+
+    # 3. Search
+    with open(args.queries) as f:
+        queries = [line.strip() for line in f if line.strip()]
+    print(f"⏱️ Replaying {len(queries)} queries x {args.rounds} rounds...")
+    search_report = bench_search(queries, args.rounds, args.concurrency, args.limit)
+
+    from app.core.config import settings
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("compare",)},
+            "settings": {
+                "AI_BACKEND": settings.AI_BACKEND,
+                "INGEST_BATCH_SIZE": settings.INGEST_BATCH_SIZE,
+                "DECODE_MAX_SIDE": settings.DECODE_MAX_SIDE,
+                "PIPELINE_DECODE_WORKERS": settings.PIPELINE_DECODE_WORKERS,
+                "PIPELINE_FACE_WORKERS": settings.PIPELINE_FACE_WORKERS,
+                "UPSERT_BATCH_SIZE": settings.UPSERT_BATCH_SIZE,
+                "VECTOR_STORE": settings.VECTOR_STORE,
+            },
+        },
+        "corpus": corpus,
+        "ingest": ingest_report,
+        "search": search_report,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+    print(f"\n📊 Ingestion: {ingest_report['images_per_sec']} images/sec "
+          f"({ingest_report['seconds']}s), re-ingest {ingest_report['reingest_images_per_sec']} images/sec")
+    for stage, info in list(ingest_report["stages"].items())[:8]:
+        print(f"   {stage:24} {info['seconds']:>9.3f}s  {info['ms_per_call']:>9.3f} ms/call")
+    for label in ("cold", "warm"):
+        if label in search_report:
+            s = search_report[label]
+            print(f"📊 Search ({label}): p50 {s['p50_ms']} ms, p95 {s['p95_ms']} ms, p99 {s['p99_ms']} ms")
+    print(f"📊 Peak RSS: {results['peak_rss_mb']} MB "
+          f"(ingestion added {ingest_report['rss_growth_mb']} MB over {ingest_report['rss_before_mb']} MB)")
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 Results written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            base = json.load(f)
+        return 0 if compare(base, results, args.max_regression) else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+# backend/tests/conftest.py
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from app.core.config import settings
+
+# The job queue and watch manifest live in SQLite: keep them out of
+# data/users.db (must happen before app.services.user_db is imported)
+_SQLITE_DIR = tempfile.mkdtemp(prefix="photo-tests-")
+settings.SQLITE_URL = f"sqlite:///{os.path.join(_SQLITE_DIR, 'users.db')}"
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_SQLITE_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    """A fresh in-memory Qdrant (local mode) per test."""
+    from app.services.db_service import create_vector_db
+
+    store = create_vector_db("memory")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def ingest(db):
+    """IngestionService with the benchmark stand-ins instead of the models."""
+    from app.services.ai_service import AIEngine
+    from app.services.ingestion_service import IngestionService
+    from benchmarks.stand_ins import StubBackend, StubFaceEngine
+
+    return IngestionService(db, StubFaceEngine(), AIEngine(backend=StubBackend()))
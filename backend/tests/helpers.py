@@ -0,0 +1,18 @@
+# backend/tests/helpers.py
+import os
+
+import numpy as np
+from PIL import Image
+
+
+def random_vector(seed: int, dim: int = 512):
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def make_image(path, color, size=(32, 32)) -> str:
+    """Writes a small solid-colour JPEG and returns its path."""
+    path = str(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new("RGB", size, color).save(path, quality=95)
+    return path
@@ -0,0 +1,129 @@
+# backend/tests/test_dedup.py
+import shutil
+import threading
+
+from tests.helpers import make_image, random_vector
+
+
+def _run(ingest, paths):
+    """Ingests paths; returns {path: (ok, error, point_ids)}."""
+    results = {}
+    ingest.process_paths(paths, on_done=lambda path, ok, error, point_ids: results.__setitem__(path, (ok, error, point_ids)))
+    return results
+
+
+def _count(db):
+    return db.client.count(collection_name=db.collection_name).count
+
+
+def test_reingest_skips_indexed_files(ingest, db, tmp_path):
+    paths = [make_image(tmp_path / f"{i}.jpg", (40 * i, 0, 0)) for i in range(3)]
+    first = _run(ingest, paths)
+    assert all(ok for ok, _, _ in first.values())
+    assert _count(db) == 3
+
+    generation = db.data_generation
+    second = _run(ingest, paths)
+    assert all(ok for ok, _, _ in second.values())
+    # Same deterministic point per file, nothing written again
+    assert {p: r[2] for p, r in second.items()} == {p: r[2][:1] for p, r in first.items()}
+    assert _count(db) == 3
+    assert db.data_generation == generation
+
+
+def test_copy_is_linked_to_the_existing_point(ingest, db, tmp_path):
+    original = make_image(tmp_path / "a.jpg", (200, 0, 0))
+    point_id = _run(ingest, [original])[original][2][0]
+
+    copy = str(tmp_path / "sub" / "a-copy.jpg")
+    (tmp_path / "sub").mkdir()
+    shutil.copy(original, copy)
+    result = _run(ingest, [copy])[copy]
+
+    assert result[0] and result[2] == [point_id]
+    assert _count(db) == 1
+    assert db.get_image(point_id)["paths"] == [original, copy]
+    assert db.find_by_path(copy)[0] == point_id
+
+
+def test_modified_file_leaves_its_old_point(ingest, db, tmp_path):
+    path = make_image(tmp_path / "a.jpg", (200, 0, 0))
+    keep = str(tmp_path / "keep.jpg")
+    shutil.copy(path, keep)
+    old_id = _run(ingest, [path, keep])[path][2][0]
+
+    make_image(path, (0, 0, 200), size=(40, 40))
+    new_id = _run(ingest, [path])[path][2][0]
+
+    assert new_id != old_id
+    assert db.get_image(old_id)["paths"] == [keep]
+    assert db.get_image(new_id)["paths"] == [path]
+
+
+def test_duplicates_in_one_run_share_the_original_outcome(ingest, db, tmp_path):
+    good = make_image(tmp_path / "good.jpg", (200, 0, 0))
+    bad = make_image(tmp_path / "bad.jpg", (0, 200, 0))
+    good_copy, bad_copy = str(tmp_path / "good2.jpg"), str(tmp_path / "bad2.jpg")
+    shutil.copy(good, good_copy)
+    shutil.copy(bad, bad_copy)
+
+    analyze = ingest.face_engine.analyze
+
+    def failing_on_green(bgr, keep_embeddings=False):
+        if bgr[0, 0, 1] > 100:
+            raise RuntimeError("boom")
+        return analyze(bgr, keep_embeddings)
+
+    ingest.face_engine.analyze = failing_on_green
+    results = _run(ingest, [good, bad, good_copy, bad_copy])
+
+    assert results[good][0] and results[good_copy][0]
+    assert results[good_copy][2] == results[good][2][:1]
+    # The copy of a failed file fails too, so the job queue retries it
+    assert not results[bad][0] and not results[bad_copy][0]
+    assert "boom" in results[bad_copy][1]
+    assert db.get_image(results[good][2][0])["paths"] == [good, good_copy]
+
+
+def test_remove_path_keeps_the_point_until_its_last_path(db):
+    point_id = db.save_image("/a.jpg", random_vector(1), [], "c", content_hash="ab" * 32)
+    db.add_path(point_id, "/b.jpg")
+    db.save_photo_faces(point_id, [random_vector(2)])
+    db.flush()
+
+    db.remove_path(point_id, "/a.jpg")
+    assert db.get_image(point_id)["paths"] == ["/b.jpg"]
+    assert db.get_image(point_id)["path"] == "/b.jpg"
+
+    db.remove_path(point_id, "/b.jpg")
+    assert db.get_image(point_id) is None
+    assert db.client.count(collection_name=db.photo_faces_collection).count == 0
+
+
+def test_path_merges_survive_concurrent_flushes(db):
+    point_ids = [db.save_image(f"/p{i}.jpg", random_vector(i), [], "c", content_hash=f"{i:02x}" + "0" * 62)
+                 for i in range(20)]
+    stop = threading.Event()
+
+    def flusher():
+        while not stop.is_set():
+            db.flush()
+
+    def linker(k):
+        for i, point_id in enumerate(point_ids):
+            db.add_path(point_id, f"/copy{k}_{i}.jpg")
+
+    threads = [threading.Thread(target=flusher)] + [threading.Thread(target=linker, args=(k,)) for k in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads[1:]:
+        t.join()
+    assert db.add_people({point_id: ["bob"] for point_id in point_ids}) == len(point_ids)
+    stop.set()
+    threads[0].join()
+    db.flush()
+
+    for point_id in point_ids:
+        payload = db.get_image(point_id)
+        assert len(payload["paths"]) == 4
+        assert payload["people"] == ["bob"]
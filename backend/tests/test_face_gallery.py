@@ -0,0 +1,80 @@
+# backend/tests/test_face_gallery.py
+import numpy as np
+import pytest
+
+from app.services.face_gallery import FaceGallery
+from tests.helpers import random_vector
+
+
+def _near(vector, seed, noise=0.1):
+    """The same face in another photo: the reference plus a little noise."""
+    jitter = np.random.default_rng(seed).standard_normal(len(vector)) * noise / np.sqrt(len(vector))
+    out = np.asarray(vector) + jitter
+    return (out / np.linalg.norm(out)).tolist()
+
+
+@pytest.fixture
+def references(db):
+    """Two photos each of alice and bob, stored in the faces collection."""
+    faces = {"alice": [random_vector(1), random_vector(2)], "bob": [random_vector(3), random_vector(4)]}
+    for name, embeddings in faces.items():
+        db.save_reference_faces(name, embeddings)
+    return faces
+
+
+@pytest.mark.parametrize("use_prototypes", [False, True])
+def test_gallery_from_qdrant_matches_known_faces(db, references, use_prototypes):
+    names, embeddings = db.load_all_references()
+    gallery = FaceGallery.from_arrays(names, embeddings, use_prototypes=use_prototypes)
+    assert sorted(gallery.people) == ["alice", "bob"]
+    assert gallery.count("alice") == 2
+
+    queries = [_near(references["bob"][1], 10), _near(references["alice"][0], 11), random_vector(99)]
+    # Prototypes average two unrelated vectors, so they score lower
+    threshold = 0.5 if use_prototypes else 0.8
+    assert gallery.best_matches(queries, threshold=threshold) == ["bob", "alice", None]
+
+
+def test_match_ranks_people_best_first(references):
+    gallery = FaceGallery(use_prototypes=False)
+    for name, embeddings in references.items():
+        gallery.add_many([name] * len(embeddings), embeddings)
+
+    blend = np.asarray(references["alice"][0]) * 0.8 + np.asarray(references["bob"][0]) * 0.6
+    [matches] = gallery.match([blend / np.linalg.norm(blend)], top_k=2, threshold=0.0)
+    assert [name for name, _ in matches] == ["alice", "bob"]
+    assert matches[0][1] > matches[1][1]
+
+
+def test_growth_keeps_every_reference():
+    gallery = FaceGallery(capacity=2, use_prototypes=False)
+    vectors = [random_vector(i) for i in range(9)]
+    for i, vector in enumerate(vectors):
+        gallery.add(f"p{i}", vector)
+
+    assert len(gallery) == 9
+    np.testing.assert_allclose(gallery.embeddings, np.asarray(vectors, dtype=np.float32))
+    assert gallery.best_matches(vectors) == [f"p{i}" for i in range(9)]
+
+
+def test_replica_reloads_faces_registered_elsewhere(db, references, tmp_path):
+    from app.services.face_service import FaceEngine
+    from app.services.replica_sync import ReplicaSync
+
+    engine = FaceEngine(db, references_dir=str(tmp_path))
+    sync = ReplicaSync(db, lambda: engine, interval=60)
+    sync.start()
+    generation = engine.generation
+
+    # Another process registers carol: only the DB knows about her
+    carol = random_vector(5)
+    db.save_reference_faces("carol", [carol])
+    assert "carol" not in engine.gallery.people
+
+    try:
+        sync.sync_once()
+    finally:
+        sync.stop()
+    assert "carol" in engine.gallery.people
+    assert engine.generation > generation
+    assert engine.gallery.best_matches([_near(carol, 12)]) == ["carol"]
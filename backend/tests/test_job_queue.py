@@ -0,0 +1,136 @@
+# backend/tests/test_job_queue.py
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.dedup import file_sha256
+from app.services.job_queue import JobItem, JobManager
+from app.services.user_db import SessionLocal
+from tests.helpers import make_image
+
+
+@pytest.fixture
+def jobs(ingest, monkeypatch):
+    monkeypatch.setattr(settings, "JOB_POLL_INTERVAL", 0.05)
+    manager = JobManager(lambda: ingest, chunk_size=2, max_attempts=3, backoff=0)
+    yield manager
+    manager.stop()
+
+
+def _wait_done(jobs, job_id, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get_job(job_id)
+        if job["state"] not in ("queued", "running"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish: {jobs.get_job(job_id)}")
+
+
+def _attempts(job_id):
+    with SessionLocal() as session:
+        return {p: a for p, a in session.query(JobItem.path, JobItem.attempts).filter(JobItem.job_id == job_id)}
+
+
+def _fail_on(ingest, should_fail):
+    """Makes face analysis raise for the images should_fail(bgr) picks."""
+    analyze = ingest.face_engine.analyze
+
+    def flaky(bgr, keep_embeddings=False):
+        if should_fail(bgr):
+            raise RuntimeError("flaky model")
+        return analyze(bgr, keep_embeddings)
+
+    ingest.face_engine.analyze = flaky
+
+
+def test_job_ingests_every_file(jobs, ingest, tmp_path):
+    paths = [make_image(tmp_path / f"{i}.jpg", (40 * i, 0, 0)) for i in range(5)]
+    jobs.start()
+    job = _wait_done(jobs, jobs.create_job("upload", "test", paths))
+
+    assert job["state"] == "done"
+    assert job["counts"]["done"] == 5
+    assert ingest.db.client.count(collection_name=ingest.db.collection_name).count == 5
+
+
+def test_failed_file_is_retried(jobs, ingest, tmp_path):
+    paths = [make_image(tmp_path / f"{i}.jpg", (40 * i, 0, 0)) for i in range(3)]
+    failures = []
+
+    def first_green_fails(bgr):
+        if bgr[0, 0, 1] > 100 and not failures:
+            failures.append(1)
+            return True
+        return False
+
+    paths.append(make_image(tmp_path / "green.jpg", (0, 200, 0)))
+    _fail_on(ingest, first_green_fails)
+    jobs.start()
+    job_id = jobs.create_job("upload", "test", paths)
+    job = _wait_done(jobs, job_id)
+
+    assert job["counts"]["done"] == 4
+    assert _attempts(job_id)[paths[-1]] == 1
+    assert ingest.db.find_by_path(paths[-1]) is not None
+
+
+def test_file_fails_once_attempts_run_out(jobs, ingest, tmp_path):
+    good = make_image(tmp_path / "good.jpg", (200, 0, 0))
+    bad = make_image(tmp_path / "bad.jpg", (0, 200, 0))
+    _fail_on(ingest, lambda bgr: bgr[0, 0, 1] > 100)
+    jobs.start()
+    job_id = jobs.create_job("upload", "test", [good, bad])
+    job = _wait_done(jobs, job_id)
+
+    assert job["state"] == "done"
+    assert job["counts"]["done"] == 1 and job["counts"]["failed"] == 1
+    assert job["errors"][0]["path"] == bad
+    assert "flaky model" in job["errors"][0]["error"]
+    assert _attempts(job_id)[bad] == 3
+
+
+def test_file_with_unflushed_points_is_retried(jobs, ingest, tmp_path):
+    paths = [make_image(tmp_path / f"{i}.jpg", (40 * i, 0, 0)) for i in range(4)]
+    lost = ingest.db.point_id_for_hash(file_sha256(paths[0]))
+    flush = ingest.db.flush
+    reported = []
+
+    def lossy_flush():
+        unflushed = flush()
+        if not reported:
+            reported.append(lost)
+            return unflushed + [lost]
+        return unflushed
+
+    ingest.db.flush = lossy_flush
+    jobs.start()
+    job_id = jobs.create_job("upload", "test", paths)
+    job = _wait_done(jobs, job_id)
+
+    assert job["counts"]["done"] == 4
+    attempts = _attempts(job_id)
+    # Only the file whose own point was reported unwritten went round again
+    assert attempts[paths[0]] == 1
+    assert all(attempts[p] == 0 for p in paths[1:])
+
+
+def test_cancel_drops_pending_files(jobs, ingest, tmp_path):
+    paths = [make_image(tmp_path / f"{i}.jpg", (40 * i, 0, 0)) for i in range(3)]
+    job_id = jobs.create_job("upload", "test", paths)
+
+    assert jobs.cancel(job_id)
+    job = jobs.get_job(job_id)
+    assert job["state"] == "cancelled"
+    assert job["counts"]["cancelled"] == 3
+
+    # A started worker never picks them up
+    jobs.start()
+    time.sleep(0.3)
+    assert jobs.get_job(job_id)["counts"]["cancelled"] == 3
+    assert ingest.db.client.count(collection_name=ingest.db.collection_name).count == 0
+
+
+def test_cancel_unknown_job(jobs):
+    assert not jobs.cancel(10 ** 9)
@@ -0,0 +1,94 @@
+# backend/tests/test_name_resolver.py
+import pytest
+
+from app.services.name_resolver import NameResolver
+
+PEOPLE = ["Rose Smith", "Rahul Kumar", "Rahul Verma", "Bob"]
+
+
+@pytest.fixture
+def resolver():
+    return NameResolver(lambda: PEOPLE)
+
+
+def test_full_names_resolve_locally(resolver):
+    match = resolver.resolve("Rose Smith and Bob at the beach")
+    assert match.exact == ["Rose Smith", "Bob"]
+    assert match.remainder == "at the beach"
+    assert not match.needs_llm
+
+
+def test_first_name_alone_goes_to_the_llm(resolver):
+    # "rose" may just be the flower
+    match = resolver.resolve("rose garden")
+    assert match.exact == []
+    assert match.candidates == ["Rose Smith"]
+    assert match.needs_llm
+
+
+def test_shared_first_name_offers_everyone_who_has_it(resolver):
+    match = resolver.resolve("rahul's birthday")
+    assert match.candidates == ["Rahul Kumar", "Rahul Verma"]
+    assert match.needs_llm
+
+
+def test_typo_is_a_candidate(resolver):
+    match = resolver.resolve("bobb skiing")
+    assert "Bob" in match.candidates
+    assert match.needs_llm
+
+
+def test_relation_words_need_the_llm(resolver):
+    assert resolver.resolve("me and my sister").needs_llm
+    assert not resolver.resolve("sunset over mountains").needs_llm
+
+
+def test_new_names_are_picked_up(resolver):
+    names = list(PEOPLE)
+    live = NameResolver(lambda: names)
+    assert live.resolve("Carol Danvers hiking").exact == []
+    names.append("Carol Danvers")
+    assert live.resolve("Carol Danvers hiking").exact == ["Carol Danvers"]
+
+
+class _CountingLLM:
+    """Wraps the benchmark's FakeLLM and counts how often the agent calls it."""
+
+    def __init__(self):
+        from benchmarks.stand_ins import FakeLLM
+
+        self.calls = 0
+        self.last_prompt = ""
+        self.llm = FakeLLM()
+
+    def __call__(self, prompt):
+        self.calls += 1
+        self.last_prompt = prompt.to_string()
+        return self.llm.invoke(prompt)
+
+
+@pytest.fixture
+def agent():
+    from langchain_core.runnables import RunnableLambda
+
+    from app.services.agent import SearchAgent
+
+    counter = _CountingLLM()
+    agent = SearchAgent(names_provider=lambda: PEOPLE, llm=RunnableLambda(counter))
+    agent.llm_calls = counter
+    return agent
+
+
+def test_agent_answers_full_names_without_the_llm(agent):
+    intent = agent.parse_query("Rahul Kumar eating cake")
+    assert intent == {"people": ["Rahul Kumar"], "visual_query": "eating cake", "source": "local"}
+    assert agent.parse_query("sunset over mountains")["people"] == []
+    assert agent.llm_calls.calls == 0
+
+
+def test_agent_asks_the_llm_about_first_names_only(agent):
+    intent = agent.parse_query("rose garden in spring")
+    assert agent.llm_calls.calls == 1
+    # Only the candidates are offered, not the whole list
+    assert "['Rose Smith']" in agent.llm_calls.last_prompt
+    assert intent["people"] == []
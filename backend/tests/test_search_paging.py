@@ -0,0 +1,81 @@
+# backend/tests/test_search_paging.py
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from tests.helpers import random_vector
+
+
+class _Agent:
+    """No people, the query is the scene: skips the LLM entirely."""
+
+    async def aparse_query(self, query):
+        return {"people": [], "visual_query": query}
+
+
+@pytest.fixture
+def search(db, monkeypatch):
+    from app.services.ai_service import AIEngine
+    from app.services.search_service import SearchService
+    from benchmarks.stand_ins import StubBackend, StubFaceEngine
+
+    monkeypatch.setattr(settings, "SEARCH_CANDIDATE_POOL", 10)
+    for i in range(30):
+        db.save_image(f"/p{i}.jpg", random_vector(i), [], f"photo {i}", content_hash=f"{i:02x}" + "0" * 62)
+    db.flush()
+    return SearchService(db, _Agent(), AIEngine(backend=StubBackend()), StubFaceEngine())
+
+
+def _pages(search, limit, **kwargs):
+    """Pages through a query until has_more is False."""
+    async def collect():
+        pages, offset = [], 0
+        while True:
+            page, has_more = await search.search("beach", limit=limit, offset=offset, **kwargs)
+            pages.append((page, has_more))
+            if not has_more:
+                break
+            offset += limit
+        await search.close()
+        return pages
+    return asyncio.run(collect())
+
+
+def test_pages_follow_the_full_ranking(search, db):
+    ranking = [str(p.id) for p in db.search_hybrid(search.ai_engine.generate_text_embedding("beach"), limit=30)]
+    pages = _pages(search, limit=4)
+
+    # Pages inside the pool and past it (deep pages) line up with no gaps
+    ids = [str(p.id) for page, _ in pages for p in page]
+    assert ids == ranking
+    assert [has_more for _, has_more in pages] == [True] * 7 + [False]
+    assert len(pages[-1][0]) == 2
+
+
+def test_threshold_cuts_the_pages_short(search, db):
+    ranking = db.search_hybrid(search.ai_engine.generate_text_embedding("beach"), limit=30)
+    threshold = ranking[5].score
+
+    pages = _pages(search, limit=4, score_threshold=threshold)
+    ids = [str(p.id) for page, _ in pages for p in page]
+    assert ids == [str(p.id) for p in ranking if p.score >= threshold]
+    assert not pages[-1][1]
+
+
+def test_deep_page_projects_payload(search):
+    async def deep(fields):
+        page, _ = await search.search("beach", limit=4, offset=12, fields=fields)
+        return page
+
+    async def run():
+        try:
+            return await deep(["path"]), await deep([]), await deep(None)
+        finally:
+            await search.close()
+
+    projected, bare, full = asyncio.run(run())
+    assert all(set(p.payload) == {"path"} for p in projected)
+    # Only IDs wanted (e.g. thumbnail_url): no payload at all
+    assert all(not p.payload for p in bare)
+    assert all("caption" in p.payload for p in full)